@@ -7,17 +7,24 @@ import inspect
 import json
 import os
 import platform
-import shlex
 import sys
-import textwrap
 import traceback
 
-from twisted.internet import inotify, protocol, reactor
-from twisted.python import filepath, log
+from twisted.internet import defer, inotify, protocol, reactor, threads
+from twisted.python import failure, filepath, log
 from twisted.python.rebuild import rebuild
+from twisted.python.threadpool import ThreadPool
 from twisted.words.protocols import irc
 
 import plugins.PluginBase as pb
+import utils.cache as ucache
+import utils.linepack as ulinepack
+import utils.sendqueue as usendq
+import utils.store as ustore
+from utils.cmdparser import Parser
+from utils.deferreds import DeadlineExceeded, deadline, gather, shield
+from utils.pager import Pages
+from utils.triggers import TriggerIndex
 from utils.utf8 import decode, encode
 
 # Constants
@@ -25,6 +32,7 @@ VERSION_NAME = 'BaneBot'
 VERSION_NUM = '0.1'
 VERSION_ENV = platform.platform()
 SOURCE_URL = 'https://github.com/genericpersona/banebot'
+MORE_SUFFIX = u' \x02({} more messages)\x02'
 
 class BaneBot(irc.IRCClient):
     versionName = VERSION_NAME
@@ -32,6 +40,12 @@ class BaneBot(irc.IRCClient):
     versionEnv = VERSION_ENV
     sourceURL = SOURCE_URL
 
+    # Flood-aware scheduler lines are sent through, if enabled
+    sendq = None
+
+    # user@host the server prefixes our lines with, once known
+    userhost = None
+
     def __init__(self, net_conf):
         '''
         BaneBot constructor.
@@ -54,55 +68,215 @@ class BaneBot(irc.IRCClient):
     def alterCollidedNick(self, nickname):
         return '`{}`'.format(nickname)
 
-    def balanced(self, u, left, right):
-        '''Return true if u has balanced
-        left and right unicode characters.
+    def cacheResponse(self, result, key, handler, irc, pm):
+        '''Callback saving the response of a cached command, or
+        the CommandError it raised, in the command cache.
+
+        pm is whether irc.pm was set before the handler ran, so
+        only a handler's own choice to reply privately is kept.
         '''
-        bal_stack = []
-        for char in u:
-            if char == left:
-                bal_stack.insert(0, char)
+        pm = irc.pm and not pm
+        negative_ttl = handler.cache_negative_ttl
+        if negative_ttl is None:
+            negative_ttl = self.fact.command_negative_ttl
+
+        if isinstance(result, failure.Failure):
+            if result.check(pb.CommandError):
+                self.fact.command_cache.set(key,
+                        ('error', result.value.args[0], result.value.pm),
+                        negative_ttl)
+        elif not result or result.startswith('[Error]'):
+            self.fact.command_cache.set(key, ('ok', result, pm), negative_ttl)
+        else:
+            self.fact.command_cache.set(key, ('ok', result, pm),
+                                        handler.cache_ttl)
 
-            elif char == right:
-                if not bal_stack:
-                    return False
+        return result
 
-                bal_stack.pop(0)
+    def commandFailed(self, failure, irc):
+        '''Errback for a command which didn't produce a response.
+        '''
+        if failure.check(pb.CommandError):
+            self.msg(irc.sender if failure.value.pm else irc.channel,
+                    encode(u'{}'.format(failure.value)))
+        elif failure.check(SyntaxError):
+            self.msg(irc.sender if irc.pm else irc.channel,
+                    encode(u'{}'.format(failure.value)))
+        elif failure.check(DeadlineExceeded):
+            self.msg(irc.sender if irc.pm else irc.channel,
+                    encode(self.fact.deadline_error.\
+                            format(irc.cmnd, failure.value.seconds)))
+        else:
+            log.err(failure, 'Command {} failed'.format(irc.cmnd))
 
-        return len(bal_stack) == 0
+    def commandResponse(self, response, irc):
+        '''Callback sending the response of a command.
+        '''
+        if response:
+            self.moreSend(irc.sender if irc.pm else irc.channel,
+                          response, irc.sender)
 
     def connectionLost(self, reason):
         if self.logging:
             log.err('Connection lost: {!r}'.format(reason))
+        if self.sendq is not None:
+            self.sendq.stop()
         irc.IRCClient.connectionLost(self, reason)
 
     def connectionMade(self):
         if self.logging:
             log.msg('Connection made to {}'.format(self.server))
+
+        # Pace lines ourselves, rather than with lineRate
+        if self.fact.send_scheduler:
+            self.lineRate = None
+            self.sendq = usendq.SendQueue( self.sendNow
+                                         , self.fact.send_rate
+                                         , self.fact.send_burst
+                                         , self.fact.send_target_rate
+                                         , self.fact.send_target_burst
+                                         , self.fact.send_max_ages
+                                         , self.lineBudget
+                                         , self.separator()
+                                         )
         irc.IRCClient.connectionMade(self)
 
-    def eval(self, expr):
+    def dispatch(self, cmnd, args, irc):
+        '''Run the handler for a command and return a Deferred
+        firing with its response.
+
+        Handlers run on the factory's thread pool when threaded
+        commands are enabled, so a slow handler doesn't hold up
+        the reactor.  Nonblocking handlers are always called on
+        the reactor.  Either way the Deferred fails with
+        DeadlineExceeded once the command's deadline passes.
+
+        Responses of handlers decorated with PluginBase.cached
+        are taken from the command cache when possible.
+        '''
+        handler = self.fact.commands[cmnd]
+
+        cached = getattr(handler, 'cache_ttl', None) is not None
+        if cached:
+            key = self.fact.commandCacheKey(handler, args)
+            hit = self.fact.command_cache.get(key)
+            if hit is not ucache.MISSING:
+                kind, response, pm = hit
+                if kind == 'error':
+                    return defer.fail(pb.CommandError(response, pm))
+
+                irc.pm = irc.pm or pm
+                return defer.succeed(response)
+
+        pm = irc.pm
+        threaded = self.fact.threaded_commands and \
+                   not getattr(handler, 'nonblocking', False)
+        if threaded:
+            work = threads.deferToThreadPool(reactor, self.fact.threadpool,
+                                             handler, args, irc)
+        else:
+            work = defer.maybeDeferred(handler, args, irc)
+
+        # Responses arriving after the deadline are still cached,
+        # so a slow command is answered in time when next asked
+        if cached:
+            work.addBoth(self.cacheResponse, key, handler, irc, pm)
+
+        # A call on the thread pool can't be stopped, so only
+        # waiting on it is given up at the deadline
+        d = shield(work) if threaded else work
+
+        # The line stays pending until the handler has returned
+        running = getattr(irc, 'running', None)
+        if running is not None:
+            returned = defer.Deferred()
+
+            def finished(result):
+                returned.callback(None)
+                return result
+
+            work.addBoth(finished)
+            running.append(returned)
+
+        return deadline(d, self.fact.commandDeadline(cmnd))
+
+    def eval(self, expr, irc=None):
         '''Evaluate an expression, which might contain
         nested expressions.
-        '''
-        # Evaluate each inner list
-        for i in range(len(expr) - 1, -1, -1):
-            if type(expr[i]) == list:
-                expr[i] = self.eval(expr[i])
-       
-        self.cmnd, rest = expr[0].lstrip(self.fact.prefix), expr[1:]
-        rest = [word for word in rest if word and not word.isspace()]
 
-        if self.cmnd in self.fact.commands:
-            response = self.fact.commands[self.cmnd](rest, self)
+        Returns a Deferred firing with the encoded response.
+        irc is the object handed to each command handler and
+        defaults to this protocol.
 
-            if response:
-              return encode(response)
-            else:
-              return u''
+        With concurrent_nested set, the nested expressions of
+        an expression are evaluated at the same time, each with
+        its own copy of irc.  Otherwise they're evaluated one
+        after another, right to left.  Either way, the parser
+        has already rejected lines with more than
+        max_nested_fanout nested commands.
+        '''
+        if irc is None:
+            irc = self
+
+        expr = list(expr)
+        inner = [i for i in range(len(expr) - 1, -1, -1) \
+                 if type(expr[i]) == tuple]
+
+        # Name the command now, in case it times out waiting
+        if expr and type(expr[0]) != tuple:
+            irc.cmnd = expr[0].lstrip(self.fact.prefix)
+
+        if self.fact.concurrent_nested and len(inner) > 1:
+            forks = [self.fork(irc) for i in inner]
+            d = gather([self.evalInner(expr, i, fork) \
+                        for i, fork in zip(inner, forks)])
+            d.addBoth(self.joinForks, irc, forks)
+            d.addCallback(lambda _: expr)
         else:
+            d = defer.succeed(expr)
+            for i in inner:
+                d.addCallback(self.evalInner, i, irc)
+
+        d.addCallback(self.evalCommand, irc)
+        return d
+
+    def evalCommand(self, expr, irc):
+        '''Run the command of an expression whose nested
+        expressions have all been evaluated.
+        '''
+        if not expr:
+            return u''
+
+        irc.cmnd, rest = expr[0].lstrip(self.fact.prefix), expr[1:]
+        rest = [word for word in rest if word and not word.isspace()]
+
+        if irc.cmnd not in self.fact.commands:
             return u''
 
+        d = self.dispatch(irc.cmnd, rest, irc)
+        d.addCallback(lambda response: encode(response) if response else u'')
+        return d
+
+    def evalInner(self, expr, i, irc):
+        '''Replace the nested expression at index i of expr
+        with its value.
+        '''
+        def replace(value):
+            expr[i] = value
+            return expr
+
+        return self.eval(expr[i], irc).addCallback(replace)
+
+    def fork(self, irc):
+        '''Return a copy of irc for a nested command evaluated
+        alongside others, so they don't overwrite each other's
+        per-line attributes.
+        '''
+        if isinstance(irc, CommandContext):
+            return irc.copy()
+
+        return irc
+
     def getCommand(self, msg):
         '''
         Isolate the portion of a privmsg 
@@ -136,6 +310,15 @@ class BaneBot(irc.IRCClient):
         else:
             return u''
 
+    def irc_JOIN(self, prefix, params):
+        '''Learns our own hostmask from our JOINs, so lines can
+        be packed as full as the server allows.
+        '''
+        nick, _, userhost = prefix.partition('!')
+        if nick == self.nickname and userhost:
+            self.userhost = userhost
+        irc.IRCClient.irc_JOIN(self, prefix, params)
+
     def irc_RPL_ENDOFWHO(self, *nargs):
       '''End of WHO reply
       '''
@@ -150,19 +333,16 @@ class BaneBot(irc.IRCClient):
           full = None
           reply = u'{} is not online'.format(self.who_reply[-1])
 
-      # Check if the nick is in the tell dict
-      if hasattr(self, '_telld') and self._tell_check is not None:
-          if full is not None and nick in self._telld:
+      # Check if this answers a tell
+      if getattr(self, '_tell_check', None) is not None:
+          src, dst, tell_id = self._tell_check
+          if full is not None:
               # Don't send if the user is currently online
-              src, _ = self._telld[nick]
               reply = u'{} is online. Send a PM youself, silly ass.'.\
                       format(nick)
-              del self._telld[nick]
-
-              # Save the telld to disk
-              self.fact.commands['tell'].saveTellDict(self)
+              self.fact.plugins['Tell'].tells.remove(tell_id).\
+                      addErrback(log.err, '[Error]: Cannot remove tell')
           else:
-              src, dst = self._tell_check
               reply = u'Message queued for {}'.format(dst)
 
           self._tell_check = None
@@ -180,10 +360,26 @@ class BaneBot(irc.IRCClient):
 
     def irc_unknown(self, prefix, command, params):
       '''
-      Currently, just supports joining on invite.
+      Currently, just supports joining on invite, and noting
+      when our host is changed, e.g., cloaked.
       '''
       if command == 'INVITE':
           self.join(params[1])
+      elif command == '396' and len(params) > 1 and self.userhost:
+          self.userhost = '{}@{}'.format(self.userhost.split('@')[0],
+                                         params[1])
+
+    def joinForks(self, result, irc, forks):
+        '''Callback passing on the result of nested commands
+        evaluated with copies of irc made by fork, once they've
+        all finished.  If any of them is to be answered
+        privately, as one failing usually is, so is irc.
+        '''
+        for fork in forks:
+            if fork is not irc and fork.pm:
+                irc.pm = True
+
+        return result
 
     def joined(self, channel):
         if self.logging:
@@ -196,30 +392,89 @@ class BaneBot(irc.IRCClient):
         if self.fact.rejoin_after_kick:
             self.join(channel)
 
-    def moreSend(self, to, msg):
+    def lineBudget(self, target):
+        '''Return the most bytes of text in a line sent to target.
+        '''
+        return ulinepack.budget(target, self.nickname, self.userhost)
+
+    def lineResponse(self, response, to):
+        '''Callback sending the response of a line plugin.
+        '''
+        if response:
+            self.msg(to, encode(response), priority=usendq.CHATTER)
+
+    def moreSend(self, to, msg, sender=None):
         '''Sends a maximum amount of text at a time and stores the rest
         which can be sent with the more plugin.
-        '''
-        # Get the msg length to split up the text into lines
-        lines = textwrap.wrap(msg, self.fact.max_line_len)
-        lines = lines[:self.fact.max_more_lines]
 
-        # Save it in the dict for the more plugin
-        if not hasattr(self, '_mored'):
-            self._mored = {}
-        self._mored[self.sender] = lines
+        The rest is stored for sender, defaulting to the sender
+        of the line currently being handled, and is only wrapped
+        as it's sent.
+        '''
+        if type(msg) == str:
+            msg = unicode(msg, "utf-8", errors="ignore")
+
+        # Leave room in each line for the prefix and suffix
+        width = self.lineBudget(to) - len(encode(MORE_SUFFIX.format(u'99+')))
+
+        key = self.fact.moreKey(to, sender or self.sender)
+        pages = Pages(msg, width, self.fact.max_more_lines,
+                      self.fact.line_separator)
+
+        line = self.nextPage(key, pages)
+        if line is not None:
+            self.msg(to, line, merge=False)
+
+    def nextPage(self, key, pages=None):
+        '''Return the next line of the text stored under key by
+        moreSend, or of pages, encoded and ending in how many
+        lines are left, or None if there are none.  The rest of
+        the text is stored under key.  Pages are read lazily,
+        so this must only be called on the reactor.
+        '''
+        if pages is None:
+            pages = self.fact.more.get(key, None)
+            if pages is None:
+                return None
 
-        # Get the next line to send
-        line = lines.pop(0)
+        line = pages.next()
+        if line is None:
+            self.fact.more.delete(key)
+            return None
 
         # What to put at the end of the line
-        suffix = u' \x02({} more messages)\x02'.format(len(lines)) if lines \
-                    else u''
+        left, exact = pages.count(self.fact.more_lookahead)
+        if left:
+            self.fact.more.set(key, pages, self.fact.more_ttl)
+            line += encode(MORE_SUFFIX.format(left if exact
+                                              else u'{}+'.format(left)))
+        else:
+            self.fact.more.delete(key)
+
+        return line
+
+    def msg(self, user, message, length=None, priority=usendq.REPLY,
+            merge=True):
+        '''Send a message to a nick or channel, or queue it to
+        be sent once flood control allows.  Lines from line
+        plugins should have a priority of CHATTER, so replies
+        to commands go first.
 
-        # Send the message with the suffix
-        if type(line) == str:
-            line = unicode(line, "utf-8", errors="ignore")
-        self.msg(to, encode(u'{}{}'.format(line, suffix)))
+        Each line of the message is a part, packed with the
+        others into as few lines as fit, at most length bytes
+        each if given.  With merge False, the lines aren't
+        merged with others queued, e.g., a page for more.
+        '''
+        width = self.lineBudget(user)
+        if length is not None:
+            width = min(width, length)
+
+        for line in ulinepack.pack(message.split('\n'), width,
+                                   self.separator()):
+            if self.sendq is None:
+                self.sendNow(user, line)
+            else:
+                self.sendq.put(user, line, priority, merge)
 
     def noticed(self, user, channel, message):
         '''Called when a NOTICE message is sent.
@@ -228,27 +483,21 @@ class BaneBot(irc.IRCClient):
             log.msg('[{}] <{}> {}'.format(channel, user, encode(message)))
 
     def parse(self, msg):
-        '''Return a list of unicode objects and/or lists of
-        unicode objects.  The first unicode object in a list
+        '''Return a tuple of unicode objects and/or tuples of
+        unicode objects.  The first unicode object in a tuple
         is the name of a command.  The remaining unicode
-        objects are arguments.  An inner list represents another
+        objects are arguments.  An inner tuple represents another
         expression to be evaluated.
+
+        Raises utils.cmdparser.ParseError, a SyntaxError, if
+        the nesting is unbalanced or too deep, or there are
+        too many nested commands.
         '''
-        # Make sure msg is balanced before proceeding
-        if not self.balanced(msg, 
-                self.fact.nested_prefix, self.fact.nested_suffix):
-            raise SyntaxError(self.fact.unbalanced_error.\
-                    format(self.fact.nested_prefix, self.fact.nested_suffix))
-
-        # Because self.prefix gets stripped away, the parser
-        # needs to enclose everything as a nested command or
-        # only the first token encountered is returned
-        return self.readFrom([self.fact.nested_prefix] + \
-                             self.tokenize(msg) + \
-                             [self.fact.nested_suffix])
+        return self.fact.parser.parse(msg)
 
     def privmsg(self, user, channel, msg):
         # Save needed information
+        self.user = user
         self.sender = user.split('!', 1)[0]
         self.channel = channel
         self.pm = channel == self.nickname
@@ -257,58 +506,62 @@ class BaneBot(irc.IRCClient):
 
         # Then, check for the presence of a command
         cmnd = self.getCommand(msg)
-        if cmnd:
-            try:
-              response = self.eval(self.parse(cmnd))
-              if response:
-                  self.moreSend(self.sender if self.pm else channel, response)
-            except pb.CommandError, ce:
-              self.msg(self.sender if ce.pm else channel,
-                      encode(u'{}'.format(ce)))
-            except SyntaxError, se:
-              self.msg(self.sender if self.pm else channel, 
-                      encode(u'{}'.format(se)))
-            finally:
-              # Log each command responded to
-              if self.logging:
-                log.msg('[{}] <{}> {}'.format(channel, user, encode(msg)))
+        if cmnd and self.fact.pending_commands >= self.fact.max_pending_commands:
+            self.msg(self.sender if self.pm else channel,
+                    encode(self.fact.busy_error))
+        elif cmnd:
+            # Commands may still be running after the next line
+            # arrives, so they get their own view of this one
+            irc = CommandContext(self)
+            self.fact.pending_commands += 1
+
+            d = defer.maybeDeferred(self.parse, cmnd)
+            d.addCallback(self.eval, irc)
+
+            # Nested commands share a deadline for the whole line
+            d = deadline(d, self.fact.message_deadline)
+            d.addCallbacks(self.commandResponse, self.commandFailed,
+                           callbackArgs=(irc,), errbackArgs=(irc,))
+
+            def released(_):
+                self.fact.pending_commands -= 1
+
+            def finished(_):
+                # Handlers left running on the thread pool past the
+                # deadline still count against max_pending_commands
+                defer.DeferredList(irc.running).addCallback(released)
+
+                # Log each command responded to
+                if self.logging:
+                    log.msg('[{}] <{}> {}'.format(channel, user, encode(msg)))
+
+            d.addBoth(finished)
 
         # Check the non-command plugins
-        for name in self.fact.line_plugins:
-            if self.fact.plugins[name].hasResponse(msg, self):
+        for name in self.fact.triggers.fired(msg):
+            response = self.fact.plugins[name].hasResponse(msg, self)
+            if isinstance(response, defer.Deferred):
+                response.addCallback(self.lineResponse,
+                                     self.sender if self.pm else channel)
+                response.addErrback(log.err, '{} failed'.format(name))
+            elif response:
                 self.msg(self.sender if self.pm else channel,
-                            encode(self.response))
-
-    def readFrom(self, tokens, depth=0):
-        '''Read, and return, an expression, i.e., a list
-        of unicode objects and/or other expressions, from
-        a sequence of tokens.
+                            encode(self.response), priority=usendq.CHATTER)
 
-        Taken from http://norvig.com/lis.py
+    def sendNow(self, user, line):
+        '''Send a line already packed to fit, without splitting
+        it again.
         '''
-        if not tokens:
-            raise SyntaxError(self.eol_error)
+        self.sendLine('PRIVMSG {} :{}'.format(user, line))
 
-        token = tokens.pop(0)
-        if self.fact.nested_prefix == token:
-            if depth == self.fact.max_nesting + 1:
-                raise SyntaxError(self.fact.max_nesting_error.\
-                                    format(self.fact.max_nesting))
-
-            L = []
-            while tokens[0] != self.fact.nested_suffix:
-                L.append(self.readFrom(tokens, depth + 1))
-
-            # Pop off the nested suffix
-            tokens.pop(0)
-            return L
-
-        elif self.fact.nested_suffix == token:
-            raise SyntaxError(self.fact.unexpected_error.\
-                    format(self.fact.nested_suffix))
+    def separator(self):
+        '''Return the encoded separator between packed parts,
+        or None if parts aren't packed.
+        '''
+        if self.fact.line_separator is None:
+            return None
 
-        else:
-            return token
+        return encode(self.fact.line_separator)
 
     def signedOn(self):
         # Auth with NickServ
@@ -319,33 +572,58 @@ class BaneBot(irc.IRCClient):
         for channel in self.channels:
             self.join(channel)
 
-    def tokenize(self, msg):
-        '''Turn a msg into a list of tokens
-        '''
-        for replace in (self.fact.nested_prefix, self.fact.nested_suffix):
-            msg = msg.replace(replace, u' {} '.format(replace))
-
-        try:
-            return shlex.split(msg)
-        except ValueError:
-            return msg.split()
-
     def userJoined(self, user, channel):
         '''Called when a user joins a channel.
         '''
-        if not hasattr(self, '_telld'):
-            self._telld = {}
+        # Deliver any messages left with tell
+        if 'Tell' in self.fact.plugins:
+            self.fact.plugins['Tell'].deliver(decode(user), self)
+
+class CommandContext(object):
+    '''
+    Per-message view of a BaneBot handed to command handlers.
+
+    Handlers may still be running on the command thread pool
+    when the next line arrives, so the attributes describing the
+    line being answered are kept here rather than on the shared
+    protocol.  All other attributes are looked up on, and
+    assigned to, the protocol.  Lines are always sent from the
+    reactor thread.
+    '''
+    LOCAL = ('channel', 'cmnd', 'error', 'pm', 'response', 'sender', 'user')
+
+    def __init__(self, bot, running=None):
+        self.__dict__['bot'] = bot
+        for name in self.LOCAL:
+            self.__dict__[name] = getattr(bot, name, None)
+
+        # Deferreds firing as each handler run for the line
+        # returns, shared by every context for the line
+        self.__dict__['running'] = [] if running is None else running
+
+    def __getattr__(self, name):
+        return getattr(self.bot, name)
+
+    def __setattr__(self, name, value):
+        if name in self.LOCAL:
+            self.__dict__[name] = value
+        else:
+            setattr(self.bot, name, value)
 
-        if user in self._telld:
-            src, msg, dt = self._telld[user]
-            self.msg(user, '{} said at {} UTC: {}'.format(\
-                            src, 
-                            dt.strftime('%a %b %d %H:%M:%S'), 
-                            msg))
+    def copy(self):
+        '''Return a new context for the same line.
+        '''
+        ctx = CommandContext(self.bot, self.running)
+        for name in self.LOCAL:
+            ctx.__dict__[name] = self.__dict__[name]
 
-            # Update the tell dict
-            del self._telld[user] 
-            self.fact.commands['tell'].saveTellDict(self)
+        return ctx
+
+    def msg(self, *args, **kwargs):
+        reactor.callFromThread(self.bot.msg, *args, **kwargs)
+
+    def sendLine(self, line):
+        reactor.callFromThread(self.bot.sendLine, line)
 
 class BaneBotFactory(protocol.ClientFactory):
     encoding = 'utf-8'
@@ -365,12 +643,54 @@ class BaneBotFactory(protocol.ClientFactory):
       # Save the networks to connect to
       self.network = network
 
+      # Thread pool for running command handlers
+      self.pending_commands = 0
+      if self.threaded_commands:
+          self.threadpool = ThreadPool(self.min_command_threads,
+                                       self.max_command_threads,
+                                       'commands-{}'.format(network['server']))
+          reactor.callWhenRunning(self.threadpool.start)
+          reactor.addSystemEventTrigger('during', 'shutdown',
+                                        self.threadpool.stop)
+
+      # Responses of cached commands, kept across reloads
+      self.command_cache = ucache.named( 'commands'
+                                       , self.command_cache_entries
+                                       , max_bytes=self.command_cache_bytes
+                                       , path=self.command_cache_path
+                                       )
+
+      # Pages of long responses left for the more command
+      self.more = ucache.named( 'more'
+                              , self.more_max_entries
+                              , max_bytes=self.more_max_bytes
+                              )
+
+      # State plugins keep with PluginBase.table
+      self.store = ustore.named( 'plugins', self.store_path
+                               , backend=self.store_backend
+                               , flush_interval=self.store_flush_interval
+                               , flush_threshold=self.store_flush_threshold
+                               , compact_bytes=self.store_compact_bytes
+                               )
+
       # Load plugins 
       self.plugins = {}
       self.commands = {}
       self.line_plugins = set()
+      self.triggers = TriggerIndex()
       self.loadPlugins()
 
+      # Parser for commands, shared by every connection
+      self.parser = Parser( self.nested_prefix, self.nested_suffix
+                          , self.max_nesting, self.parse_cache_size
+                          , max_nested=self.max_nested_fanout
+                          , max_nesting_error=self.max_nesting_error
+                          , max_nested_error=self.max_nested_error
+                          , unbalanced_error=self.unbalanced_error
+                          , unexpected_error=self.unexpected_error
+                          )
+
       # Set-up auto-reloading of plugins
       self.setupAutoReloading()
 
@@ -386,6 +706,21 @@ class BaneBotFactory(protocol.ClientFactory):
 
         return bb
 
+    def commandCacheKey(self, handler, args):
+        '''Return the key a cached command's response is saved
+        under.  Commands sharing a handler share responses.
+        '''
+        return ( handler.im_self.__class__.__name__
+               , handler.__name__
+               , handler.cache_key(args)
+               )
+
+    def commandDeadline(self, cmnd):
+        '''Return the seconds a command may run before the
+        user is told it timed out.
+        '''
+        return self.command_deadlines.get(cmnd, self.command_deadline)
+
     def clientConnectionLost(self, connector, reason):
         if self.logging:
             log.err('Connection lost: {!r}'.format(reason))
@@ -424,6 +759,7 @@ class BaneBotFactory(protocol.ClientFactory):
 
                 if issubclass(value, pb.LinePlugin):
                     self.line_plugins.add(name)
+                    self.triggers.add(name, self.plugins[name].triggers())
 
     def loadPluginObjects(self):
         for module in self.modules.values():
@@ -446,6 +782,12 @@ class BaneBotFactory(protocol.ClientFactory):
         # Create objects for all plugin classes
         self.loadPluginObjects()
 
+    def moreKey(self, to, nick):
+        '''Return the key the pages of a response to nick, sent
+        to a channel or nick, are kept under.
+        '''
+        return (self.network['server'], to, nick)
+
     def reloadPluginModule(self, stuff, filepath, mask):
         # Get the actual filepath
         afpath = os.path.abspath(filepath.path).replace('.conf', '.py')
@@ -0,0 +1,105 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+'''
+Compares the single pass command parser with the tokenize,
+readFrom, and balanced methods it replaced.
+
+Run from the top of the repository:
+
+    python2 bench/parser.py
+'''
+
+import os
+import shlex
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.cmdparser import Parser
+
+#-------------------------------------
+#
+#    Old parser, for comparison
+#
+#-------------------------------------
+def balanced(u, left, right):
+    bal_stack = []
+    for char in u:
+        if char == left:
+            bal_stack.insert(0, char)
+
+        elif char == right:
+            if not bal_stack:
+                return False
+
+            bal_stack.pop(0)
+
+    return len(bal_stack) == 0
+
+def tokenize(msg):
+    for replace in (u'[', u']'):
+        msg = msg.replace(replace, u' {} '.format(replace))
+
+    try:
+        return shlex.split(msg)
+    except ValueError:
+        return msg.split()
+
+def read_from(tokens, depth=0):
+    token = tokens.pop(0)
+    if token == u'[':
+        if depth == 6:
+            raise SyntaxError('Maximum of 5 nested command(s)')
+
+        L = []
+        while tokens[0] != u']':
+            L.append(read_from(tokens, depth + 1))
+
+        tokens.pop(0)
+        return L
+
+    elif token == u']':
+        raise SyntaxError('Unexpected ]')
+
+    else:
+        return token
+
+def old_parse(msg):
+    if not balanced(msg, u'[', u']'):
+        raise SyntaxError('Unbalanced')
+
+    return read_from([u'['] + tokenize(msg) + [u']'])
+
+#-------------------------------------
+#
+#    Benchmark
+#
+#-------------------------------------
+COMMANDS = { 'short': u'weather london'
+           , 'quoted': u'echo "some quoted text" and \'more of it\''
+           , 'long': u'echo ' + u' '.join(u'word{}'.format(i) for i in range(400))
+           , 'nested': u'echo [rot13 [rot13 [rot13 [rot13 [rot13 deep]]]]] ' * 20
+           }
+
+def main():
+    number = 200
+    print '{:<8} {:>12} {:>12} {:>12} {:>8}'.format(
+            'command', 'old (us)', 'new (us)', 'cached (us)', 'speedup')
+
+    for name, msg in sorted(COMMANDS.iteritems()):
+        parser = Parser(max_nesting=5)
+        parser.parse(msg)
+
+        old = min(timeit.repeat(lambda: old_parse(msg), number=number, repeat=3))
+        uncached = min(timeit.repeat(lambda: parser.read(msg, parser.quoted_re),
+                                     number=number, repeat=3))
+        cached = min(timeit.repeat(lambda: parser.parse(msg),
+                                   number=number, repeat=3))
+
+        print '{:<8} {:>12.1f} {:>12.1f} {:>12.1f} {:>7.1f}x'.format(
+                name, old / number * 1e6, uncached / number * 1e6,
+                cached / number * 1e6, old / uncached)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+'''
+Times lookups through utils.resolver against a stand-in name
+server on localhost, uncached, cached, and several types at
+once.  The answers are checked by tests/test_resolver.py.
+
+Run from the top of the repository:
+
+    python2 bench/resolver.py
+'''
+
+import os
+import sys
+import time
+
+from twisted.internet import defer, reactor
+from twisted.names import common, dns, error, server
+from twisted.python import log
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import utils.resolver as uresolver
+
+LOOKUPS = 2000
+ZONE = 'bench.test'
+
+class StandIn(common.ResolverBase):
+    '''
+    Answers for every name under ZONE, and counts the queries
+    it's asked.
+    '''
+    def __init__(self):
+        common.ResolverBase.__init__(self)
+        self.queries = 0
+
+    def _lookup(self, name, cls, type_, timeout):
+        self.queries += 1
+        soa = dns.RRHeader(ZONE, dns.SOA, ttl=60,
+                           payload=dns.Record_SOA(minimum=30), auth=True)
+
+        name = str(name)
+        if name.startswith('missing'):
+            return defer.fail(error.DomainError(name))
+
+        payloads = { dns.A: [dns.Record_A('192.0.2.1'), dns.Record_A('192.0.2.2')]
+                   , dns.AAAA: [dns.Record_AAAA('2001:db8::1')]
+                   , dns.MX: [dns.Record_MX(10, 'mx.' + ZONE)]
+                   , dns.NS: [dns.Record_NS('ns.' + ZONE)]
+                   , dns.PTR: [dns.Record_PTR('host.' + ZONE)]
+                   , dns.TXT: [dns.Record_TXT('v=spf1 -all')]
+                   }.get(type_, [])
+        answers = [dns.RRHeader(name, type_, ttl=300, payload=p, auth=True)
+                   for p in payloads]
+        return defer.succeed((answers, [] if answers else [soa], []))
+
+@defer.inlineCallbacks
+def timed(label, lookups, query):
+    start = time.time()
+    for i in xrange(lookups):
+        yield query(i)
+    elapsed = time.time() - start
+
+    print '{:<24} {:>8} {:>12.1f}'.format(label, lookups,
+                                          elapsed / lookups * 1e6)
+
+@defer.inlineCallbacks
+def main():
+    stand_in = StandIn()
+    factory = server.DNSServerFactory(clients=[stand_in])
+    port = reactor.listenUDP(0, dns.DNSDatagramProtocol(factory),
+                             interface='127.0.0.1')
+
+    resolver = uresolver.Resolver(servers=[('127.0.0.1', port.getHost().port)],
+                                  resolv=None, max_entries=LOOKUPS * 2)
+
+    print '{:<24} {:>8} {:>12}'.format('lookup', 'count', 'us/lookup')
+    yield timed('uncached', LOOKUPS,
+                lambda i: resolver.query('host{}.{}'.format(i, ZONE), 'A'))
+    yield timed('cached', LOOKUPS,
+                lambda i: resolver.query('host{}.{}'.format(i, ZONE), 'A'))
+    yield timed('uncached, 4 types', LOOKUPS / 4,
+                lambda i: resolver.lookup('multi{}.{}'.format(i, ZONE),
+                                          ['A', 'AAAA', 'MX', 'TXT']))
+    print resolver.stats()
+    print '{} queries reached the server'.format(stand_in.queries)
+
+    yield port.stopListening()
+
+def run():
+    d = main()
+    d.addErrback(log.err)
+    d.addBoth(lambda _: reactor.stop())
+
+if __name__ == '__main__':
+    reactor.callWhenRunning(run)
+    reactor.run()
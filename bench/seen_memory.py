@@ -0,0 +1,70 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+'''
+Compares the memory taken by the seen entries in the old
+{channel: {nick: (datetime, msg)}} dict and in SeenTable.
+
+Each layout is filled in a process of its own, and the
+growth of its resident set is reported.  Linux only.
+
+Run from the top of the repository:
+
+    python2 bench/seen_memory.py
+'''
+
+from datetime import datetime
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from plugins.Seen import SeenTable
+
+CHANNELS = 20
+MSG = u'a fairly ordinary line of chat, about as long as most of them {}'
+
+def rss():
+    '''Return the resident set size in bytes.
+    '''
+    with open('/proc/self/statm') as sf:
+        return int(sf.read().split()[1]) * resource.getpagesize()
+
+def fill(layout, n):
+    '''Return the bytes taken by n entries of a layout.
+    '''
+    before = rss()
+
+    if layout == 'old':
+        seend = {}
+        for i in xrange(n):
+            chan, nick = u'#chan{}'.format(i % CHANNELS), u'nick{}'.format(i)
+            seend.setdefault(chan, {})[nick] = (datetime.utcnow(), MSG.format(i))
+    else:
+        seend = SeenTable()
+        for i in xrange(n):
+            chan, nick = u'#chan{}'.format(i % CHANNELS), u'nick{}'.format(i)
+            seend[(chan, nick)] = (1500000000 + i, MSG.format(i))
+
+    return rss() - before
+
+def main():
+    if len(sys.argv) == 3:
+        print fill(sys.argv[1], int(sys.argv[2]))
+        return
+
+    print '{:>8} {:>12} {:>12} {:>10} {:>10} {:>8}'.format(
+            'entries', 'old (KiB)', 'new (KiB)', 'old (B/e)', 'new (B/e)', 'saving')
+
+    for n in (10000, 100000, 1000000):
+        old, new = [int(subprocess.check_output(
+                        [sys.executable, __file__, layout, str(n)]))
+                    for layout in ('old', 'new')]
+
+        print '{:>8} {:>12,} {:>12,} {:>10.0f} {:>10.0f} {:>7.0%}'.format(
+                n, old // 1024, new // 1024, float(old) / n, float(new) / n,
+                1 - float(new) / old)
+
+if __name__ == '__main__':
+    main()
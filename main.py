@@ -6,12 +6,42 @@ import json
 import os
 import sys
 
-import dns.resolver
 from twisted.internet import reactor, ssl
+from twisted.python import log
 
 from BaneBot.BaneBot import BaneBot, BaneBotFactory
 from utils.jsonhooks import _decode_dict
 from utils.privs import drop_privs
+import utils.resolver as uresolver
+
+def connect(host, network, factory):
+    '''Connect to a network's server at host.
+    '''
+    port = network['port']
+    if network.get('ssl', False):
+        reactor.connectSSL(host, port, factory, ssl.ClientContextFactory())
+    else:
+        reactor.connectTCP(host, port, factory)
+
+def connect_ipv6(network, factory):
+    '''Connect to a network's server at its first AAAA record,
+    once it has been looked up, stopping the bot if it has
+    none.  Must be called with the reactor running.
+    '''
+    def connected(addresses):
+        if not addresses:
+            log.msg('{} did not have an AAAA records'.format(network['server']))
+            reactor.stop()
+            return
+
+        connect(addresses[0], network, factory)
+
+    def failed(failure):
+        log.err(failure, 'Cannot look up {}'.format(network['server']))
+        reactor.stop()
+
+    d = uresolver.resolver().query(network['server'], 'AAAA')
+    d.addCallbacks(connected, failed)
 
 if __name__ == '__main__':
     # Use a default encoding of utf-8
@@ -33,19 +63,9 @@ if __name__ == '__main__':
     for network in networks:
         bbf = BaneBotFactory(main_config, network)
         if network['force_ipv6']:
-            answers = dns.resolver.query(network['server'], 'AAAA')
-            if not answers:
-                quit('{} did not have an AAAA records'.format(network['server']))
-
-            host = list(answers)[0].address
-        else:
-            host = network['server']
-        port = network['port']
-
-        if network.get('ssl', False):
-            reactor.connectSSL(host, port, bbf, ssl.ClientContextFactory())
+            reactor.callWhenRunning(connect_ipv6, network, bbf)
         else:
-            reactor.connectTCP(host, port, bbf)
+            connect(network['server'], network, bbf)
 
     # Enter the event-loop
     reactor.run()
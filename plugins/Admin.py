@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+from fnmatch import fnmatch
+
+import plugins.PluginBase as pb
+import utils.snapshot as usnapshot
+
+class Admin(pb.CommandPlugin):
+  def __init__(self, conf):
+    super(Admin, self).__init__(conf)
+
+  def cache(self, args, irc):
+    '''(cache [flush] [command]) -- Show how the command cache
+    is doing, overall or for one command, or flush it.
+    Admins only.
+    '''
+    self.checkAdmin(irc)
+
+    cache = irc.fact.command_cache
+    if args and args[0] == u'flush':
+        if len(args) > 1:
+            handler = self.cachedHandler(args[1], irc)
+            flushed = cache.clear(lambda k: k[:2] == self.handlerKey(handler))
+        else:
+            flushed = cache.clear()
+
+        return u'Flushed {:,} cached responses'.format(flushed)
+
+    if args:
+        handler = self.cachedHandler(args[0], irc)
+        prefix = self.handlerKey(handler)
+        entries = sum(1 for k in cache.keys() if k[:2] == prefix)
+        return u'{}: {:,} cached responses | TTL: {}s | Error TTL: {}s'.format(
+                args[0], entries, handler.cache_ttl,
+                handler.cache_negative_ttl or irc.fact.command_negative_ttl)
+
+    return u'Command cache: {entries:,} responses, {bytes:,} bytes | ' \
+           u'Hit rate: {hit_rate:.1%} ({hits:,} hits, {misses:,} misses) | ' \
+           u'Evictions: {evictions:,} | Expirations: {expirations:,}'.format(
+                **cache.stats())
+
+  def cachedHandler(self, cmnd, irc):
+    '''Return the handler of a cached command.
+    '''
+    handler = irc.fact.commands.get(cmnd)
+    if getattr(handler, 'cache_ttl', None) is None:
+        raise pb.CommandError(u'[Error]: {} is not a cached command'.format(cmnd),
+                              pm=False)
+
+    return handler
+
+  def checkAdmin(self, irc):
+    '''Raise a CommandError unless the user is an admin, i.e.,
+    their nick!user@host matches one of the admins globs.
+    '''
+    if not any(fnmatch(irc.user, mask) for mask in irc.fact.admins):
+        raise pb.CommandError(u'[Error]: Only admins may do that')
+
+  def commands(self):
+    return { 'cache': self.cache
+           , 'sendq': self.sendq
+           , 'snapshots': self.snapshots
+           }
+
+  def handlerKey(self, handler):
+    '''Return the part of a command cache key naming the handler.
+    '''
+    return (handler.im_self.__class__.__name__, handler.__name__)
+
+  def sendq(self, args, irc):
+    '''(sendq) -- Show how many lines are waiting to be sent
+    and how long lines have waited.  Admins only.
+    '''
+    self.checkAdmin(irc)
+
+    if irc.sendq is None:
+      return u'Lines are sent without a send queue'
+
+    return u'Send queue: {replies:,} replies, {chatter:,} chatter waiting | ' \
+           u'Sent: {sent:,} | Merged: {merged:,} | Dropped: {dropped:,} | ' \
+           u'Wait: {avg_wait:.2f}s avg, {max_wait:.2f}s max'.format(
+                **irc.sendq.stats())
+
+  def snapshots(self, args, irc):
+    '''(snapshots) -- Show how long the last snapshot of
+    each file of saved state took and how big it was.
+    Admins only.
+    '''
+    self.checkAdmin(irc)
+
+    stats = usnapshot.stats()
+    if not stats:
+      return u'No snapshots taken yet'
+
+    return u' | '.join(
+              u'{}: {:,} taken, last {:.2f}s and {:,} bytes, {:,} failed'.format(
+                path, s['snapshots'], s['seconds'], s['bytes'] or 0, s['failures'])
+              for path, s in sorted(stats.iteritems()))
@@ -1,33 +1,21 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import datetime
-import itertools
-import sys
-
-import requests
-from twisted.python import log
 
 import plugins.PluginBase as pb
+import utils.market as umarket
 
 class BTCE(pb.CommandPlugin):
   def __init__(self, conf):
     super(BTCE, self).__init__(conf)
 
-    # Cache the time of the last
-    # update so no more than a
-    # given number of API calls
-    # occur in a particular time
-    self.last_update = None
-
     # Build a parser
     self.build_parser()
 
-    # Initialize containers for API data
-    self.currencies = set()
-
-    # Get fresh data
-    self.get_fresh_data()
+    # Tickers are polled by the market, which commands read
+    self.source = umarket.BTCE(self.info_api, self.ticker_api)
+    self.market = umarket.market()
+    self.market.add(self.source, self.refresh_rate)
 
   def build_parser(self):
     '''
@@ -88,63 +76,23 @@ class BTCE(pb.CommandPlugin):
     return { 'btc-e': self.ticker
            }
 
-  def get_fresh_data(self):
-    '''
-    Grab fresh data from the API and saves
-    it in class attributes.
-
-    Returns True if grab was successful
-    and False if an error occurred.
-    '''
-    try:
-      # Now, grab the pairs data
-      r = requests.get(self.info_api)
-      if r.status_code != 200:
-        log.err('[Error]: Status code {} for listing coins'.\
-                    format(r.status_code))
-        return False
-      else:
-        self.currencies = set()
-
-        # Save all the currencies 
-        for k in r.json()['pairs']:
-            left, right = k.split(u'_')
-            self.currencies.add(left)
-            self.currencies.add(right)
-
-        # Save the timestamp
-        self.last_update = datetime.datetime.utcnow() 
-
-        return True
-    # Any error that occurs connecting to the API
-    except:
-      log.err('[Error]: Cannot get fresh BTC-E data')
-      log.err('[Error]: {}'.format(sys.exc_info()[0]))
-      return False
-
-  def stale(self):
-    '''
-    Return True if API data is stale.
-    '''
-    # See if a pull from the API
-    # has never been made
-    if not self.last_update:
-      return True
-
-    return (datetime.datetime.utcnow() - self.last_update).seconds > self.refresh_rate
-
+  @pb.nonblocking
   def ticker(self, args, irc):
     '''(btc-e [-a/--available] [--avg] [--buy] [--high] [--last] [--low] 
     [--sell] [--short] [-v/--verbose] [currencies]) -- 
     Obtain information from BTC-E's ticker, or use -a/--available to check if a
     currency is available.  All other options control what info is returned.
     '''
-    # Get fresh data if needed
-    if self.stale():
-      if not self.get_fresh_data():
-        log.err('Failed to obtain fresh API average data')
-        irc.pm = True
-        return '[Error]: Cannot access BTC-E API.'
+    d = self.market.ready(self.source.name)
+    return d.addCallback(self.ticker_reply, args, irc)
+
+  def ticker_reply(self, _, args, irc):
+    '''Build the reply to the btc-e command once the tickers
+    have been polled.
+    '''
+    if not self.source.pairs or not self.market.feeds(self.source.name):
+      irc.pm = True
+      return '[Error]: Cannot access BTC-E API.'
 
     # Parse the command
     try:
@@ -173,51 +121,36 @@ class BTCE(pb.CommandPlugin):
 
     # Get the pairs in a useable format
     pairs = [(currencies[i], currencies[i+1]) for i in range(0, len(currencies), 2)]
-    payload = u'-'.join(map(lambda x: u'{}_{}'.format(x[0], x[1]), pairs))
-
-    # Set up data for a request
-    try:
-      r = requests.get(self.ticker_api.format(payload))
-
-      # Check for valid status code
-      if r.status_code != 200:
-        log.err('[Error]: Status code {} for BTC-E API'.format(r.status_code))
-        irc.pm = True
-        return '[Error]: Cannot contact BTC-E API.'
-
-      # Get all returned pair(s)
-      ret_pairs = r.json()
-
-      # Build the reply
-      replies = []
-      for pair, data in ret_pairs.iteritems():
-          if args.short:
-            reply = u''
-          else:
-            reply = u'{} Ticker | '.format(pair.replace(u'_', u'/').upper())
-          stats = []
-          for stat in (u'high', u'low', u'avg', u'vol', u'last', u'buy', u'sell'):
-              if (hasattr(args, stat) and getattr(args, stat)) or args.verbose:
-                  if args.short:
-                    stats.append(u'{}'.format(data[stat]))
-                  else:
-                    stats.append(u'{}: {}'.format(stat.title(), data[stat]))
-        
-          # Default to the average
-          if not stats:
-              if args.short:
-                  stats.append(u'{}'.format(data[u'avg']))
-              else:
-                stats.append(u'Avg: {}'.format(data[u'avg']))
-
-          replies.append(reply + u', '.join(stats))
-
-      return u'\n'.join(replies)
-    except:
-      log.err('[Error]: {}'.format(sys.exc_info()[0]))
-      irc.pm = True
-      return '[Error]: Cannot contact BTC-E API.'
 
+    # Build the reply, skipping pairs not traded
+    replies = []
+    for cfrom, cto in pairs:
+        data = self.market.latest(cfrom, cto, self.source.name)
+        if data is None:
+          continue
+
+        if args.short:
+          reply = u''
+        else:
+          reply = u'{}/{} Ticker | '.format(cfrom.upper(), cto.upper())
+        stats = []
+        for stat in (u'high', u'low', u'avg', u'vol', u'last', u'buy', u'sell'):
+            if (hasattr(args, stat) and getattr(args, stat)) or args.verbose:
+                if args.short:
+                  stats.append(u'{}'.format(data[stat]))
+                else:
+                  stats.append(u'{}: {}'.format(stat.title(), data[stat]))
+      
+        # Default to the average
+        if not stats:
+            if args.short:
+                stats.append(u'{}'.format(data[u'avg']))
+            else:
+              stats.append(u'Avg: {}'.format(data[u'avg']))
+
+        replies.append(reply + u', '.join(stats))
+
+    return u'\n'.join(replies)
 
   def supported(self, curr):
     '''
@@ -229,7 +162,7 @@ class BTCE(pb.CommandPlugin):
 
     Return True if supported and False otherwise.
     '''
-    return curr.lower() in self.currencies
+    return curr.lower() in self.source.currencies
 
 #-------------------------------------
 #
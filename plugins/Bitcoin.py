@@ -1,28 +1,35 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import datetime
-import json 
 
-import requests
 from twisted.python import log
 
 import plugins.PluginBase as pb
-import utils.url as uurl
 import utils.bitcoin as btc
+import utils.market as umarket
 
 class Bitcoin(pb.CommandPlugin):
   def __init__(self, conf):
     super(Bitcoin, self).__init__(conf)
 
     # BitcoinAverage attributes
-    self.baa = btc.BitcoinAverageAPI()
     self.build_avg_parser()
-    self.last_avg_fetch = None
 
     # Preev attributes
     self.build_preev_parser()
 
+    # Both are polled by the market, which commands read
+    self.market = umarket.market()
+    self.market.add(umarket.BitcoinAverage(), self.avg_refresh_rate)
+    self.market.add(umarket.Preev(self.preev_units(),
+                                  sorted(self.preev_exchanges('ALL'))),
+                    self.preev_refresh_rate)
+
+    # Polled in the background, so block commands answer
+    # from memory
+    self.tip = btc.chain_tip(self.tip_interval, self.tip_blocks,
+                             **self.race_opts())
+
   def commands(self):
     return { 'avg': self.avg
            , 'balance': self.balance
@@ -36,16 +43,23 @@ class Bitcoin(pb.CommandPlugin):
            , 'tslb': self.tslb
            }
 
+  @pb.nonblocking
   def avg(self, args, irc):
     '''(avg [--ask] [--bid] [-d/--day-avg] [--last] [-v/--verbose]
     [--volume-btc] [--volume-percent]) --
     Return the average price of BTC in USD from bitcoinaverage.com
     '''
-    if self.avg_data_stale():
-        if not self.get_fresh_avg_data():
-            irc.pm = True
-            return '[Error]: Failed to contact BitcoinAverage API'
-        
+    d = self.market.ready(umarket.BitcoinAverage.name)
+    return d.addCallback(self.avg_reply, args, irc)
+
+  def avg_reply(self, _, args, irc):
+    '''Build the reply to the avg command once the average
+    data has been polled.
+    '''
+    if not self.market.feeds(umarket.BitcoinAverage.name):
+        irc.pm = True
+        return '[Error]: Failed to contact BitcoinAverage API'
+
     try:
         opts = self.avg_parser.parse_args(args)
         opts.currency = opts.currency.upper()
@@ -53,12 +67,14 @@ class Bitcoin(pb.CommandPlugin):
         irc.pm = True
         return str(exc)
 
-    if opts.currency not in self.baa.all:
+    data = self.market.latest(u'BTC', opts.currency,
+                              umarket.BitcoinAverage.name)
+    if data is None:
         return u'[Error]: {} is not a supported currency'.format(opts.currency)
 
     if opts.verbose:
         reply = []
-        for k, v in self.baa.all[opts.currency].iteritems():
+        for k, v in data.iteritems():
             if k == 'timestamp':
                 continue
             reply.append(u'{}: {}'.format(k.replace(u'_', u' ').title(), v))
@@ -68,28 +84,21 @@ class Bitcoin(pb.CommandPlugin):
     for stat in (u'ask', u'bid', u'day_avg', u'last', u'volume_btc', u'volume_percent'):
         stat = u'24h_avg' if stat == u'day_avg' else stat
         if getattr(opts, stat):
-            if stat in self.baa.all[opts.currency]:
+            if stat in data:
                 reply.append(u'{}: {}'.format(stat.replace(u'_', u' ').title(), 
-                             self.baa.all[opts.currency][stat])) 
+                             data[stat])) 
             else:
                 reply.append(u'{}: Not available.'.format(stat.replace(u'_', u' ').title()))
 
     if not reply:
-        return unicode(self.baa.all[opts.currency]['last'])
+        return unicode(data['last'])
 
     if len(reply) == 1:
         return reply[0].split(':')[-1].lstrip()
 
     return u', '.join(reply)
 
-  def avg_data_stale(self):
-    '''Check if new average data needs to be fetched.
-    '''
-    if self.last_avg_fetch is None:
-        return True
-
-    return (datetime.datetime.utcnow() - self.last_avg_fetch).seconds > self.avg_refresh_rate
-
+  @pb.nonblocking
   def balance(self, args, irc):
     '''(balance [address]) --
     Return the balance of a given Bitcoin address. Defaults to 6 confirms
@@ -103,15 +112,17 @@ class Bitcoin(pb.CommandPlugin):
       if not btc.valid_address(addr):
         return '{} is not a valid Bitcoin address'.format(addr)
 
+      min_confirms = 6
       if len(args) > 1:
         try:
           min_confirms = int(args[1]) if int(args[1]) >= 0 else 6
-          return str(btc.balance(addr, min_confirms))
-        except:
+        except ValueError:
           pass
 
-      return str(btc.balance(addr))
+      d = btc.balance(addr, min_confirms, **self.race_opts())
+      return d.addCallback(self.provider_reply, u'{}')
 
+  @pb.nonblocking
   def block_hash(self, args, irc):
     '''(block-hash <block>) -- 
     Return the hash of a given block
@@ -119,13 +130,20 @@ class Bitcoin(pb.CommandPlugin):
     if not args:
         raise pb.CommandError('Missing the block to find the hash of', pm=False)
 
-    return u'{}'.format(btc.block_hash(args[0]))
+    if args[0].isdigit():
+      d = self.tip.block(int(args[0]))
+    else:
+      d = btc.block_hash(args[0], **self.race_opts())
+    return d.addCallback(self.provider_reply, u'{}')
 
+  @pb.nonblocking
   def blocks(self, args, irc):
     '''(blocks) -- 
     Return the current block on main net.
     '''
-    return u'{:,}'.format(btc.current_block())
+    d = self.tip.ready()
+    d.addCallback(lambda _: self.tip.height)
+    return d.addCallback(self.provider_reply, u'{:,}')
 
   def build_avg_parser(self):
     '''Build a parser for the avg command.
@@ -192,7 +210,7 @@ class Bitcoin(pb.CommandPlugin):
                                   )
     self.preev_parser.add_argument( '-c'
                                   , '--coin'
-                                  , choices=[u'BTC', u'LTC', u'PPC', u'XDG']
+                                  , choices=self.preev_coins()
                                   , default=self.default_coin.upper()
                                   , nargs='?'
                                   , help='Which coin to get the ticker for' 
@@ -200,25 +218,23 @@ class Bitcoin(pb.CommandPlugin):
 
     # Required, but w/ a default
     self.preev_parser.add_argument( 'currency'
-                                  , choices=[u'USD', u'EUR', u'GBP', u'CAD', u'AUD', \
-                                             u'XAU', u'XAG', u'XPT', u'XPD']
+                                  , choices=[u'USD', u'EUR', u'GBP', u'CAD', u'AUD'] + \
+                                            list(self.preev_metals())
                                   , default=self.default_currency.upper()
                                   , nargs='?'
                                   , help='Get the avg price'
                                   )
     return self.preev_parser
 
-  def get_fresh_avg_data(self):
-      '''Get up-to-date average data.
-      '''
-      self.last_avg_fetch = datetime.datetime.utcnow()
-      return self.baa.saveAll()
-
+  @pb.nonblocking
   def latest_hash(self, args, irc):
       '''(latest_hash) -- Hash of the current mainnet block
       '''
-      return u'{}'.format(btc.latest_hash())
+      d = self.tip.ready()
+      d.addCallback(lambda _: self.tip.hash)
+      return d.addCallback(self.provider_reply, u'{}')
 
+  @pb.nonblocking
   def preev(self, args, irc):
       '''(preev [-x/--without exchanges] [-c/--coin coin] [currencies])
       Return a ticker as quoted on preev.com.
@@ -233,13 +249,20 @@ class Bitcoin(pb.CommandPlugin):
 
       exchanges = [xchg for xchg in self.preev_exchanges(opts.coin) \
                   if xchg not in opts.without]
-      return self.preev_ticker(opts.currency, opts.coin, exchanges)
+      d = self.market.ready(umarket.Preev.name)
+      return d.addCallback(lambda _: self.preev_ticker(opts.currency, opts.coin,
+                                                      exchanges))
 
   def preev_bases(self):
       '''Returns base currencies returned by preev.
       '''
       return (u'USD', u'EUR')
 
+  def preev_coins(self):
+      '''Returns coins quoted by preev.
+      '''
+      return (u'BTC', u'LTC', u'PPC', u'XDG')
+
   def preev_exchanges(self, coin):
       '''Return all possible preev exchanges for a given coin.
       '''
@@ -263,47 +286,68 @@ class Bitcoin(pb.CommandPlugin):
       '''Return the value quoted on the preev.com for a given currency and list 
       of exchanges.
       '''
-      PREEV_URL = u'http://preev.com/pulse/units:{}+{}/sources:{}'
-      PREEV_URL = PREEV_URL.format(coin.lower(), currency.lower(), u'+'.join(exchanges))
-      log.msg(PREEV_URL)
-      preev = uurl.safe_get([PREEV_URL], None)
-      if preev is not None:
-          preev_dict = json.loads(preev)
-
-          # Special handling of metals
-          if currency.upper() not in self.preev_bases():
-              div_price = preev_dict[currency.lower()]['usd']['other']['last']
-              if div_price is None:
-                  return u'Ticker for {} per {} not available'.format(currency, coin)
-              currency = u'usd'
-          else:
-              div_price = 1.0
-
-          last_vols = []
-          total_vol = 0.0
-          for inner in preev_dict[coin.lower()][currency.lower()].values():
-              last_vols.append((float(inner['last']), float(inner['volume'])))
-              total_vol += last_vols[-1][-1]
-
-          wavg = 0.0
-          for last, vol in last_vols:
-              wavg += last * (vol / total_vol)
-
-          return str(round(wavg / div_price, 2))
+      feeds = [u'{}:{}'.format(umarket.Preev.name, xchg) for xchg in exchanges]
+
+      # Special handling of metals
+      if currency.upper() not in self.preev_bases():
+          metal = self.market.latest(currency, u'USD',
+                                     u'{}:other'.format(umarket.Preev.name))
+          if metal is None or metal.get('last') is None:
+              return u'Ticker for {} per {} not available'.format(currency, coin)
+          div_price = float(metal['last'])
+          currency = u'usd'
       else:
+          div_price = 1.0
+
+      # Average of the exchanges weighted by volume
+      wavg = self.market.vwap(coin, currency, feeds)
+      if wavg is None:
           error = '[Error]: Unable to access preev ticker'
           log.err(error)
           return error
 
+      return str(round(wavg / div_price, 2))
+
+  def preev_units(self):
+      '''Returns the (coin, currency) polled from preev; a
+      metal's price comes with BTC's in it.
+      '''
+      return [(coin.lower(), base.lower()) for coin in self.preev_coins() \
+                                           for base in self.preev_bases()] + \
+             [(u'btc', metal.lower()) for metal in self.preev_metals()]
+
+  def provider_reply(self, answer, fmt):
+      '''Format the answer of the Bitcoin data providers, which
+      is None if none of them answered.
+      '''
+      if answer is None:
+          raise pb.CommandError(u'[Error]: No Bitcoin data provider answered',
+                                pm=False)
+
+      return fmt.format(answer)
+
+  def race_opts(self):
+      '''Options for racing the Bitcoin data providers.
+      '''
+      return { 'hedge': self.hedge_delay
+             , 'timeout': self.provider_timeout
+             }
+
+  @pb.nonblocking
   def total_bcs(self, args, irc):
       '''(totalbcs) -- Total Bitcoins in circulation
       '''
-      return '{:,}'.format(btc.total_bcs())
-            
+      d = btc.total_bcs(**self.race_opts())
+      return d.addCallback(self.provider_reply, u'{:,}')
+
+  @pb.nonblocking
   def tslb(self, args, irc):
       '''(tslb) -- Time since last block on Main Net
       '''
-      return btc.tslb()
+      d = self.tip.ready()
+      d.addCallback(lambda _: btc.time_since(self.tip.ts) \
+                              if self.tip.ts is not None else None)
+      return d.addCallback(self.provider_reply, u'{}')
 
 #-------------------------------------
 #
@@ -3,14 +3,14 @@
 import argparse
 from csv import DictReader
 import datetime
-import itertools
 from operator import itemgetter
-import sys
 
-import requests
+from twisted.internet import defer
 from twisted.python import log
 
 import plugins.PluginBase as pb
+import utils.httpclient as uhttp
+import utils.market as umarket
 
 class CryptoCoinCharts(pb.CommandPlugin):
   def __init__(self, conf):
@@ -29,12 +29,21 @@ class CryptoCoinCharts(pb.CommandPlugin):
     self.coins = {}
     self.pairs = {}
 
-    # Get fresh data
-    self.get_fresh_data()
+    self.names = set()
 
     # Get a list of currencies
     self.get_currencies()
 
+    # Get fresh data
+    self.get_fresh_data()
+
+    # Prices of the pairs asked for are polled by the market,
+    # which commands read
+    self.source = umarket.CryptoCoinCharts(self.api_pairs,
+                                           self.max_watched_pairs)
+    self.market = umarket.market()
+    self.market.add(self.source, self.refresh_rate)
+
   def build_parser(self):
     '''
     Builds a parser for the program.
@@ -112,52 +121,65 @@ class CryptoCoinCharts(pb.CommandPlugin):
     Grab fresh data from the API and saves
     it in class attributes.
 
-    Returns True if grab was successful
-    and False if an error occurred.
+    Returns a Deferred firing with True if grab
+    was successful and False if an error occurred.
     '''
-    try:
-      # Now, grab the pairs data
-      r = requests.get(self.api_list_coins, timeout=5)
+    def save(r):
       if r.status_code != 200:
         log.err('[Error]: Status code {} for listing coins'.\
                     format(r.status_code))
         return False
-      else:
-        self.coins = {}
-        for coind in r.json():
-          # Don't take any coins with zero volume
-          if not float(coind['volume_btc']):
-            continue
-          # Otherwise, save the information
-          self.coins[coind['id']] = {k: v for k,v in coind.iteritems() \
-                                                  if k != 'id'}
 
-        # Also save a list of coin names
-        self.names = {str(x.upper()) for x in self.coins.iterkeys()}
+      self.coins = {}
+      for coind in r.json():
+        # Don't take any coins with zero volume
+        if not float(coind['volume_btc']):
+          continue
+        # Otherwise, save the information
+        self.coins[coind['id']] = {k: v for k,v in coind.iteritems() \
+                                                if k != 'id'}
+
+      # Also save a list of coin names
+      self.names = {str(x.upper()) for x in self.coins.iterkeys()}
 
-        # Finally, get some currencies
-        self.get_currencies()
+      # Save the timestamp
+      self.last_update = datetime.datetime.utcnow() 
 
-        # Save the timestamp
-        self.last_update = datetime.datetime.utcnow() 
+      return True
 
-        return True
     # Any error that occurs connecting to the API
-    except:
-      log.err('[Error]: {}'.format(sys.exc_info()[0]))
+    def failed(failure):
+      log.err(failure, '[Error]: Cannot list CryptoCoinCharts coins')
       return False
 
+    d = uhttp.request('GET', self.api_list_coins, timeout=5)
+    return d.addCallback(save).addErrback(failed)
+
+  @pb.nonblocking
   def rate(self, args, irc):
     '''(ccc [-a/--available] [-n/--long-name] [-s/--short-answer]
     [-v/--verbose] [currencies]) --
     Obtain information from CryptoCoinCharts.
     '''
-    # Get fresh data if needed
+    # Get fresh data if needed, only waiting for it if
+    # there's none yet
     if self.stale():
-      if not self.get_fresh_data():
-        log.err('Failed to obtain fresh API average data')
-        irc.pm = True
-        return '[Error]: Cannot access CryptoCoinCharts API.'
+      d = self.get_fresh_data()
+      if self.last_update is not None:
+        d = defer.succeed(True)
+    else:
+      d = defer.succeed(True)
+
+    return d.addCallback(self.rate_reply, args, irc)
+
+  def rate_reply(self, fresh, args, irc):
+    '''Build the reply to the ccc command once the coins
+    have been listed.
+    '''
+    if not fresh:
+      log.err('Failed to obtain fresh API average data')
+      irc.pm = True
+      return '[Error]: Cannot access CryptoCoinCharts API.'
 
     # Parse the command
     try:
@@ -197,14 +219,12 @@ class CryptoCoinCharts(pb.CommandPlugin):
       return u' | '.join(x for x in reply if x)
 
     # Get the pairs in a useable format
-    pairs = [(currencies[i], currencies[i+1]) for i in range(0, len(currencies), 2)]
-    payload = u','.join(map(lambda x: u'{}_{}'.format(x[0], x[1]), pairs))
+    pairs = [(currencies[i].lower(), currencies[i+1].lower()) \
+                            for i in range(0, len(currencies), 2)]
 
     # Figure out if you need to use pair or pairs
     if len(pairs) > 1:
-      post = irc.pm = True
-    else:
-      post = False
+      irc.pm = True
 
     # Make sure all the pairs are supported
     if not all(map(self.supported, currencies)):
@@ -212,55 +232,49 @@ class CryptoCoinCharts(pb.CommandPlugin):
       reply += ' | Use the -c/--coins option to see all supported'
       return reply
 
-    # Set up data for a request
-    try:
-      # Make the proper request
-      if post:
-        r = requests.post(self.api_pairs, data=payload)
-      else:
-        r = requests.get('{}{}'.format(self.api_pair, payload))
+    # Pairs not yet polled are polled before answering, as
+    # are all of them if their prices are stale
+    if self.source.watch(pairs) or not self.market.feeds(self.source.name):
+      d = self.market.poll(self.source)
+    else:
+      d = defer.succeed(None)
 
-      # Check for valid status code
-      if r.status_code != 200:
-        log.err('[Error]: Status code {} for pairs API'.format(r.status_code))
-        irc.pm = True
-        return '[Error]: Cannot contact CryptoCoinCharts API.'
-
-      # Get all returned pair(s)
-      ret_pairs = r.json if type(r.json) == list else [r.json()]
-
-      # Build the reply
-      replies = []
-      for i, pair in enumerate(ret_pairs):
-        if pair['id'] is None:
-          reply = '[Error]: No response for {}. Try {}'.\
-              format( u' '.join(pairs[i])
-                    , u'{} {}'.format(pairs[i][-1].upper(), pairs[i][0].upper())
-                    )
+    return d.addCallback(self.pairs_reply, pairs, args)
+
+  def pairs_reply(self, _, pairs, args):
+    '''Build the reply of the rates of pairs from the market.
+    '''
+    if not self.market.feeds(self.source.name):
+      return '[Error]: Cannot access CryptoCoinCharts API.'
+
+    replies = []
+    for cfrom, cto in pairs:
+      pair = self.market.latest(cfrom, cto, self.source.name)
+      if pair is None:
+        reply = '[Error]: No response for {}. Try {}'.\
+            format( u'{} {}'.format(cfrom, cto)
+                  , u'{} {}'.format(cto.upper(), cfrom.upper())
+                  )
+      else:
+        if args.short_answer:
+            reply = u'{}'.format(round(float(pair['price']), 8))
         else:
-          if args.short_answer:
-              reply = u'{}'.format(round(float(pair['price']), 8))
-          else:
-              reply = u'{pair}{price}{convert}{v}'.\
-                  format( pair=u'[{}]: '.format(pair['id'].upper())
-                        , price=round(float(pair['price']), 8)
-                        , convert=u' | {} {} for 1 {}'.\
-                            format( round(1.0 / float(pair['price']), 8)
-                                  , pairs[i][0].upper()
-                                  , pairs[i][1].upper()
-                                  ) if not (pairs[i][0] in self.currencies or \
-                                            pairs[i][1] in self.currencies) \
-                                    else ''
-                        , v=u' | [Best Market]: {}'.format(pair['best_market']) \
-                                if args.verbose else u''
-                        )
-        replies.append(reply)
-
-      return u' | '.join(replies)
-    except:
-      log.err('[Error]: {}'.format(sys.exc_info()[0]))
-      irc.pm = True
-      return '[Error]: Cannot contact pairs API.'
+            reply = u'{pair}{price}{convert}{v}'.\
+                format( pair=u'[{}]: '.format(pair['id'].upper())
+                      , price=round(float(pair['price']), 8)
+                      , convert=u' | {} {} for 1 {}'.\
+                          format( round(1.0 / float(pair['price']), 8)
+                                , cfrom.upper()
+                                , cto.upper()
+                                ) if not (cfrom.upper() in self.currencies or \
+                                          cto.upper() in self.currencies) \
+                                  else ''
+                      , v=u' | [Best Market]: {}'.format(pair['best_market']) \
+                              if args.verbose else u''
+                      )
+      replies.append(reply)
+
+    return u' | '.join(replies)
 
   def stale(self):
     '''
@@ -271,7 +285,7 @@ class CryptoCoinCharts(pb.CommandPlugin):
     if not self.last_update:
       return True
 
-    return (datetime.datetime.utcnow() - self.last_update).seconds > 60
+    return (datetime.datetime.utcnow() - self.last_update).total_seconds() > 60
 
   def supported(self, code, include_currencies=True):
     '''
@@ -1,22 +1,22 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import datetime
 import subprocess as sp
 import sys
 import traceback
 import urllib2
 
 from bs4 import BeautifulSoup
-import ipaddress as ip
 from pygoogle import pygoogle   # https://code.google.com/p/pygoogle/
 import pythonwhois as whois
-import requests
 from twisted.python import log
 import wikipedia
 
-from plugins.areacodes import areacodes
 import plugins.PluginBase as pb
+import utils.areacodes as uareacodes
+import utils.forex as uforex
+import utils.httpclient as uhttp
+import utils.resolver as uresolver
 
 class Lookup(pb.CommandPlugin):
   DOJ_URL = 'http://doj.me/?url={}'
@@ -29,23 +29,57 @@ class Lookup(pb.CommandPlugin):
   def __init__(self, conf):
     super(Lookup, self).__init__(conf)
 
+    # Loaded on the first lookup, rather than at startup.
+    # Lookup.conf files copied before these keys were added
+    # don't have them.
+    self.areacode_file = getattr(self, 'areacode_file',
+                                 'plugins/areacodes.txt')
+    self.areacode_max_cities = getattr(self, 'areacode_max_cities', 5)
+    self.areacodes = uareacodes.named(self.areacode_file)
+    self.build_areacode_parser()
+
     self.forex_api = ForexAPI(self.forex_api_key, self.forex_refresh_rate)
     self.geoip_api = GeoIPAPI()
+    self.resolver = uresolver.resolver()
     self.stock_api = StockAPI()
     self.ud_api = UrbanDictionaryAPI()
 
+  @pb.nonblocking
   def areacode(self, args, irc):
-    '''Lookup a NANP area code.
+    '''(areacode [-c/--city city] [-s/--state state] [codes]) --
+    Lookup NANP area codes, or the area codes of a city or of a
+    state, province, or country.
     '''
-    # Change the type of acodes
-    acodes = [int(c) for c in args if \
-                                  c.isdigit()]
+    try:
+      opts = self.areacode_parser.parse_args(args)
+    except ArgParserError, exc:
+      irc.pm = True
+      return str(exc)
+
+    if opts.city:
+      city = u' '.join(opts.city)
+      matches = self.areacodes.city(city, self.areacode_max_cities)
+      if not matches:
+        return u'[{}]: No NANP area codes found'.format(city)
+
+      return u' | '.join(u'[{}]: {}'.format(name, u', '.join(map(str, codes))) \
+                         for name, codes in matches)
+
+    if opts.state:
+      state = u' '.join(opts.state)
+      found = self.areacodes.state(state)
+      if found is None:
+        return u'[{}]: No NANP area codes found'.format(state)
+
+      name, codes = found
+      return u'[{}]: {}'.format(name, u', '.join(map(str, codes)))
 
     # Generate a reply to each of the codes
     replies = []
-    for code in acodes:
-      if code in areacodes:
-        cities, state = areacodes[code][:-1], areacodes[code][-1]
+    for code in [int(c) for c in opts.codes if c.isdigit()]:
+      found = self.areacodes.code(code)
+      if found is not None:
+        state, cities = found
         reply = u'[{}]: {}'.format(code, state if not cities \
             else state + u': ' + u', '.join(cities))
       else:
@@ -55,6 +89,29 @@ class Lookup(pb.CommandPlugin):
 
     return u' | '.join(replies)
 
+  def build_areacode_parser(self):
+    '''Build a parser for the areacode command.
+    '''
+    self.areacode_parser = ArgParser( description='Lookup NANP area codes'
+                                    , add_help=False
+                                    )
+
+    group = self.areacode_parser.add_mutually_exclusive_group()
+    group.add_argument( '-c'
+                      , '--city'
+                      , nargs='+'
+                      , help='Find the area codes of a city'
+                      )
+    group.add_argument( '-s'
+                      , '--state'
+                      , nargs='+'
+                      , help='Find the area codes of a state or province'
+                      )
+    self.areacode_parser.add_argument( 'codes'
+                                     , nargs='*'
+                                     , help='Area codes to look up'
+                                     )
+
   def commands(self):
     return { 'areacode': self.areacode
            , 'dict': self.dictionary
@@ -79,6 +136,7 @@ class Lookup(pb.CommandPlugin):
            , 'wp': self.wikipedia
            }
 
+  @pb.cached(86400)
   def dictionary(self, args, irc):
     '''(dict [word or phrase]) -- Lookup up a word using WordNet.
     '''
@@ -96,26 +154,39 @@ class Lookup(pb.CommandPlugin):
     except:
         log.error('[Error]: dict {}'.format(sys.exc_info()[0]))
 
+  @pb.nonblocking
   def dns(self, args, irc):
-    '''(dns [hostname/IP address]) -- A or PTR record lookup.
+    '''(dns <hostname/IP address> [types]) -- Lookup DNS records of
+    the given types, A/AAAA/MX/NS/PTR/TXT, which default to A, or
+    PTR for an IP address.
     '''
     if not args:
         return u'Missing IP address or hostname'
 
     q = unicode(args[0])
-    cmnd = u'dig +short '
-    rev_cmnd = cmnd + u' -x '
-    o = None
-    try:
-        ip.ip_address(q)
-        o = sp.check_output((rev_cmnd + q).split())
-    except ValueError:
-        pass
+    types = [t.upper() for t in args[1:]]
+    if not types:
+        types = ['PTR'] if uresolver.reverse_name(q) else ['A']
+
+    invalid = [t for t in types if t not in uresolver.TYPES]
+    if invalid:
+        return u'[Error]: Unsupported record types: {}'.\
+                  format(u', '.join(invalid))
+
+    def reply(answers):
+        if len(answers) == 1:
+            answer = u' | '.join(answers[0][1])
+        else:
+            answer = u' | '.join(u'[{}]: {}'.format(t, u', '.join(records)) \
+                                 for t, records in answers if records)
+        return answer if answer else u'No answers found.'
 
-    if o is None:
-        o = sp.check_output((cmnd + q).split())
-    answer = o.rstrip().replace(u'\n', u' | ')
-    return answer if answer else u'No answers found.'
+    def failed(failure):
+        log.err(failure, '[Error]: DNS lookup of {}'.format(q))
+        return u'[Error]: DNS lookup of {} failed'.format(q)
+
+    d = self.resolver.lookup(q, types)
+    return d.addCallbacks(reply, failed)
 
   def doj_me(self, args, irc):
     '''(isitdown [hostname]) -- Check if a given site is up or down according to doj.me.
@@ -124,7 +195,7 @@ class Lookup(pb.CommandPlugin):
         return u'{}{} [URL to check]'.format(irc.fact.prefix, irc.cmnd)
 
     try:
-        r = requests.get(self.DOJ_URL.format(args[0]))
+        r = uhttp.get(self.DOJ_URL.format(args[0]))
         if r.status_code != 200:
             log.err('[Error]: doj.me status code of {}'.format(r.status_code))
             return
@@ -137,6 +208,7 @@ class Lookup(pb.CommandPlugin):
     except:
         log.err('[Error]: doj.me {}'.format(sys.exc_info()[0]))
 
+  @pb.nonblocking
   def forex(self, args, irc):
     '''(forex [-a/--available] [-n/--long-name] [-s/--short-answer]
     [currencies]) -- Given a three letter currency code,
@@ -144,10 +216,10 @@ class Lookup(pb.CommandPlugin):
     currency code is available or get the long name for a currency
     code.
     '''
-    if self.forex_api.stale():
-        if not self.forex_api.get_data():
-            irc.pm = True
-            return '[Error]: Cannot obtain fresh forex API data.'
+    rates = self.forex_api.rates()
+    if rates is None:
+        irc.pm = True
+        return '[Error]: Cannot obtain fresh forex API data.'
 
     try:
         opts = self.forex_api.parser.parse_args(args)
@@ -161,47 +233,48 @@ class Lookup(pb.CommandPlugin):
         for ccode in opts.available:
             reply.append(u'{} is{} supported'.format(ccode,
                                                 '' if ccode.upper() \
-                                                    in self.forex_api.cs \
+                                                    in rates \
                                                       else ' NOT'))
             return u' | '.join(reply)
 
     if opts.long_name:
-        reply = map( lambda x: u'[{}]: {}'.format(x, self.forex_api.cs[x]) \
-                                                  if x in self.forex_api.cs
+        reply = map( lambda x: u'[{}]: {}'.format(x, rates.names[x]) \
+                                                  if x in rates.names
                                                   else ''
                    , opts.long_name
                    )
         return u' | '.join(x for x in reply if x)
 
-    pairs = [(currencies[i], currencies[i+1]) \
+    pairs = [(currencies[i].upper(), currencies[i+1].upper()) \
                          for i in range(0, len(currencies), 2)]
 
+    # Look up every valid pair at once
+    valid = [(cfrom, cto) for cfrom, cto in pairs \
+                          if cfrom in rates and cto in rates]
+    found = dict(zip(valid, rates.rates(valid)))
+
     # Build the reply
     replies = []
     for pair in pairs:
       reply = ''
       cfrom, cto = pair
 
-      error = False
-      if not cfrom.upper() in self.forex_api.cs:
-        reply = '[{}]: Invalid currency code '.format(cfrom)
-        error = True
+      if pair not in found:
+        if not cfrom in rates:
+          reply = '[{}]: Invalid currency code '.format(cfrom)
+        if not cto in rates:
+          reply += '[{}]: Invalid currency code'.format(cto)
 
-      if not cto.upper() in self.forex_api.cs:
-        reply += '[{}]: Invalid currency code'.format(cto)
-        error = True
-
-      if error:
         replies.append(reply)
         continue
 
       if opts.short_answer:
-          reply += '{}'.format(self.forex_api.get_rate(cfrom.upper(), cto.upper()))
+          reply += '{}'.format(round(found[pair], 2))
       else:
           reply += '1 {cfrom} equals {rate} {cto}'.format(\
-              cfrom=self.forex_api.long_name(cfrom),
-              cto=self.forex_api.long_name(cto),
-              rate=self.forex_api.get_rate(cfrom.upper(), cto.upper()))
+              cfrom=rates.long_name(cfrom),
+              cto=rates.long_name(cto),
+              rate=round(found[pair], 2))
 
       replies.append(reply)
 
@@ -217,6 +290,7 @@ class Lookup(pb.CommandPlugin):
 
     return self.geoip_api.lookup(args[0].replace(u'-', u'.'))
 
+  @pb.nonblocking
   def gold(self, args, irc):
     return self.forex(['XAU', 'USD'], irc)
 
@@ -245,6 +319,7 @@ class Lookup(pb.CommandPlugin):
     gs_url = u'http://grooveshark.com/#!/search?q={}'.format(u'+'.join(args))
     return gs_url
 
+  @pb.cached(86400)
   def omdb(self, args, irc):
     '''(omdb [movie title]) --
     Return information about a movie title from the OMDb.
@@ -253,7 +328,7 @@ class Lookup(pb.CommandPlugin):
         return u'[Error]: Missing movie title'
 
     try:
-        r = requests.get(self.OMDB_URL.format(u'+'.join(args)))
+        r = uhttp.get(self.OMDB_URL.format(u'+'.join(args)))
 
         if not r.status_code == 200:
             irc.pm = True
@@ -285,9 +360,11 @@ class Lookup(pb.CommandPlugin):
     irc.who_reply = (None, args[0])
     irc.sendLine('WHO {}'.format(args[0]))
 
+  @pb.nonblocking
   def silver(self, args, irc):
     return self.forex(['XAG', 'USD'], irc)
 
+  @pb.cached(60)
   def stock(self, args, irc):
     '''(stock [-i/--info company] [ticker]) -- 
         By default, lookup data about a given stock ticker.
@@ -302,6 +379,7 @@ class Lookup(pb.CommandPlugin):
     else:
         return self.stock_api.quote(args[0])
 
+  @pb.cached(3600)
   def ud(self, args, irc):
     '''(ud [term/phrase]) -- 
     Return the definitions and examples for a term/phrase on Urban Dictionary
@@ -319,12 +397,12 @@ class Lookup(pb.CommandPlugin):
       raise SyntaxError('Missing key ID')
 
     try:
-      r = requests.get(self.OTP_URL.format(args[0]))
+      r = uhttp.get(self.OTP_URL.format(args[0]))
       pasted = { 'content': r.text
                , 'title': 'OTP for {}'.format(args[0])
                }
 
-      paste = requests.post('http://dpaste.com/api/v2/', data=pasted)
+      paste = uhttp.post('http://dpaste.com/api/v2/', data=pasted)
       soup = BeautifulSoup(paste.text)
 
       title = soup.title.string
@@ -341,40 +419,52 @@ class Lookup(pb.CommandPlugin):
     '''
     return self.otp(['51BD192C9176B0A9'], irc)
 
+  @pb.cached(600)
+  @pb.nonblocking
   def weather(self, args, irc):
     '''(weather [place]) --
     Return weather data about ae particular place.
     '''
     city = urllib2.quote(u' '.join(args))
-    try:
-      # Go get some weather
-      r = requests.get(self.WEATHER_URL.format(city))
 
-      if r.status_code != 200 or not 'main' in r.json():
-        reply = 'No weather data found for {}'.format(\
-                              urllib2.unquote(city).strip())
-        return reply
+    # Go get some weather
+    d = uhttp.request('GET', self.WEATHER_URL.format(city))
+    d.addCallback(self.weather_reply, city)
+    d.addErrback(self.weather_failed)
+    return d
+
+  def weather_failed(self, failure):
+    '''Errback for a weather lookup which failed.
+    '''
+    log.err('[Error]: {}'.format(failure.type))
+    return '[Error]: Cannot contact Weather API.'
+
+  def weather_reply(self, r, city):
+    '''Build the reply to a weather lookup from its response.
+    '''
+    if r.status_code != 200 or not 'main' in r.json():
+      reply = 'No weather data found for {}'.format(\
+                            urllib2.unquote(city).strip())
+      return reply
+    else:
+      rjson = r.json()
+      faren = rjson['main']['temp']
+      cels = round(float(faren - 32) / 1.8, 2)
+
+      reply = u'In {}, {}'.format(\
+          urllib2.unquote(city).strip().title(), rjson['sys']['country'])
+      reply += u' it is currently {}\u00b0F/{}\u00b0C'.format(faren, cels)
+      log.msg(reply)
+
+      descr = rjson['weather'][0]['description']
+      if ' is ' in descr:
+        reply += ' and the {}'.format(descr)
       else:
-        rjson = r.json()
-        faren = rjson['main']['temp']
-        cels = round(float(faren - 32) / 1.8, 2)
-
-        reply = u'In {}, {}'.format(\
-            urllib2.unquote(city).strip().title(), rjson['sys']['country'])
-        reply += u' it is currently {}\u00b0F/{}\u00b0C'.format(faren, cels)
-        log.msg(reply)
-
-        descr = rjson['weather'][0]['description']
-        if ' is ' in descr:
-          reply += ' and the {}'.format(descr)
-        else:
-          reply += ' with {}'.format(descr)
+        reply += ' with {}'.format(descr)
 
-        return reply
-    except:
-        log.err('[Error]: {}'.format(sys.exc_info()[0]))
-        return '[Error]: Cannot contact Weather API.' 
+      return reply
 
+  @pb.cached(21600)
   def whois(self, args, irc):
     '''(whois [domain]) --
     Return whois data for a given domain.
@@ -399,6 +489,7 @@ class Lookup(pb.CommandPlugin):
     except whois.shared.WhoisException:
         return 'Cannot find TLD for {}'.format(args[0])
 
+  @pb.cached(3600)
   def wikipedia(self, args, irc):
       '''(wp [term]) -- 
       Lookup a term on Wikipedia and get summary information.
@@ -433,7 +524,7 @@ class GeoIPAPI(object):
 
     def lookup(self, ip_addr):
         try:
-            r = requests.get(self.GEOIP_URL.format(ip_addr))
+            r = uhttp.get(self.GEOIP_URL.format(ip_addr))
 
             if r.status_code == 200:
                 geoip_dict = r.json()
@@ -452,16 +543,10 @@ class GeoIPAPI(object):
             return '[Error]: Cannot contact GeoIP API.'
 
 class ForexAPI(object):
-    FOREX_LATEST = 'http://openexchangerates.org/api/latest.json?app_id={}'
-    FOREX_CS = 'http://openexchangerates.org/api/currencies.json?app_id={}'
-    FOREX_BASE = 'USD'
     def __init__(self, api_key, refresh_rate):
-        self.forex_latest = self.FOREX_LATEST.format(api_key)
-        self.forex_cs_url = self.FOREX_CS.format(api_key)
-        self.refresh_rate = refresh_rate
-
-        self.last_get = None
-        self.cs = {} # List/dict of forex currencies
+        # Rates are refreshed in the background, by a service
+        # which outlives reloads of the plugin
+        self.service = uforex.named(api_key, refresh_rate=refresh_rate)
         self.build_parser()
 
     def build_parser(self):
@@ -490,44 +575,15 @@ class ForexAPI(object):
                                 , action=EvenAndMinMaxPairs
                                 )
 
-    def get_data(self):
-        try:
-            r = requests.get(self.forex_latest)
-
-            for k, v in r.json().iteritems():
-                setattr(self, 'forex_' + k, v)
-
-            if not self.cs:
-                r = requests.get(self.forex_cs_url)
-                self.cs = r.json()
-
-            self.last_get = datetime.datetime.utcnow()
-            return True
-        except:
-            log.err('[Error]: Forex {}'.format(sys.exc_info()[0]))
-            return False
-
-    def get_rate(self, cfrom, cto):
-        if cto == self.FOREX_BASE:
-            return round(float(1 / self.forex_rates[cfrom]), 2)
-        elif cfrom == self.FOREX_BASE:
-            return round(float(self.forex_rates[cto]), 2)
-
-        from_frac = float(1 / self.forex_rates[cfrom])
-        to_frac = float(self.forex_rates[cto])
-        return round(from_frac * to_frac, 2)
-
-    def long_name(self, cur):
-        '''Return long name of a currency code, or
-        the cur argument if not supported.
+    def rates(self):
+        '''Return the current utils.forex.Rates, or None if none
+        have been fetched.  Stale rates are refreshed in the
+        background, and returned meanwhile.
         '''
-        return self.cs.get(cur, cur)
-
-    def stale(self):
-        if self.last_get is None:
-            return True
+        if self.service.stale():
+            self.service.refresh()
 
-        return (datetime.datetime.utcnow() - self.last_get).seconds > self.refresh_rate
+        return self.service.rates
 
 class StockAPI(object):
     LOOKUP = 'http://dev.markitondemand.com/Api/v2/Lookup/json?input={}'
@@ -540,7 +596,7 @@ class StockAPI(object):
         '''Lookup the ticker info for a company.
         '''
         try:        
-            r = requests.get(self.LOOKUP.format(input_str))
+            r = uhttp.get(self.LOOKUP.format(input_str))
 
             if r.status_code != 200:
                 return u'No data returned for {}'.format(input_str)
@@ -560,7 +616,7 @@ class StockAPI(object):
         '''Get a quote for a given stock symbol.
         '''
         try:        
-            r = requests.get(self.QUOTE.format(symbol))
+            r = uhttp.get(self.QUOTE.format(symbol))
 
             if r.status_code != 200:
                 return u'No data returned for {}'.format(input_str)
@@ -593,7 +649,7 @@ class UrbanDictionaryAPI(object):
         '''Obtain all definitions on the first page of a term's results.
         '''
         try:
-            r = requests.get(self.UD_URL.format(term.replace(u' ', u'+')))
+            r = uhttp.get(self.UD_URL.format(term.replace(u' ', u'+')))
 
             if r.status_code != 200:
                 return u'No definitions found for: {}'.format(term)
@@ -629,7 +685,7 @@ class UrbanDictionaryAPI2(object):
         '''Obtain the first definition for a word or phrase on Urban Dictionary.
         '''
         try:
-            r = requests.get(self.UD_URL.format(term.replace(u' ', u'')))
+            r = uhttp.get(self.UD_URL.format(term.replace(u' ', u'')))
 
             if r.status_code != 200:
                 return u'No definitions found for: {}'.format(term)
@@ -649,7 +705,7 @@ class UrbanDictionaryAPI2(object):
         '''Obtain all definitions on the first page of a term's results.
         '''
         try:
-            r = requests.get(self.UD_SEARCH.format(term.replace(u' ', u'')))
+            r = uhttp.get(self.UD_SEARCH.format(term.replace(u' ', u'')))
 
             if r.status_code != 200:
                 return u'No definitions found for: {}'.format(term)
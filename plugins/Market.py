@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import plugins.PluginBase as pb
+import utils.market as umarket
+
+class Market(pb.CommandPlugin):
+  def __init__(self, conf):
+    super(Market, self).__init__(conf)
+
+    # Polled by the plugins of each source, and only read on
+    # the reactor, which polls it
+    self.market = umarket.market()
+
+  @pb.nonblocking
+  def change(self, args, irc):
+    '''(change [window] [coin] [currency]) --
+    Return the change in price of a coin over a window of time,
+    e.g., 15m, 1h, or 7d, from the prices polled by the bot.
+    '''
+    query = self.query(args)
+    if isinstance(query, basestring):
+      return query
+
+    seconds, coin, currency = query
+    stats = self.market.stats(coin, currency, seconds, self.change_parts)
+    if stats is None:
+      return self.no_ticks(coin, currency, args)
+
+    return u'{}/{} {}: {:+.2%} ({} to {}) | Low: {} | High: {} | VWAP: {}'.\
+              format( coin
+                    , currency
+                    , self.window_name(args)
+                    , stats['change']
+                    , self.price(stats['open'])
+                    , self.price(stats['close'])
+                    , self.price(stats['low'])
+                    , self.price(stats['high'])
+                    , self.price(stats['vwap'])
+                    )
+
+  @pb.nonblocking
+  def chart(self, args, irc):
+    '''(chart [window] [coin] [currency]) --
+    Chart the price of a coin over a window of time, e.g.,
+    15m, 1h, or 7d, from the prices polled by the bot.
+    '''
+    query = self.query(args)
+    if isinstance(query, basestring):
+      return query
+
+    seconds, coin, currency = query
+    stats = self.market.stats(coin, currency, seconds, self.change_parts)
+    if stats is None:
+      return self.no_ticks(coin, currency, args)
+
+    parts = self.market.buckets(coin, currency, seconds, self.chart_width)
+    return u'{}/{} {}: {} | Low: {} | High: {} | {:+.2%}'.\
+              format( coin
+                    , currency
+                    , self.window_name(args)
+                    , umarket.spark(parts)
+                    , self.price(stats['low'])
+                    , self.price(stats['high'])
+                    , stats['change']
+                    )
+
+  def commands(self):
+    return { 'change': self.change
+           , 'chart': self.chart
+           }
+
+  def no_ticks(self, coin, currency, args):
+    return u'No prices of {} in {} in the last {}'.\
+              format(coin, currency, self.window_name(args))
+
+  def price(self, price):
+    '''Format a price to as many places as it needs.
+    '''
+    return u'{:,.2f}'.format(price) if price >= 1 else u'{:.8f}'.format(price)
+
+  def query(self, args):
+    '''Return (seconds, coin, currency) asked for by args,
+    or an error message.
+    '''
+    seconds = umarket.parse_window(self.default_window)
+    rest = list(args)
+    if rest and umarket.parse_window(rest[0]) is not None:
+      seconds = umarket.parse_window(rest.pop(0))
+
+    if not 0 < seconds <= self.max_window:
+      return u'[Error]: The window must be at most {} seconds'.\
+                format(self.max_window)
+
+    if len(rest) > 2:
+      return u'[Error]: Too many arguments'
+
+    coin = (rest[0] if rest else self.default_coin).upper()
+    currency = (rest[1] if len(rest) > 1 else self.default_currency).upper()
+    return seconds, coin, currency
+
+  def window_name(self, args):
+    if args and umarket.parse_window(args[0]) is not None:
+      return args[0].lower()
+
+    return self.default_window
@@ -3,7 +3,6 @@
 from twisted.python import log
 
 import plugins.PluginBase as pb
-from utils.utf8 import encode
 
 class More(pb.CommandPlugin):
   def __init__(self, conf):
@@ -13,22 +12,14 @@ class More(pb.CommandPlugin):
     return { 'more': self.more
            }
 
+  @pb.nonblocking
   def more(self, args, irc):
-    if not hasattr(irc, '_mored'):
-      # For sending long lines of text
-      # Maps a nickname to the text
-      # left to send
-      irc._mored = {}
-
-    if not irc._mored.get(irc.sender):
-      return 
-
-    lines = irc._mored[irc.sender]
-    line = lines.pop(0)
-    suffix = u' \x02({} more messages)\x02'.\
-              format(len(lines)) if lines \
-                else u''
+    '''(more) -- Send the next line of the last long response.
+    '''
+    to = irc.sender if irc.pm else irc.channel
+    line = irc.nextPage(irc.fact.moreKey(to, irc.sender))
+    if line is None:
+      return
 
     log.msg('more: {}'.format(line))
-    irc.msg(irc.sender if irc.pm else irc.channel,
-                          encode(u'{}{}'.format(line, suffix)))
+    irc.msg(to, line, merge=False)
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import utils.store as ustore
+from utils.triggers import ALWAYS
+
 class PluginBase(object):
     def __init__(self, conf):
         '''
@@ -11,6 +14,26 @@ class PluginBase(object):
         for k, v in conf.iteritems():
             setattr(self, k, v)
 
+    def table(self, name=None, data=None):
+        '''
+        Return a key-value table of the plugin's which is
+        saved in the background and kept across reloads and
+        restarts, in the store the bot opened at its
+        store_path.  See utils.store.Table.
+
+        Parameters
+        ----------
+            name: string
+                Name of the table, defaulting to the name of
+                the plugin's class
+
+            data: dict-like
+                Where the table is kept in memory; defaults to
+                a dict
+        '''
+        store = ustore.named('plugins')
+        return store.table(name or self.__class__.__name__, data)
+
 class CommandPlugin(PluginBase):
     def __init__(self, conf):
         '''
@@ -75,6 +98,10 @@ class LinePlugin(PluginBase):
         If True is returned the reponse must be saved as
         a unicode object in irc.response
 
+        Plugins whose response takes time to build may
+        instead return a Deferred firing with the response
+        as a unicode object, or None if there isn't one.
+
         Parameters
         ----------
             msg : string
@@ -85,6 +112,68 @@ class LinePlugin(PluginBase):
         '''
         raise NotImplementedError
 
+    def triggers(self):
+        '''
+        Return a list of what a privmsg must contain for
+        hasResponse to be called with it.  Each entry is
+        either a literal substring, a compiled regex, or
+        ALWAYS; any one of them matching is enough.
+
+        The triggers of every plugin are checked at once, so
+        cheap triggers save the cost of calling hasResponse
+        on lines which could never have a response.
+        '''
+        return [ALWAYS]
+
+def cached(ttl, negative_ttl=None, key=None):
+    '''
+    Decorator for command handlers whose response depends
+    only on their arguments, so can be reused for ttl seconds
+    instead of calling the handler again.
+
+    Errors, i.e., a CommandError or a response which is empty
+    or starts with [Error], are reused for negative_ttl
+    seconds, defaulting to the bot's command_negative_ttl.
+
+    Parameters
+    ----------
+        ttl: float
+            Seconds a response is reused for
+
+        negative_ttl: float
+            Seconds an error is reused for
+
+        key: callable
+            Turns the list of args into the key responses are
+            cached under; defaults to normalize_args
+    '''
+    def decorate(handler):
+        handler.cache_ttl = ttl
+        handler.cache_negative_ttl = negative_ttl
+        handler.cache_key = key or normalize_args
+        return handler
+
+    return decorate
+
+def nonblocking(handler):
+    '''
+    Decorator for command handlers which never block, but
+    return a Deferred firing with their response instead,
+    e.g., ones built on utils.httpclient.request.
+
+    These handlers are run on the reactor thread rather than
+    the command thread pool.
+    '''
+    handler.nonblocking = True
+    return handler
+
+def normalize_args(args):
+    '''
+    Cache key for a command's args which ignores case
+    and spacing.
+    '''
+    return u' '.join(args).lower()
+
 class CommandError(Exception):
     def __init__(self, message, pm=True):
         # Call the base class constructor with the parameters it needs
@@ -3,10 +3,10 @@
 import random
 
 from bs4 import BeautifulSoup
-import requests
 from twisted.python import log
 
 import plugins.PluginBase as pb
+import utils.httpclient as uhttp
 
 class Porn(pb.CommandPlugin):
   CB_URL = 'http://chaturbate.com/affiliates/api/' + \
@@ -44,7 +44,7 @@ class Porn(pb.CommandPlugin):
         heads = {"User-Agent" : \
                 "Mozilla/5.0 (X11; Linux x86_64; rv:34.0) " + \
                 "Gecko/20100101 Firefox/34.0"}
-        users = requests.get(self.CB_URL, headers=heads).json()
+        users = uhttp.get(self.CB_URL, headers=heads).json()
         for user in users:
             if un.lower() == user['username']:
                 cb_url = 'https://www.chaturbate.com/{}'.format(un.lower())
@@ -85,7 +85,7 @@ class Porn(pb.CommandPlugin):
                 "Mozilla/5.0 (X11; Linux x86_64; rv:34.0) " + \
                 "Gecko/20100101 Firefox/34.0"}
         try:
-            r = requests.get(url, headers=heads)
+            r = uhttp.get(url, headers=heads)
 
             if r.status_code != 200:
                 return u'[Error]: /r/{} does not exist'.format(args[0])
@@ -135,7 +135,7 @@ class Porn(pb.CommandPlugin):
     '''Return a link to a random porn pic from pornpicdumps
     '''
     try:
-        r = requests.get(self.PORN_PIC_URL)
+        r = uhttp.get(self.PORN_PIC_URL)
         if not r.status_code == 200:
             return u'[Error]: Invalid response from porn pic API'
 
@@ -150,7 +150,7 @@ class Porn(pb.CommandPlugin):
     '''Return a link to a random porn pic from xxxpicdump
     '''
     try:
-        r = requests.get(self.PORN_PIC_URL2)
+        r = uhttp.get(self.PORN_PIC_URL2)
         if not r.status_code == 200:
             return u'[Error]: Invalid response from porn pic API'
 
@@ -165,7 +165,7 @@ class Porn(pb.CommandPlugin):
     '''Return a link to a random porn video from boyshaveapenisgirlshaveavagina
     '''
     try:
-        r = requests.get(self.PORN_VID_URL)
+        r = uhttp.get(self.PORN_VID_URL)
 
         if not r.status_code == 200:
             return u'[Error]: Invalid response from porn video API'
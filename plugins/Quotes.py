@@ -8,10 +8,10 @@ import traceback
 
 import bashquote as bq
 from bs4 import BeautifulSoup
-import requests
 from twisted.python import log
 
 import plugins.PluginBase as pb
+import utils.httpclient as uhttp
 
 class Quotes(pb.CommandPlugin):
   BIBLE_URL = 'http://labs.bible.org/api/?passage={}'
@@ -84,7 +84,7 @@ class Quotes(pb.CommandPlugin):
                                         u'+'.join(args))
       bible_url += '&formatting=plain'
 
-      response = requests.get(bible_url)
+      response = uhttp.get(bible_url)
       if response.status_code == 200:
         return response.text
       else:
@@ -104,7 +104,7 @@ class Quotes(pb.CommandPlugin):
     '''
     # Make a request to the page
     try:
-      r = requests.get(self.CHUCK_NORRIS_API)
+      r = uhttp.get(self.CHUCK_NORRIS_API)
 
       # Check for a successful GET
       if not r.status_code == 200:
@@ -136,9 +136,9 @@ class Quotes(pb.CommandPlugin):
 
     try:
         if surreal:
-            r = requests.get(self.SURREAL_URL)
+            r = uhttp.get(self.SURREAL_URL)
         else:
-            r = requests.get(self.COMPLIMENT_URL)
+            r = uhttp.get(self.COMPLIMENT_URL)
         if r.status_code != 200:
             log.err('[Error]: Status code of {} for compliment'.format(r.status_code))
             return
@@ -159,7 +159,7 @@ class Quotes(pb.CommandPlugin):
     '''Elizabethan insult from quandyfactory.com
     '''
     try:
-        r = requests.get(self.EI_URL)
+        r = uhttp.get(self.EI_URL)
         if r.status_code != 200:
             log.err('[Error]: Status code of {} for ei'.format(r.status_code))
             return
@@ -177,7 +177,7 @@ class Quotes(pb.CommandPlugin):
     '''Random euphemism
     '''
     try:
-        r = requests.get(self.EUPHEMISM_URL)
+        r = uhttp.get(self.EUPHEMISM_URL)
         if r.status_code != 200:
             log.err('[Error]: Status code of {} for euphemism'.format(r.status_code))
             return
@@ -223,7 +223,7 @@ class Quotes(pb.CommandPlugin):
         if random.random() < 0.5:
             i = random.choice(self.insult_list)
         else:
-            r = requests.get(self.INSULTS_GEN_URL)
+            r = uhttp.get(self.INSULTS_GEN_URL)
             if not r.status_code == 200:
                 log.err('[Error]: Insult status code {}'.format(r.status_code))
                 return u'Your mom is a fucking whore, did I ever tell you that?'
@@ -246,7 +246,7 @@ class Quotes(pb.CommandPlugin):
     '''(joke) -- Random joke from goodbadjokes.com
     '''
     try:
-        r = requests.get(self.JOKE_URL)
+        r = uhttp.get(self.JOKE_URL)
         if r.status_code != 200:
             log.err('Error]: Status code of {} for joke'.format(r.status_code))
             return
@@ -265,7 +265,7 @@ class Quotes(pb.CommandPlugin):
     '''(li [nickname]) -- Lutheran insult from ergofabulous.org
     '''
     try:
-        r = requests.get(self.LI_URL)
+        r = uhttp.get(self.LI_URL)
         if r.status_code != 200:
             log.err('[Error]: Status code of {} for li'.format(r.status_code))
             return
@@ -287,7 +287,7 @@ class Quotes(pb.CommandPlugin):
 
   def north_korean_insult(self, args, irc):
     try:
-        r = requests.get(self.NKI_URL)
+        r = uhttp.get(self.NKI_URL)
         if r.status_code != 200:
             log.err('[Error]: Status code of {} for nki'.format(r.status_code))
             return
@@ -305,7 +305,7 @@ class Quotes(pb.CommandPlugin):
       '''(pickup [nick]) -- Random pickup line
       '''
       try:
-          r = requests.get(self.PICKUP_LINES_URL)
+          r = uhttp.get(self.PICKUP_LINES_URL)
           if not r.status_code == 200:
               return '[Error]: Invalid response from pickuplinegen.com.'
 
@@ -323,7 +323,7 @@ class Quotes(pb.CommandPlugin):
     '''Random Quran quote
     '''
     try:
-      r = requests.get(self.QURAN_URL)
+      r = uhttp.get(self.QURAN_URL)
       if not r.status_code == 200:
         return '[Error]: Invalid response from Quran API.' 
 
@@ -340,7 +340,7 @@ class Quotes(pb.CommandPlugin):
     '''(si [nick]) -- Random Shakespearian insult
     '''
     try:
-        r = requests.get(self.SI_URL)
+        r = uhttp.get(self.SI_URL)
         if r.status_code != 200:
             log.err('[Error]: Status code of {} for si'.format(r.status_code))
             return
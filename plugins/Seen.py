@@ -1,87 +1,148 @@
 # -*- coding: utf-8 -*-
 
+from array import array
+import calendar
 import cPickle as pickle
 from datetime import datetime
 import os
+import sys
+import time
 import zlib
 
 from dateutil.relativedelta import relativedelta 
 
 import plugins.PluginBase as pb
+import utils.history as uhistory
+import utils.journal as ujournal
+from utils.utf8 import decode
 
 class Seen(pb.LinePlugin, pb.CommandPlugin):
   def __init__(self, conf):
     super(Seen, self).__init__(conf)
 
+    # Maps (channel, nick) -> (epoch seconds, msg) of the last
+    # line seen, least recently seen first, saved in the
+    # background and kept across reloads
+    self.seend = self.table('seen', data=SeenTable(self.max_msg_bytes))
+    self.importSeenJournal()
+    self.importSeenDict()
+    self.evict()
+
+    # The last few lines of each nick, for searching
+    self.history = uhistory.named( self.history_path
+                                 , lines_per_nick=self.history_lines
+                                 , flush_interval=self.history_flush_interval
+                                 , flush_threshold=self.history_flush_threshold
+                                 )
+
   def commands(self):
     return { 'seen': self.seen
            }
  
-  def deleteOldestN(self, n, irc):
-    '''Delete the oldest n seen messages.
+  def evict(self):
+    '''Delete the least recently seen messages until there are
+    at most max_seen, taking at most max_seen_bytes.
     '''
-    if not hasattr(irc, '_seend'):
-        return
-
-    entries = []
-    for chan in irc._seend:
-        for nick in irc._seend[chan]:
-            entries.append((chan, nick, irc._seend[chan][nick][0]))
-
-    entries_sorted = sorted(entries, key=lambda x: x[-1])
-    for i, entry in enumerate(entries_sorted):
-        if i >= n: 
-            break
-
-        chan, nick, _ = entry
-        del irc._seend[chan][nick]
+    data = self.seend.data
+    while len(data) > self.max_seen or data.size > self.max_seen_bytes:
+        self.seend.delete(data.oldest())
 
   def hasResponse(self, msg, irc):
     '''Hooks this method to save when a user
     was last seen.
     '''
-    if not hasattr(irc, '_seend'):
-      irc._seend = {}
-
     # Don't save info for PMs
-    if irc.sender == irc.channel:
+    if irc.pm:
       return False
 
-    # Check for the size
-    if self.totalSeen(irc) >= self.max_seen:
-        self.deleteOldestN(self.max_seen / 2, irc)
+    self.seend.set((irc.channel, irc.sender), (int(time.time()), msg))
+    self.history.add(irc.channel, irc.sender, msg)
+    self.evict()
 
-    if irc.channel in irc._seend:
-      irc._seend[irc.channel][irc.sender] = (datetime.utcnow(), msg)
-    else:
-      irc._seend[irc.channel] = {irc.sender: (datetime.utcnow(), msg)}
+  def importSeenDict(self):
+    '''Import the pickled seen dict older versions saved
+    on every line, if there's nothing newer.
+    '''
+    if len(self.seend) or not os.path.exists(self.pickle_path):
+        return
 
-    self.saveSeenDict(irc)
+    with open(self.pickle_path, 'rb') as pf:
+        seend = pickle.loads(zlib.decompress(pf.read()))
+
+    entries = [((chan, nick), seend[chan][nick]) \
+               for chan in seend for nick in seend[chan]]
+    with self.seend.store.batch():
+      for key, (dt, msg) in sorted(entries, key=lambda e: e[1][0]):
+          self.seend.set(key, (calendar.timegm(dt.utctimetuple()), msg))
+
+    self.seend.flush()
 
-  def loadSeenDict(self, irc):
-    '''Load the pickled seend from the
-    bot's last run.
+  def importSeenJournal(self):
+    '''Import the journal older versions saved seen messages
+    to, if there's nothing newer.
     '''
-    if not os.path.exists(self.pickle_path):
-        if not hasattr(irc, '_seend'):
-            irc._seend = {}
+    if len(self.seend) or not os.path.exists(self.journal_path):
         return
 
-    with open(self.pickle_path, 'rb') as pf:
-        irc._seend = pickle.loads(zlib.decompress(pf.read()))
+    journal = ujournal.Journal(self.journal_path, data=SeenTable())
+    journal.load()
+    with self.seend.store.batch():
+      for key, value in journal.data.iteritems():
+          self.seend.set(key, value)
+
+    self.seend.flush()
 
-  def saveSeenDict(self, irc):
-    '''Save the seen dict to the pickled file.
+  def lastLine(self, row, fmt, none):
+    '''Callback building the reply for a line found in the
+    history, or none if nothing was found.
     '''
-    with open(self.pickle_path, 'wb+') as pf:
-        pf.write(zlib.compress(pickle.dumps(irc._seend)))
+    if row is None:
+      return none
+
+    nick, chan, ts, msg = row
+    return fmt.format(nick=nick, chan=chan, msg=msg,
+                      time=self.timeAgo(datetime.utcfromtimestamp(ts)))
+
+  def matchingNicks(self, rows, glob):
+    '''Callback building the reply for the nicks matching a glob.
+    '''
+    if not rows:
+      return u'I have not seen anyone matching {}'.format(glob)
+
+    return u'Seen matching {}: {}'.format(glob, u', '.join(
+              u'{} ({} {})'.format(nick, chan,
+                                   self.timeAgo(datetime.utcfromtimestamp(ts)))
+              for nick, chan, ts in rows))
 
+  @pb.nonblocking
   def seen(self, args, irc):
-    '''(seen [channel] <nick>) -- Returns
-    the last time <nick> was seen in a given
+    '''(seen [channel] <nick> | -a <nick> | -g <glob> | -s <words>) --
+    Returns the last time <nick> was seen in a given
     channel. [channel] is only required when
-    the command is used in a PM. All times in UTC.
+    the command is used in a PM. -a finds <nick> in any
+    channel, -g finds nicks matching a glob, e.g., bane*,
+    and -s finds who last said <words>. All times in UTC.
     '''
+    if args and args[0] in (u'-a', u'-g', u'-s'):
+      if len(args) == 1:
+        return u'[Error]: seen {} <{}>'.format(args[0],
+                  {u'-a': u'nick', u'-g': u'glob', u'-s': u'words'}[args[0]])
+
+      if args[0] == u'-a':
+        d = self.history.lastSeen(args[1])
+        d.addCallback(self.lastLine,
+            u'{nick} was last seen in {chan} {time}: <{nick}> {msg}',
+            u'I have not seen {}'.format(args[1]))
+      elif args[0] == u'-g':
+        d = self.history.matching(args[1])
+        d.addCallback(self.matchingNicks, args[1])
+      else:
+        d = self.history.search(args[1:])
+        d.addCallback(self.lastLine,
+            u'{nick} said that in {chan} {time}: <{nick}> {msg}',
+            u'Nobody has said {}'.format(u' '.join(args[1:])))
+      return d
+
     if not args or (len(args) == 1 and irc.pm):
       return u'[Error]: seen [channel] <nick>'
 
@@ -90,18 +151,21 @@ class Seen(pb.LinePlugin, pb.CommandPlugin):
     else:
       channel, nick = irc.channel, args[0]
 
-    if not hasattr(irc, '_seend'):
-      irc._seend = {}
- 
     if not channel in irc.channels:
       return u'I am not in {}'.format(channel)
 
-    if not channel in irc._seend \
-        or not nick in irc._seend[channel]:
+    if not (channel, nick) in self.seend:
           return u'I have not seen {} in {}'.format(nick, channel)
 
-    # Get the datetime and the relative delta
-    dt, msg = irc._seend[channel][nick]
+    ts, msg = self.seend.get((channel, nick))
+    reply = u'{nick} was last seen in {chan} {time}: <{nick}> {msg}'.\
+        format(nick=nick, chan=channel, msg=msg,
+               time=self.timeAgo(datetime.utcfromtimestamp(ts)))
+    return reply
+
+  def timeAgo(self, dt):
+    '''Return how long ago a UTC datetime was, e.g., 2 hours 5 minutes ago.
+    '''
     rd = relativedelta(datetime.utcnow(), dt)
 
     # Build the time string
@@ -109,17 +173,224 @@ class Seen(pb.LinePlugin, pb.CommandPlugin):
     for attr in ('years', 'months', 'days', 'hours', 'minutes', 'seconds'):
         if getattr(rd, attr) != 0:
             time.append('{} {}'.format(getattr(rd, attr), attr))
-    time = '{} ago'.format(u' '.join(time) if time else u'0 seconds')
-    
-    reply = u'{nick} was last seen in {chan} {time}: <{nick}> {msg}'.\
-        format(nick=nick, chan=channel, time=time, msg=msg)
-    return reply
+    return '{} ago'.format(u' '.join(time) if time else u'0 seconds')
+
+  def triggers(self):
+    '''Every line is needed to know when a user was last seen.
+    '''
+    return [pb.ALWAYS]
+
+#-------------------------------------
+#
+#    Helper Classes and Functions
+#
+#-------------------------------------
+def utf8(name):
+  '''Return a channel or nick as UTF-8, as IRC gives them as
+  bytes in whatever encoding the client used.
+  '''
+  if not isinstance(name, unicode):
+    name = decode(name)
+
+  return name.encode('utf-8')
+
+class SeenTable(object):
+  '''Compact LRU map of (channel, nick) -> (epoch seconds, msg).
+
+  Channels and nicks are interned as ids of their UTF-8,
+  shared by every entry and freed once unused.  Each entry is
+  a record in a set of arrays, holding its ids, its timestamp,
+  and its neighbours in least recently set order, plus its msg
+  encoded as UTF-8 and cut to max_msg_bytes.  Entries are
+  found by an int made from their ids.
+  '''
+  # Rough bytes taken by each record besides its msg: its
+  # place in the arrays, its key and slot in records, and
+  # its share of the interned names
+  RECORD_BYTES = 150
+
+  def __init__(self, max_msg_bytes=None):
+    self.max_msg_bytes = max_msg_bytes
+
+    # Interned UTF-8 names: name -> id, id -> name, id -> uses
+    self.ids = {}
+    self.names = []
+    self.uses = array('I')
+    self.free_ids = []
+    self.names_size = 0
+
+    # Records, by their index in each array, and the first
+    # and last in least recently set order
+    self.records = {}
+    self.ts = array('I')
+    self.prev = array('i')
+    self.next = array('i')
+    self.channels = array('I')
+    self.nicks = array('I')
+    self.msgs = []
+    self.free_records = []
+    self.first = self.last = -1
+    self.msgs_size = 0
 
-  def totalSeen(self, irc):
-    '''Return the total seen messages.
+  def __contains__(self, key):
+    return self.key(key, add=False) in self.records
+
+  def __delitem__(self, key):
+    k = self.key(key, add=False)
+    r = self.records.pop(k)
+    self.unlink(r)
+    self.msgs_size -= sys.getsizeof(self.msgs[r])
+    self.msgs[r] = None
+    self.free_records.append(r)
+
+    self.release(k >> 32)
+    self.release(k & 0xffffffff)
+
+  def __getitem__(self, key):
+    r = self.records[self.key(key, add=False)]
+    return int(self.ts[r]), self.msgs[r].decode('utf-8', 'ignore')
+
+  def __len__(self):
+    return len(self.records)
+
+  def __setitem__(self, key, value):
+    ts, msg = value
+    msg = msg.encode('utf-8')[:self.max_msg_bytes]
+
+    if key in self:
+      r = self.records[self.key(key, add=False)]
+      self.unlink(r)
+      self.msgs_size -= sys.getsizeof(self.msgs[r])
+    else:
+      k = self.key(key)
+      if self.free_records:
+        r = self.free_records.pop()
+      else:
+        r = len(self.msgs)
+        self.ts.append(0)
+        self.prev.append(-1)
+        self.next.append(-1)
+        self.channels.append(0)
+        self.nicks.append(0)
+        self.msgs.append(None)
+
+      self.records[k] = r
+      self.channels[r], self.nicks[r] = k >> 32, k & 0xffffffff
+
+    self.ts[r] = ts
+    self.msgs[r] = msg
+    self.msgs_size += sys.getsizeof(msg)
+
+    # Now the most recently set
+    self.prev[r], self.next[r] = self.last, -1
+    if self.last == -1:
+      self.first = r
+    else:
+      self.next[self.last] = r
+    self.last = r
+
+  def copy(self):
+    '''Return a copy, made cheaply from copies of the arrays
+    and lists, for snapshotting.
+    '''
+    table = SeenTable(self.max_msg_bytes)
+    table.__dict__.update(self.__dict__)
+    for attr in ('ids', 'records'):
+      setattr(table, attr, getattr(self, attr).copy())
+    for attr in ('names', 'uses', 'free_ids', 'ts', 'prev', 'next',
+                 'channels', 'nicks', 'msgs', 'free_records'):
+      setattr(table, attr, getattr(self, attr)[:])
+    return table
+
+  def get(self, key, default=None):
+    return self[key] if key in self else default
+
+  def id(self, name):
+    '''Return the id of an interned name, interning it if needed.
     '''
-    if not hasattr(irc, '_seend'):
-        return 0
+    if name in self.ids:
+      i = self.ids[name]
+      self.uses[i] += 1
+      return i
 
-    total = sum(map(len, irc._seend.values()))
-    return total
+    if self.free_ids:
+      i = self.free_ids.pop()
+      self.names[i], self.uses[i] = name, 1
+    else:
+      i = len(self.names)
+      self.names.append(name)
+      self.uses.append(1)
+
+    self.ids[name] = i
+    self.names_size += sys.getsizeof(name)
+    return i
+
+  def iteritems(self):
+    '''Yield the entries, least recently set first.
+    '''
+    r = self.first
+    while r != -1:
+      yield self.name(r), \
+            (int(self.ts[r]), self.msgs[r].decode('utf-8', 'ignore'))
+      r = self.next[r]
+
+  def key(self, key, add=True):
+    '''Return the int an entry is found by, or None if either
+    name isn't interned and add is False.
+    '''
+    channel, nick = [utf8(name) for name in key]
+    if add:
+      return self.id(channel) << 32 | self.id(nick)
+
+    if channel not in self.ids or nick not in self.ids:
+      return None
+
+    return self.ids[channel] << 32 | self.ids[nick]
+
+  def name(self, r):
+    '''Return the (channel, nick) of a record.
+    '''
+    return (self.names[self.channels[r]].decode('utf-8'),
+            self.names[self.nicks[r]].decode('utf-8'))
+
+  def oldest(self):
+    return self.name(self.first)
+
+  def pop(self, key, default=None):
+    if key not in self:
+      return default
+
+    value = self[key]
+    del self[key]
+    return value
+
+  def release(self, i):
+    '''Stop using an interned name, freeing it if it's unused.
+    '''
+    self.uses[i] -= 1
+    if not self.uses[i]:
+      del self.ids[self.names[i]]
+      self.names_size -= sys.getsizeof(self.names[i])
+      self.names[i] = None
+      self.free_ids.append(i)
+
+  @property
+  def size(self):
+    '''Rough size in bytes of the records and names.
+    '''
+    return self.msgs_size + self.names_size + \
+           len(self.records) * self.RECORD_BYTES
+
+  def unlink(self, r):
+    '''Take a record out of least recently set order.
+    '''
+    prev, next = self.prev[r], self.next[r]
+    if prev == -1:
+      self.first = next
+    else:
+      self.next[prev] = next
+
+    if next == -1:
+      self.last = prev
+    else:
+      self.prev[next] = prev
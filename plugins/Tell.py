@@ -1,67 +1,81 @@
 # -*- coding: utf-8 -*-
-import cPickle as pickle
 from datetime import datetime
-import os
-import zlib
 
 from twisted.python import log
 
 import plugins.PluginBase as pb
-from utils.utf8 import encode
+import utils.tells as utells
+from utils.utf8 import decode, encode
 
-class Tell(pb.CommandPlugin):
+class Tell(pb.LinePlugin, pb.CommandPlugin):
   def __init__(self, conf):
     super(Tell, self).__init__(conf)
 
+    # Messages waiting for nicks, kept across reloads
+    self.tells = utells.named( self.db_path
+                             , max_age=self.max_age_days * 86400
+                             , max_per_sender=self.max_per_sender
+                             , max_per_nick=self.max_per_nick
+                             , expire_interval=self.expire_interval
+                             )
+
   def commands(self):
     return { 'tell': self.tell
            }
 
-  def loadTellDict(self, irc):
-    '''Load the tell dict from disk.
+  def deliver(self, nick, irc):
+    '''Send nick any messages waiting for them.
     '''
-    if not os.path.exists(self.pickle_path):
-        if not hasattr(irc, '_telld'):
-            irc._telld = {}
-        return
+    if not self.tells.hasWaiting(nick):
+      return
+
+    def send(tells):
+      for src, msg, ts in tells:
+        irc.msg(encode(nick), encode(u'{} said at {} UTC: {}'.format(src,
+                  datetime.utcfromtimestamp(ts).strftime('%a %b %d %H:%M:%S'),
+                  msg)))
 
-    with open(self.pickle_path, 'rb') as pf:
-        irc._telld = pickle.loads(zlib.decompress(pf.read()))
+    d = self.tells.take(nick)
+    d.addCallback(send)
+    d.addErrback(log.err, '[Error]: Cannot deliver tells to {}'.format(encode(nick)))
 
-  def saveTellDict(self, irc):
-    '''Save the tell dict to disk.
+  def hasResponse(self, msg, irc):
+    '''Deliver messages to users who speak before they're
+    seen joining.
     '''
-    if not hasattr(irc, '_telld'):
-        return
+    self.deliver(decode(irc.sender), irc)
+    return False
 
-    with open(self.pickle_path, 'wb') as pf:
-        pf.write(zlib.compress(pickle.dumps(irc._telld)))
+  def queued(self, tell_id, src, nick, irc):
+    '''Callback checking whether the user just told something
+    is online, which the WHO reply handler answers.
+    '''
+    irc._tell_check = (src, nick, tell_id)
+    irc.who_reply = (None, nick)
+    irc.sendLine('WHO {}'.format(encode(nick)))
 
+  @pb.nonblocking
   def tell(self, args, irc):
     '''(tell nickname message) --
-    Tell a user something for later. Only one
-    message is queued per nick. For the message to
-    arrive, the nick must join a channel the bot is
-    on. Does not work if the user is currently online.
+    Tell a user something for later. Messages are
+    delivered when the nick joins a channel the bot is
+    on, or speaks in one. Does not work if the user
+    is currently online.
     '''
     if len(args) < 2:
       return u'[Error]: tell [nickname] [message]'
 
-    # Create the telld if it doesn't exist
-    if not hasattr(irc, '_telld'):
-      # For telling users messages
-      # Maps a nickname to the text
-      # to tell them
-      irc._telld = {}
-
-    # Save the nick, sender, and msg to the telld
     nick, msg = args[0], u' '.join(args[1:])
-    irc._telld[nick] = (irc.sender, msg, datetime.utcnow())
+    d = self.tells.add(decode(irc.sender), nick, msg)
+    d.addCallback(self.queued, irc.sender, nick, irc)
+
+    def overQuota(failure):
+      failure.trap(utells.QuotaExceeded)
+      return u'[Error]: {}'.format(failure.value)
 
-    # Save the telld to disk
-    self.saveTellDict(irc)
+    return d.addErrback(overQuota)
 
-    # Check to see if the user is online
-    irc._tell_check = (irc.sender, nick)
-    irc.who_reply = (None, args[0])
-    irc.sendLine('WHO {}'.format(nick))
+  def triggers(self):
+    '''Only needed to deliver messages on a user's first line.
+    '''
+    return [pb.ALWAYS] if self.deliver_on_message else []
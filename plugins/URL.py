@@ -1,20 +1,27 @@
 # -*- coding: utf-8 -*-
 
+from HTMLParser import HTMLParser
 import json
 import re
 import time
 import traceback
 import sys
+import urlparse
 
 import bitly_api
 from bs4 import BeautifulSoup
 import pafy
-import requests
+from twisted.internet import defer, threads
 from twisted.python import log
 
 import plugins.PluginBase as pb
+import utils.cache as ucache
+from utils.deferreds import DeadlineExceeded, deadline
+import utils.httpclient as uhttp
+from utils.utf8 import decode
 
 class URL(pb.LinePlugin, pb.CommandPlugin):
+  HTML_TYPES = ('text/html', 'application/xhtml+xml')
   GOOGLE_SHORTEN = 'https://www.googleapis.com/urlshortener/v1/url'
   URL_RE = re.compile(r'https?://[^\s<>"]+|www\.[^\s<>"]+')
   YT_RE = re.compile(r'^(https?\:\/\/)?((www\.)?youtube\.com|youtu\.?be)\/.+$')
@@ -26,9 +33,39 @@ class URL(pb.LinePlugin, pb.CommandPlugin):
     # Create a bitly shortener object
     self.bitly = bitly_api.Connection(self.bitly_un, self.bitly_api_key)
 
+    # Titles, YouTube data, and shortened URLs already looked up,
+    # kept across reloads and, if cache_path is set, restarts
+    self.cache = ucache.named( 'url', self.cache_max_entries
+                             , max_bytes=self.cache_max_bytes
+                             , path=self.cache_path
+                             , save_interval=self.cache_save_interval
+                             )
+
+  def cached(self, kind, url, fetch, *args):
+    '''Return a Deferred firing with the kind of data cached for
+    url, calling fetch with args to look it up on a miss.
+
+    A None result is cached for negative_ttl seconds, so URLs
+    which can't be looked up aren't retried on every mention.
+    Lookups which fail, e.g., by running out of time, aren't
+    cached at all.
+    '''
+    key = (kind, normalize_url(url))
+    value = self.cache.get(key)
+    if value is not ucache.MISSING:
+        return defer.succeed(value)
+
+    def store(value):
+        ttl = self.cache_ttls[kind] if value is not None else self.negative_ttl
+        self.cache.set(key, value, ttl)
+        return value
+
+    return defer.maybeDeferred(fetch, *args).addCallback(store)
+
   def commands(self):
     return { 'shorten': self.shorten
            , 'unshorten': self.unshorten
+           , 'urlcache': self.urlCache
            , 'yt': self.ytSearch
            }
 
@@ -38,43 +75,54 @@ class URL(pb.LinePlugin, pb.CommandPlugin):
         - A URL (could be many)
             -- If YouTube, print out data
             -- Otherwise, print out the title
+
+    All URLs are looked up at once, at most max_concurrent_urls
+    at a time.  Returns a Deferred firing with the responses, in
+    the order of the URLs, leaving out any not ready within
+    url_deadline seconds.
     '''
     # Look for all URLs in the msg
     urls = self.URL_RE.findall(msg)
     if not urls:
         return False
 
-    # Check each one and build a response
-    responses = []
+    # Start a lookup for each one
+    sem = defer.DeferredSemaphore(self.max_concurrent_urls)
+    lookups = []
     for url in urls:
         if self.YT_RE.match(url) is not None:
-            responses.append(self.youtube_data(url))
+            lookups.append(self.cached('youtube', url, sem.run,
+                            threads.deferToThread, self.youtube_data, url))
         else:
-            responses.append(self.title(url))
+            lookups.append(self.cached('title', url, sem.run, self.title, url))
 
         if len(url) > self.max_url_len:
-            try:
-                short = self.shorten_url(url)
-                responses.append(u'Shortened: {}'.format(short))
-            except pb.CommandError:
-                pass
-
-        log.msg('Processed URL: {}'.format(url))
-
-    # Only get True responses
-    responses = filter(bool, responses)
-    if responses:
-        irc.response = u'\n'.join(responses)
-        return True
-    else:
-        return False
+            lookups.append(sem.run(threads.deferToThread, self.shortened, url))
+
+    # Drop any lookups which fail or miss the deadline
+    lookups = [deadline(d, self.url_deadline).addErrback(self.lookup_failed) \
+               for d in lookups]
+
+    def join(responses):
+        # Only get True responses
+        responses = filter(bool, responses)
+        log.msg('Processed URLs: {}'.format(u' '.join(urls)))
+        return u'\n'.join(responses) if responses else None
+
+    return defer.gatherResults(lookups).addCallback(join)
+
+  def lookup_failed(self, failure):
+    '''Errback for a URL lookup which failed or missed the deadline.
+    '''
+    if not failure.check(DeadlineExceeded, defer.CancelledError):
+        log.err(failure, '[Error]: URL lookup')
 
   def reachable_url(self, url):
     '''True if the URL passed in can be contacted without a server
     or client error status code.
     '''
     try:
-        return 200 <= requests.head(url).status_code < 400 
+        return 200 <= uhttp.head(url).status_code < 400 
     except:
         return False
 
@@ -88,28 +136,73 @@ class URL(pb.LinePlugin, pb.CommandPlugin):
 
     return self.shorten_url(url)
 
+  def shortened(self, url):
+    '''Return the response for a shortened URL, or None if
+    bitly couldn't shorten it.
+    '''
+    try:
+        return u'Shortened: {}'.format(self.shorten_url(url))
+    except pb.CommandError:
+        pass
+
   def shorten_url(self, url):
     '''Return a shortened version of a URL passed in
     using bitly
     '''
-    try:
-      return self.bitly.shorten(url)['url']
-    except:
-      log.err('[Error]: bitly traceback: {}'.format(traceback.format_exc()))
-      raise pb.CommandError(u'[Error]: Invalid URL', pm=True)
+    key = ('short', normalize_url(url))
+    short = self.cache.get(key)
+    if short is ucache.MISSING:
+        try:
+          short = self.bitly.shorten(url)['url']
+          self.cache.set(key, short, self.cache_ttls['short'])
+        except:
+          log.err('[Error]: bitly traceback: {}'.format(traceback.format_exc()))
+          short = None
+          self.cache.set(key, short, self.negative_ttl)
+
+    if short is None:
+        raise pb.CommandError(u'[Error]: Invalid URL', pm=True)
+
+    return short
 
   def title(self, url):
-    '''Return the title of a passed in URL
+    '''Return a Deferred firing with the title of a passed in URL.
+
+    Only HTML pages are read, and only until the title has been
+    seen or title_max_bytes have arrived.
     '''
-    try:
-        soup = BeautifulSoup(requests.get(url, verify=False).text)
-        if soup.title is None:
-            return
-        url_title = u' '.join(soup.title.text.strip().\
-                                replace(u'\n', u' ').split())
-        return url_title
-    except:
-        log.msg('[Error]: title {}'.format(traceback.format_exc()))
+    if not url.startswith(u'http'):
+        url = u'http://' + url
+
+    scanner = TitleScanner()
+
+    def is_html(r):
+        ctype = r.headers.get('content-type', '').split(';')[0]
+        scanner.charset = r.encoding
+        return not ctype.strip() or ctype.strip().lower() in self.HTML_TYPES
+
+    d = uhttp.request( 'GET', url
+                     , timeout=self.url_deadline
+                     , max_bytes=self.title_max_bytes
+                     , verify=False
+                     , accept=is_html
+                     , until=scanner.feed
+                     )
+    d.addCallback(lambda _: scanner.title())
+    d.addErrback(self.title_failed, url)
+    return d
+
+  def title_failed(self, failure, url):
+    '''Errback for a title which couldn't be fetched.  Pages
+    which were only slow aren't taken to have no title.
+    '''
+    if failure.check(DeadlineExceeded, defer.CancelledError):
+        return failure
+
+    log.msg('[Error]: title {} {}'.format(url, failure.getErrorMessage()))
+
+  def triggers(self):
+    return [self.URL_RE]
 
   def unshorten(self, args, irc):
     '''Method to handle the command for unshortening a URL
@@ -130,12 +223,20 @@ class URL(pb.LinePlugin, pb.CommandPlugin):
     Code from: http://ow.ly/ttH5j
     '''
     try:
-        real_url = requests.head(url, timeout=100.0,
+        real_url = uhttp.head(url, timeout=100.0,
                 headers={'Accept-Encoding': 'identity'})
         return real_url.headers.get('location', url)
     except:
         pass
 
+  def urlCache(self, args, irc):
+    '''urlcache -- Show how well the URL cache is doing
+    '''
+    return u'URL cache: {entries:,} entries, {bytes:,} bytes | ' \
+           u'Hit rate: {hit_rate:.1%} ({hits:,} hits, {misses:,} misses) | ' \
+           u'Evictions: {evictions:,} | Expirations: {expirations:,}'.format(
+                **self.cache.stats())
+
   def youtube_data(self, url):
     '''Return the video title, duration, and view count for a YouTube URL.
     '''
@@ -158,7 +259,7 @@ class URL(pb.LinePlugin, pb.CommandPlugin):
             raise pb.CommandError(u'[Error]: Missing YouTube search terms', pm=False)
 
         terms = u'+'.join(args)
-        r = requests.get(self.YT_SEARCH.format(terms))
+        r = uhttp.get(self.YT_SEARCH.format(terms))
 
         soup = BeautifulSoup(r.text)
         result = soup.find('div', {'class': 'yt-lockup-content'}).find('a')['href']
@@ -167,3 +268,72 @@ class URL(pb.LinePlugin, pb.CommandPlugin):
       except:
         log.err('[Error]: yt {}'.format(sys.exc_info()[0]))
         raise pb.CommandError(u'[Error]: Could not contact YouTube', pm=True)
+
+#-------------------------------------
+#
+#    Helper Classes and Functions
+#
+#-------------------------------------
+def normalize_url(url):
+  '''Return the form of a URL used as its cache key, so trivially
+  different spellings of a URL share an entry.
+  '''
+  if not url.lower().startswith(u'http'):
+      url = u'http://' + url
+
+  parts = urlparse.urlsplit(url)
+  netloc = parts.netloc.lower()
+  for scheme, port in ((u'http', u':80'), (u'https', u':443')):
+      if parts.scheme.lower() == scheme and netloc.endswith(port):
+          netloc = netloc[:-len(port)]
+
+  return urlparse.urlunsplit((parts.scheme.lower(), netloc,
+                              parts.path or u'/', parts.query, u''))
+
+class TitleScanner(object):
+  '''Scans the start of an HTML document for its title as it
+  arrives, so the rest of the document needn't be read.
+  '''
+  END_RE = re.compile(r'</title\s*>|</head\s*>|<body[\s>]', re.I)
+  META_RE = re.compile(r'''<meta[^>]+charset\s*=\s*["']?([\w.:-]+)''', re.I)
+  TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title\s*>', re.I | re.S)
+
+  # Bytes rescanned from the previous chunk, so an end
+  # tag split across two chunks is still found
+  OVERLAP = 16
+
+  def __init__(self, charset=None):
+    self.charset = charset
+    self.buf = ''
+    self.pos = 0
+
+  def feed(self, data):
+    '''Add the next chunk of the document. Returns True once
+    the title, or the end of the head, has been seen.
+    '''
+    self.buf += data
+    done = self.END_RE.search(self.buf, self.pos) is not None
+    self.pos = max(0, len(self.buf) - self.OVERLAP)
+    return done
+
+  def title(self):
+    '''Return the title seen so far, or None.
+    '''
+    m = self.TITLE_RE.search(self.buf)
+    if m is None:
+        return
+
+    # Headers win over any charset declared in the document
+    charset = self.charset
+    if charset is None:
+        meta = self.META_RE.search(self.buf, 0, m.start())
+        charset = meta.group(1) if meta else None
+
+    try:
+        text = m.group(1).decode(charset, 'replace') if charset \
+                else decode(m.group(1))
+    except LookupError:
+        text = decode(m.group(1))
+
+    text = HTMLParser().unescape(text)
+    return u' '.join(text.split()) or None
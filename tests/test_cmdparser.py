@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests for utils.cmdparser.
+
+Run from the top of the repository:
+
+    python2 -m twisted.trial tests.test_cmdparser
+'''
+
+from twisted.trial import unittest
+
+from utils.cmdparser import ParseError, Parser
+
+class ParserTest(unittest.TestCase):
+    def test_nested(self):
+        parser = Parser()
+        self.assertEqual(parser.parse(u'echo [rot13 "some text"] and more'),
+                         (u'echo', (u'rot13', u'some text'), u'and', u'more'))
+
+    def test_max_nesting(self):
+        parser = Parser(max_nesting=2)
+        parser.parse(u'a [b [c]]')
+        self.assertRaises(ParseError, parser.parse, u'a [b [c [d]]]')
+
+    def test_max_nested(self):
+        parser = Parser(max_nested=3)
+        self.assertEqual(len(parser.parse(u'tell bob [a] [b [c]]')), 4)
+
+        # Siblings count as well as children
+        exc = self.assertRaises(ParseError, parser.parse,
+                                u'tell bob [a] [b] [c] [d]')
+        self.assertEqual(exc.pos, 21)
+        self.assertIn(u'Maximum of 3 nested commands', unicode(exc))
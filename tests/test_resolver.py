@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests for utils.resolver, against a stand-in name server on
+localhost, with the time the cache sees moved by hand.
+
+Run from the top of the repository:
+
+    python2 -m twisted.trial tests.test_resolver
+'''
+
+from twisted.internet import defer, reactor
+from twisted.names import common, dns, error, server
+from twisted.trial import unittest
+
+import utils.resolver as uresolver
+
+ZONE = 'test.example'
+
+class StandIn(common.ResolverBase):
+    '''
+    Answers for every name under ZONE, and records the
+    queries it's asked.  Names starting with missing don't
+    exist, and those starting with slow are only answered
+    once release() is called.
+    '''
+    def __init__(self):
+        common.ResolverBase.__init__(self)
+        self.queries = []
+        self.held = []
+
+    def _lookup(self, name, cls, type_, timeout):
+        name = str(name)
+        self.queries.append((name, type_))
+        if name.startswith('missing'):
+            return defer.fail(error.DomainError(name))
+
+        payloads = { dns.A: [dns.Record_A('192.0.2.1'), dns.Record_A('192.0.2.2')]
+                   , dns.AAAA: [dns.Record_AAAA('2001:db8::1')]
+                   , dns.MX: [dns.Record_MX(10, 'mx.' + ZONE)]
+                   , dns.PTR: [dns.Record_PTR('host.' + ZONE)]
+                   }.get(type_, [])
+        answers = [dns.RRHeader(name, type_, ttl=300, payload=p, auth=True)
+                   for p in payloads]
+
+        # Missing types are cached for the SOA's minimum
+        soa = dns.RRHeader(ZONE, dns.SOA, ttl=60,
+                           payload=dns.Record_SOA(minimum=30), auth=True)
+        result = (answers, [] if answers else [soa], [])
+
+        if name.startswith('slow'):
+            d = defer.Deferred()
+            self.held.append((d, result))
+            return d
+
+        return defer.succeed(result)
+
+    def release(self):
+        held, self.held = self.held, []
+        for d, result in held:
+            d.callback(result)
+
+class Clock(object):
+    '''
+    The reactor, but with seconds() moved forward by advance().
+    '''
+    def __init__(self):
+        self.offset = 0
+
+    def __getattr__(self, name):
+        return getattr(reactor, name)
+
+    def advance(self, seconds):
+        self.offset += seconds
+
+    def seconds(self):
+        return reactor.seconds() + self.offset
+
+class ResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.stand_in = StandIn()
+        factory = server.DNSServerFactory(clients=[self.stand_in])
+        self.port = reactor.listenUDP(0, dns.DNSDatagramProtocol(factory),
+                                      interface='127.0.0.1')
+        self.clock = Clock()
+        self.resolver = uresolver.Resolver(
+                            servers=[('127.0.0.1', self.port.getHost().port)],
+                            resolv=None, clock=self.clock)
+
+    def tearDown(self):
+        # The client's UDP ports are closed by the resolver
+        # once its queries are answered
+        return self.port.stopListening()
+
+    @defer.inlineCallbacks
+    def test_answers(self):
+        answers = yield self.resolver.lookup('www.' + ZONE, ['A', 'AAAA', 'MX'])
+        self.assertEqual(answers,
+                         [ ('A', ['192.0.2.1', '192.0.2.2'])
+                         , ('AAAA', ['2001:db8::1'])
+                         , ('MX', ['10 mx.' + ZONE])
+                         ])
+
+    @defer.inlineCallbacks
+    def test_ptr(self):
+        records = yield self.resolver.query('192.0.2.1', 'PTR')
+        self.assertEqual(records, ['host.' + ZONE])
+        self.assertEqual(self.stand_in.queries,
+                         [('1.2.0.192.in-addr.arpa', dns.PTR)])
+
+    @defer.inlineCallbacks
+    def test_ttl_expiry(self):
+        yield self.resolver.query('www.' + ZONE, 'A')
+        self.clock.advance(299)
+        yield self.resolver.query('www.' + ZONE, 'A')
+        self.assertEqual(len(self.stand_in.queries), 1)
+
+        self.clock.advance(2)
+        records = yield self.resolver.query('www.' + ZONE, 'A')
+        self.assertEqual(records, ['192.0.2.1', '192.0.2.2'])
+        self.assertEqual(len(self.stand_in.queries), 2)
+        self.assertEqual(self.resolver.stats(),
+                         {'entries': 1, 'hits': 1, 'misses': 2})
+
+    @defer.inlineCallbacks
+    def test_negative_soa_minimum(self):
+        # The SOA's TTL is 60, but its minimum of 30 applies
+        records = yield self.resolver.query('www.' + ZONE, 'NS')
+        self.assertEqual(records, [])
+        self.clock.advance(29)
+        records = yield self.resolver.query('www.' + ZONE, 'NS')
+        self.assertEqual(records, [])
+        self.assertEqual(len(self.stand_in.queries), 1)
+
+        self.clock.advance(2)
+        yield self.resolver.query('www.' + ZONE, 'NS')
+        self.assertEqual(len(self.stand_in.queries), 2)
+
+    @defer.inlineCallbacks
+    def test_missing_name(self):
+        records = yield self.resolver.query('missing.' + ZONE, 'A')
+        self.assertEqual(records, [])
+        yield self.resolver.query('missing.' + ZONE, 'A')
+        self.assertEqual(len(self.stand_in.queries), 1)
+
+    @defer.inlineCallbacks
+    def test_in_flight(self):
+        first = self.resolver.query('slow.' + ZONE, 'A')
+        second = self.resolver.query('SLOW.' + ZONE + '.', 'A')
+
+        # Only sent once the stand-in has been asked
+        while not self.stand_in.held:
+            d = defer.Deferred()
+            reactor.callLater(0.01, d.callback, None)
+            yield d
+
+        self.stand_in.release()
+        results = yield defer.gatherResults([first, second])
+        self.assertEqual(results, [['192.0.2.1', '192.0.2.2']] * 2)
+        self.assertEqual(len(self.stand_in.queries), 1)
+        self.assertEqual(self.resolver.stats()['misses'], 1)
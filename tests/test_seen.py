@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests for plugins.Seen's SeenTable.
+
+Run from the top of the repository:
+
+    python2 -m twisted.trial tests.test_seen
+'''
+
+from twisted.trial import unittest
+
+from plugins.Seen import SeenTable
+
+class SeenTableTest(unittest.TestCase):
+    def test_non_ascii_names(self):
+        # Channels and nicks arrive from IRC as bytes
+        table = SeenTable(max_msg_bytes=100)
+        table['#caf\xc3\xa9', 'n\xc3\xafck'] = (10, u'hello')
+
+        self.assertIn(('#caf\xc3\xa9', 'n\xc3\xafck'), table)
+        self.assertIn((u'#café', u'nïck'), table)
+        self.assertEqual(table[u'#café', u'nïck'], (10, u'hello'))
+        self.assertEqual(table.oldest(), (u'#café', u'nïck'))
+
+        # Names which aren't UTF-8 are decoded as Latin-1
+        table['#caf\xe9', 'nick'] = (20, u'bye')
+        self.assertEqual(table[u'#café', u'nick'], (20, u'bye'))
+
+        del table[table.oldest()]
+        self.assertNotIn(('#caf\xc3\xa9', 'n\xc3\xafck'), table)
+        self.assertEqual(len(table), 1)
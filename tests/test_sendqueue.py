@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests for utils.sendqueue, driven by a fake clock.
+
+Run from the top of the repository:
+
+    python2 -m twisted.trial tests.test_sendqueue
+'''
+
+from twisted.internet import task
+from twisted.trial import unittest
+
+import utils.sendqueue as usendq
+
+class SendQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = task.Clock()
+        self.sent = []
+
+    def queue(self, **kwargs):
+        kwargs.setdefault('clock', self.clock)
+        return usendq.SendQueue(lambda t, l: self.sent.append((t, l)),
+                                **kwargs)
+
+    def test_burst_then_paced(self):
+        q = self.queue(rate=2, burst=3, target_rate=10, target_burst=10)
+        for i in range(5):
+            q.put('#a', str(i))
+
+        self.assertEqual([l for _, l in self.sent], ['0', '1', '2'])
+
+        self.clock.advance(0.5)
+        self.assertEqual(len(self.sent), 4)
+        self.clock.advance(0.5)
+        self.assertEqual(len(self.sent), 5)
+        self.assertEqual(q.stats()['replies'], 0)
+
+    def test_target_bucket(self):
+        q = self.queue(rate=100, burst=100, target_rate=1, target_burst=1)
+        q.put('#a', 'a1')
+        q.put('#a', 'a2')
+        q.put('#b', 'b1')
+
+        # #b isn't held up by #a's empty bucket
+        self.assertEqual(self.sent, [('#a', 'a1'), ('#b', 'b1')])
+
+        self.clock.advance(1)
+        self.assertEqual(self.sent[-1], ('#a', 'a2'))
+
+    def test_replies_before_chatter(self):
+        q = self.queue(rate=1, burst=1, target_rate=10, target_burst=10)
+        q.put('#a', 'first')
+        q.put('#a', 'chatter', usendq.CHATTER)
+        q.put('#b', 'reply')
+
+        self.clock.advance(1)
+        self.clock.advance(1)
+        self.assertEqual([l for _, l in self.sent],
+                         ['first', 'reply', 'chatter'])
+
+    def test_old_lines_dropped(self):
+        q = self.queue(rate=0.1, burst=1, max_ages={'chatter': 5})
+        q.put('#a', 'sent')
+        q.put('#a', 'stale', usendq.CHATTER)
+
+        self.clock.advance(10)
+        self.assertEqual(self.sent, [('#a', 'sent')])
+        self.assertEqual(q.stats()['dropped'], 1)
+
+    def test_merge(self):
+        q = self.queue(rate=1, burst=1, budget=lambda t: 12, separator=' | ')
+        q.put('#a', 'first')
+        q.put('#a', 'one')
+        q.put('#a', 'two')
+        q.put('#a', 'three')
+
+        self.clock.advance(1)
+        self.clock.advance(1)
+        self.assertEqual([l for _, l in self.sent],
+                         ['first', 'one | two', 'three'])
+        self.assertEqual(q.stats()['merged'], 1)
+
+    def test_no_merge(self):
+        q = self.queue(rate=1, burst=1, budget=lambda t: 100, separator=' | ')
+        q.put('#a', 'first')
+        q.put('#a', 'page (2 more messages)', merge=False)
+        q.put('#a', 'reply')
+        q.put('#a', '\x01ACTION waves\x01')
+        q.put('#a', 'after')
+
+        for _ in range(4):
+            self.clock.advance(1)
+        self.assertEqual([l for _, l in self.sent],
+                         [ 'first', 'page (2 more messages)', 'reply'
+                         , '\x01ACTION waves\x01', 'after'])
+
+    def test_stop(self):
+        q = self.queue(rate=1, burst=1)
+        q.put('#a', 'sent')
+        q.put('#a', 'queued')
+        q.stop()
+
+        self.clock.advance(5)
+        self.assertEqual(self.sent, [('#a', 'sent')])
+        self.assertEqual(q.stats()['dropped'], 1)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+'''
+North American Numbering Plan area codes, read from a data
+file the first time they're looked up.
+
+The file is tab separated: states, provinces, and countries
+first, as an abbreviation and a name, then area codes, as the
+code, the abbreviation of its state, and its cities joined by
+|.  Loading it builds a forward array indexed by area code,
+and reverse indexes of the area codes of each city and state,
+so any lookup is a single index, or a bisection of the sorted
+cities for a prefix.
+'''
+
+import bisect
+import difflib
+import io
+
+# Area codes have three digits
+MAX_CODE = 1000
+
+# Databases by path, see named()
+_databases = {}
+
+def named(path):
+    '''
+    Return the AreaCodes for a data file, so it's loaded at
+    most once however many times the plugin is reloaded.
+    '''
+    if path not in _databases:
+        _databases[path] = AreaCodes(path)
+
+    return _databases[path]
+
+def normalize(name):
+    '''
+    Return the key a city or state is indexed under, ignoring
+    case, spacing, and periods, e.g., Sault Ste. Marie.
+    '''
+    return u' '.join(name.replace(u'.', u' ').lower().split())
+
+class AreaCodes(object):
+    def __init__(self, path):
+        '''
+        Parameters
+        ----------
+            path: string
+                Path of the data file
+        '''
+        self.path = path
+        self.loaded = False
+
+    def city(self, name, max_matches=5):
+        '''
+        Return a list of (city, area codes) of the cities named
+        name, else those it's a prefix of, else those with
+        close names, at most max_matches of them.
+        '''
+        self.load()
+        key = normalize(name)
+        if not key:
+            return []
+
+        if key in self.city_codes:
+            keys = [key]
+        else:
+            i = bisect.bisect_left(self.cities, key)
+            keys = []
+            while i < len(self.cities) and len(keys) < max_matches and \
+                    self.cities[i].startswith(key):
+                keys.append(self.cities[i])
+                i += 1
+
+            if not keys:
+                keys = difflib.get_close_matches(key, self.cities,
+                                                 max_matches, 0.8)
+
+        return [(self.city_names[k], self.city_codes[k]) for k in keys]
+
+    def code(self, code):
+        '''
+        Return (state, cities) of an area code, or None if
+        it's not one.
+        '''
+        self.load()
+        if not 0 <= code < MAX_CODE or self.codes[code] is None:
+            return None
+
+        state, cities = self.codes[code]
+        return self.states[state], cities
+
+    def load(self):
+        '''
+        Read the data file and build its indexes, unless that's
+        already been done.
+        '''
+        if self.loaded:
+            return
+
+        codes = [None] * MAX_CODE
+        states = {}
+        state_abbrs = {}
+        state_codes = {}
+        city_codes = {}
+        city_names = {}
+        with io.open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip(u'\n')
+                if not line or line.startswith(u'#'):
+                    continue
+
+                fields = line.split(u'\t')
+                if not fields[0].isdigit():
+                    abbr, name = fields
+                    states[abbr] = name
+                    state_abbrs[normalize(abbr)] = abbr
+                    state_abbrs[normalize(name)] = abbr
+                    state_codes[abbr] = []
+                    continue
+
+                code, state, cities = int(fields[0]), fields[1], fields[2]
+                cities = tuple(c for c in cities.split(u'|') if c)
+                codes[code] = (state, cities)
+                state_codes[state].append(code)
+                for city in cities:
+                    city_names.setdefault(normalize(city), city)
+                    city_codes.setdefault(normalize(city), []).append(code)
+
+        self.codes = codes
+        self.states = states
+        self.state_abbrs = state_abbrs
+        self.state_codes = state_codes
+        self.city_codes = city_codes
+        self.city_names = city_names
+        self.cities = sorted(city_codes)
+        self.loaded = True
+
+    def state(self, name):
+        '''
+        Return (state, area codes) of a state, province, or
+        country, by abbreviation or name, or None if it has no
+        area codes.
+        '''
+        self.load()
+        abbr = self.state_abbrs.get(normalize(name))
+        if not self.state_codes.get(abbr):
+            return None
+
+        return self.states[abbr], self.state_codes[abbr]
@@ -1,23 +1,34 @@
 # -*- coding: utf-8 -*-
 
 # Imports
-from datetime import datetime
+from collections import OrderedDict
+from functools import partial
 import json
 import re
 import time
-import traceback
 
-from dateutil.parser import parse
-import requests
+from dateutil.parser import parse as parse_date
+from twisted.internet import defer, task
 from twisted.python import log
 
-from utils.url import safe_get
+from utils.deferreds import race
+import utils.httpclient as uhttp
 
 # Constants
 BTC_ADDR_RE = r'^[13][a-km-zA-HJ-NP-Z0-9]{26,33}$'
 BTC_ADDR_RE = re.compile(BTC_ADDR_RE)
 
-def balance(addr, min_confirms=6):
+# Seconds to wait on a provider before also asking the next one,
+# and seconds to wait on all of them before giving up
+HEDGE_DELAY = 1.5
+RACE_TIMEOUT = 10
+
+#
+# Every function asking a provider returns a Deferred, which
+# fires with None if no provider answers.
+#
+
+def balance(addr, min_confirms=6, **race_opts):
     '''
     Return the balance of a given Bitcoin address
 
@@ -32,15 +43,10 @@ def balance(addr, min_confirms=6):
 
             Defaults to Bitcoin Core's value of 6
     '''
-    for obj in [BlockchainAPI(), BlockrAPI()]:
-        try:
-            bal = obj.balance(addr, min_confirms)
-            if bal is not None:
-                return bal
-        except:
-            pass
-
-def block_hash(block):
+    return race_providers('balance', [BlockchainAPI(), BlockrAPI()],
+                          addr, min_confirms, **race_opts)
+
+def block_hash(block, **race_opts):
     '''
     Return the hash of a given block
 
@@ -49,93 +55,114 @@ def block_hash(block):
         block: int
             Which block to retrieve the hash from
     '''
-    for obj in [BlockExplorerAPI(), BlockrAPI()]:
-        try:
-            bh = obj.blockHash(block)
-            if bh is not None:
-                return bh 
-        except:
-            pass
-
-def btc_avg(currency):
+    return race_providers('blockHash', [BlockExplorerAPI(), BlockrAPI()],
+                          block, **race_opts)
+
+def btc_avg(currency, **race_opts):
     '''
     Return the current average in a given currency
     '''
-    try:
-      return BitcoinAverageAPI().average(currency)
-    except:
-      return
+    return race_providers('average', [BitcoinAverageAPI()],
+                          currency, **race_opts)
 
-def btc_avg_usd():
+def btc_avg_usd(**race_opts):
     '''
     Return the current USD/BTC average price
     '''
-    for obj in [BitcoinAverageAPI(), BlockrAPI()]:
-        try:
-            avg = obj.averageUSD()
-            if avg is not None:
-                return avg
-        except:
-            pass
-
-def current_block():
+    return race_providers('averageUSD', [BitcoinAverageAPI(), BlockrAPI()],
+                          **race_opts)
+
+# The chain tip watcher, see chain_tip()
+_chain_tip = None
+
+def chain_tip(interval=30, max_blocks=100, **race_opts):
+    '''
+    Return the ChainTip shared by the whole bot, starting it
+    the first time it's asked for, so it outlives plugin
+    reloads.  Arguments are passed to ChainTip.
+    '''
+    global _chain_tip
+    if _chain_tip is None:
+        _chain_tip = ChainTip(interval, max_blocks, **race_opts)
+
+    return _chain_tip
+
+def current_block(**race_opts):
     '''
     Return the current Bitcoin block
     '''
-    for obj in [BlockchainAPI(), BlockExplorerAPI(), BlockrAPI()]:
-        try:
-            block = obj.currentBlock()
-            if block is not None:
-                return block
-        except:
-            pass
-
-def latest_hash():
+    return race_providers('currentBlock',
+                  [BlockchainAPI(), BlockExplorerAPI(), BlockrAPI()],
+                  **race_opts)
+
+def fetch(url):
+    '''
+    Return a Deferred firing with the body of url, or
+    None for a non-200 response.
+    '''
+    d = uhttp.request('GET', url)
+    d.addCallback(lambda r: r.text if r.status_code == 200 else None)
+    return d
+
+def latest_hash(**race_opts):
     '''
     Return the hash of the current block
     '''
-    for obj in [BlockchainAPI(), BlockExplorerAPI(), BlockrAPI()]:
-        try:
-            lh = obj.latestHash()
-            if lh is not None:
-                return lh 
-        except:
-            pass
-
-def total_bcs():
+    return race_providers('latestHash',
+                  [BlockchainAPI(), BlockExplorerAPI(), BlockrAPI()],
+                  **race_opts)
+
+def race_providers(method, providers, *args, **race_opts):
+    '''
+    Call the same method on a list of providers, fastest
+    first, and return a Deferred firing with the first answer
+    which isn't None.
+
+    Parameters
+    ----------
+        method: string
+            Name of the provider method to call
+
+        providers: list
+            Provider objects, in the order to use them before
+            their latencies are known
+
+        args:
+            Arguments passed to the method
+
+        race_opts:
+            hedge and timeout, as for utils.deferreds.race
+    '''
+    providers = provider_stats.ordered(method, providers)
+    calls = [partial(getattr(p, method), *args) for p in providers]
+
+    def observe(i, seconds, ok):
+        provider_stats.observe(method, providers[i], seconds, ok)
+
+    return race( calls
+               , hedge=race_opts.get('hedge', HEDGE_DELAY)
+               , timeout=race_opts.get('timeout', RACE_TIMEOUT)
+               , observe=observe
+               )
+
+def total_bcs(**race_opts):
     '''
     Returns the total bitcoins in circulation
     '''
-    for obj in [BlockExplorerAPI()]:
-      try:
-        total = obj.totalBCs()
-        if total is not None:
-          return int(float(total))
-      except:
-        log.err('[Error totalbcs]: {}'.format(traceback.format_exc()))
-        pass
+    d = race_providers('totalBCs', [BlockExplorerAPI()], **race_opts)
+    d.addCallback(lambda total: int(float(total)) \
+                                if total is not None else None)
+    return d
 
-def tslb():
+def time_since(ts):
     '''
-    Returns a string representing the time since the last block.
+    Returns a string representing the time since ts, in epoch
+    seconds, e.g., of the last block.
     '''
-    cb = current_block()
-    cbts = None
-    now = int(datetime.utcnow().strftime('%s'))
-    for obj in [BlockrAPI()]:
-        try:
-            cbts = obj.blockTS(cb)
-            if cbts:
-                log.msg('[tslb]: {}; [time]: {}'.format(cbts, now))
-                break
-        except:
-            log.err('[Error tslb]: {}'.format(traceback.format_exc()))
-            pass
-
-    if cbts is None:
-        return
-
-    ts_diff = now - int(cbts)
+    now = int(time.time())
+    log.msg('[tslb]: {}; [time]: {}'.format(ts, now))
+
+    ts_diff = now - int(ts)
     mins, secs = divmod(ts_diff, 60)
     return u'{} min{}, {} sec{}'.\
                 format( mins
@@ -155,6 +182,203 @@ def valid_address(addr):
     '''
     return BTC_ADDR_RE.match(addr) is not None
 
+class ProviderStats(object):
+    '''
+    Smoothed latency of each provider for each method, so
+    races try the fastest healthy provider first.
+    '''
+    # Weight of the newest observation
+    ALPHA = 0.3
+
+    # Seconds added to the latency of a failed call
+    FAILURE_PENALTY = 5.0
+
+    def __init__(self):
+        self.latency = {}
+
+    def observe(self, method, provider, seconds, ok):
+        key = (method, type(provider).__name__)
+        if not ok:
+            seconds += self.FAILURE_PENALTY
+
+        if key in self.latency:
+            self.latency[key] += self.ALPHA * (seconds - self.latency[key])
+        else:
+            self.latency[key] = seconds
+
+    def ordered(self, method, providers):
+        '''
+        Return providers sorted by latency.  Providers without
+        any observations keep their place at the front.
+        '''
+        return sorted(providers, key=lambda p: \
+                      self.latency.get((method, type(p).__name__), 0.0))
+
+provider_stats = ProviderStats()
+
+class ChainTip(object):
+    '''
+    The height, hash, and timestamp of the latest block,
+    polled from the providers in the background, so how often
+    they're asked doesn't depend on how often users ask, and
+    the hashes of recent blocks.
+    '''
+    def __init__(self, interval=30, max_blocks=100, **race_opts):
+        '''
+        Parameters
+        ----------
+            interval: float
+                Seconds between polls of the current block
+
+            max_blocks: int
+                Most recent blocks whose hashes are kept
+
+            race_opts:
+                hedge and timeout, as for race_providers
+        '''
+        self.max_blocks = max_blocks
+        self.race_opts = race_opts
+
+        # The latest block, and when it was last checked
+        self.height = None
+        self.hash = None
+        self.ts = None
+        self.checked = None
+
+        # Height -> (hash, timestamp or None), least recently
+        # used first
+        self.blocks = OrderedDict()
+
+        # Deferreds of the callers waiting on the poll under
+        # way, or None if there isn't one
+        self.waiting = None
+
+        self.poller = task.LoopingCall(self.poll)
+        self.poller.start(interval)
+
+    def block(self, height):
+        '''
+        Return a Deferred firing with the hash of the block at
+        height, or None if no provider answers.  Recent blocks
+        are answered from memory.
+        '''
+        if height in self.blocks:
+            self.blocks[height] = self.blocks.pop(height)
+            return defer.succeed(self.blocks[height][0])
+
+        def found(hash_):
+            if hash_ is not None:
+                self.remember(height, hash_, None)
+            return hash_
+
+        return block_hash(height, **self.race_opts).addCallback(found)
+
+    def moved(self, height):
+        '''
+        Callback fetching the hash and timestamp of the current
+        block, if it's new.
+        '''
+        if height is None:
+            return
+
+        # A provider behind the others is ignored
+        if self.height is not None and height <= self.height:
+            if height == self.height:
+                self.checked = time.time()
+            return
+
+        # Asked by height, so the hash and timestamp are of the
+        # same block whichever providers answer.  The hash of
+        # the last tip is checked again, in case it's been
+        # replaced by a reorganization.
+        previous = self.height
+        d = defer.gatherResults([
+                block_hash(height, **self.race_opts),
+                race_providers('blockTS', [BlockrAPI(), BlockchainAPI()],
+                               height, **self.race_opts),
+                block_hash(previous, **self.race_opts) \
+                    if previous is not None else defer.succeed(None)],
+                consumeErrors=True)
+
+        def fetched(results):
+            hash_, ts, previous_hash = results
+            if previous_hash is not None:
+                self.remember(previous, previous_hash, None)
+            if hash_ is not None and ts is not None:
+                self.update(height, hash_, int(ts))
+
+        return d.addCallback(fetched)
+
+    def poll(self):
+        '''
+        Return a Deferred firing once the current block has
+        been checked.  Only one poll is made at a time, and
+        each caller waits on a Deferred of its own, so
+        cancelling it doesn't cancel the poll.
+        '''
+        d = defer.Deferred(lambda d: self.waiting.remove(d))
+        if self.waiting is not None:
+            self.waiting.append(d)
+            return d
+
+        self.waiting = [d]
+        p = current_block(**self.race_opts)
+        p.addCallback(self.moved)
+        p.addErrback(log.err, '[Error]: Cannot poll the chain tip')
+        p.addBoth(self.polled)
+        return d
+
+    def polled(self, _):
+        '''
+        Callback firing the Deferreds waiting on a poll.
+        '''
+        waiting, self.waiting = self.waiting, None
+        for d in waiting:
+            d.callback(None)
+
+    def ready(self):
+        '''
+        Return a Deferred firing once the latest block is known,
+        at once if it already is.
+        '''
+        if self.height is not None:
+            return defer.succeed(None)
+
+        return self.poll()
+
+    def remember(self, height, hash_, ts):
+        '''
+        Keep the hash and timestamp of the block at height.  If
+        it had another hash, the chain was reorganized, so the
+        blocks kept above it are forgotten too.
+        '''
+        old = self.blocks.pop(height, None)
+        if old is not None and old[0] != hash_:
+            for h in [h for h in self.blocks if h > height]:
+                del self.blocks[h]
+        elif old is not None and ts is None:
+            ts = old[1]
+
+        self.blocks[height] = (hash_, ts)
+        while len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+
+    def update(self, height, hash_, ts):
+        '''
+        Move the tip to a new block, e.g., one polled or pushed
+        by a node's block notifications.  Blocks lower than the
+        tip are only remembered.
+        '''
+        if self.height is not None and height < self.height:
+            self.remember(height, hash_, ts)
+            return
+
+        self.height = height
+        self.hash = hash_
+        self.ts = ts
+        self.checked = time.time()
+        self.remember(height, hash_, ts)
+
 #-------------------------------------------------
 #
 #               Bitcoin API Classes
@@ -168,16 +392,10 @@ class BitcoinAverageAPI(object):
         pass
 
     def average(self, currency):
-        return safe_get([self.LAST.format(currency)], None)
+        return fetch(self.LAST.format(currency))
 
     def averageUSD(self):
-        return safe_get([self.LAST.format('USD')], None)
-
-    def saveAll(self):
-        self.all = safe_get([self.ALL], None)
-        if self.all is not None:
-            self.all = json.loads(self.all)
-        return self.all is not None
+        return fetch(self.LAST.format('USD'))
 
 class BlockchainAPI(object):
     ADDR_BAL = 'https://blockchain.info/q/addressbalance/{}?confirmations={}'
@@ -189,30 +407,39 @@ class BlockchainAPI(object):
         pass
 
     def balance(self, addr, min_confirms):
-        bal = safe_get([self.ADDR_BAL.format(addr, min_confirms)], None)
-        if not bal is None:
-            return round(float(bal) / 1.e8, 8)
+        def parse(bal):
+            if not bal is None:
+                return round(float(bal) / 1.e8, 8)
+
+        return fetch(self.ADDR_BAL.format(addr, min_confirms)).\
+                addCallback(parse)
 
     def blockHash(self, block):
-        info = safe_get([self.BLOCK_INFO.format(block)], None)
-        if not info is None:
-            return json.loads(info)['hash']
+        def parse(info):
+            if not info is None:
+                return json.loads(info)['hash']
+
+        return fetch(self.BLOCK_INFO.format(block)).addCallback(parse)
 
     def blockTS(self, block):
         '''
         Returns the timestamp for a particular block.
         '''
-        block = safe_get([self.BLOCK_INFO.format(block)], None)
-        if block:
-            return json.loads(block)['time']
+        def parse(block):
+            if block:
+                return json.loads(block)['time']
+
+        return fetch(self.BLOCK_INFO.format(block)).addCallback(parse)
 
     def currentBlock(self):
-        last = safe_get([self.LAST_BLOCK], None)
-        if not last is None:
-            return int(last)
+        def parse(last):
+            if not last is None:
+                return int(last)
+
+        return fetch(self.LAST_BLOCK).addCallback(parse)
 
     def latestHash(self):
-        return safe_get([self.LASH_HASH], None)
+        return fetch(self.LAST_HASH)
 
 class BlockExplorerAPI(object):
     BLOCK_HASH = 'https://blockexplorer.com/q/getblockhash/{}'
@@ -224,18 +451,20 @@ class BlockExplorerAPI(object):
         pass
 
     def blockHash(self, block):
-        return safe_get([self.BLOCK_HASH.format(block)], None)
+        return fetch(self.BLOCK_HASH.format(block))
 
     def currentBlock(self):
-        last = safe_get([self.LAST_BLOCK], None)
-        if not last is None:
-            return int(last)
+        def parse(last):
+            if not last is None:
+                return int(last)
+
+        return fetch(self.LAST_BLOCK).addCallback(parse)
 
     def latestHash(self):
-        return safe_get([self.LASH_HASH], None)
+        return fetch(self.LAST_HASH)
 
     def totalBCs(self):
-        return safe_get([self.TOTAL_BCS], None)
+        return fetch(self.TOTAL_BCS)
 
 class BlockrAPI(object):
     AVG_RATE = 'http://btc.blockr.io/api/v1/exchangerate/current'
@@ -247,42 +476,54 @@ class BlockrAPI(object):
         pass
 
     def averageUSD(self):
-        avg = safe_get([self.AVG_RATE], None)
-        if not avg is None:
-            rates = json.loads(avg)['data'][0]['rates']
-            usd = 1.0 / float(rates['BTC'])
-            return round(usd, 2)
+        def parse(avg):
+            if not avg is None:
+                rates = json.loads(avg)['data'][0]['rates']
+                usd = 1.0 / float(rates['BTC'])
+                return round(usd, 2)
+
+        return fetch(self.AVG_RATE).addCallback(parse)
 
     def balance(self, addr, min_confirms):
         bal_url = self.BALANCE.format(addr, min_confirms)
         bal_url += '&amount_format=float'
 
-        bal = safe_get([bal_url], None)
-        if not bal is None:
-            balj = json.loads(bal)
-            return balj['data']['balance']
+        def parse(bal):
+            if not bal is None:
+                balj = json.loads(bal)
+                return balj['data']['balance']
+
+        return fetch(bal_url).addCallback(parse)
 
     def blockHash(self, block):
-        block_data = safe_get([self.BLOCK_INFO.format(block)], None)
-        if not block_data is None:
-            block_data = json.loads(block_data)
-            if block_data['status'] == 'success':
-                return block_data['data']['hash']
+        def parse(block_data):
+            if not block_data is None:
+                block_data = json.loads(block_data)
+                if block_data['status'] == 'success':
+                    return block_data['data']['hash']
+
+        return fetch(self.BLOCK_INFO.format(block)).addCallback(parse)
 
     def blockTS(self, block):
-        block = safe_get([self.BLOCK_INFO.format(block)], None)
-        if block:
-            tss = json.loads(block)['data']['time_utc']
-            return int(parse(tss, tzinfos={'UTC': 0}).strftime('%s'))
+        def parse(block):
+            if block:
+                tss = json.loads(block)['data']['time_utc']
+                return int(parse_date(tss, tzinfos={'UTC': 0}).strftime('%s'))
+
+        return fetch(self.BLOCK_INFO.format(block)).addCallback(parse)
     
     def currentBlock(self):
-        last = safe_get([self.LAST_BLOCK], None)
-        if not last is None:
-            lastj = json.loads(last)
-            return lastj['data']['nb']
+        def parse(last):
+            if not last is None:
+                lastj = json.loads(last)
+                return lastj['data']['nb']
+
+        return fetch(self.LAST_BLOCK).addCallback(parse)
 
     def latestHash(self):
-        last = safe_get([self.LAST_BLOCK], None)
-        if not last is None:
-            lastj = json.loads(last)
-            return lastj['data']['hash']
+        def parse(last):
+            if not last is None:
+                lastj = json.loads(last)
+                return lastj['data']['hash']
+
+        return fetch(self.LAST_BLOCK).addCallback(parse)
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+'''
+Size bounded LRU caches whose entries expire.
+
+Caches made with named() outlive plugin reloads, and can be
+saved to disk so they also outlive restarts.
+'''
+
+from collections import OrderedDict
+import cPickle as pickle
+import os
+import sys
+import threading
+import time
+import zlib
+
+from twisted.internet import defer, reactor, task
+from twisted.python import log
+
+import utils.snapshot as usnapshot
+
+# Returned by get for keys which aren't cached, since
+# None is a perfectly good value to cache
+MISSING = object()
+
+# Caches by name, see named()
+_caches = {}
+
+def named(name, max_entries, max_bytes=None, path=None, save_interval=300):
+    '''
+    Return the TTLCache with the given name, creating it
+    the first time it's asked for.
+
+    A cache with a path is loaded from it when created, then
+    saved to it every save_interval seconds and at shutdown.
+    '''
+    if name not in _caches:
+        c = TTLCache(max_entries, max_bytes, path)
+        if path is not None:
+            c.load()
+            task.LoopingCall(c.save).start(save_interval, now=False)
+            reactor.addSystemEventTrigger('before', 'shutdown', c.save)
+
+        _caches[name] = c
+
+    return _caches[name]
+
+class TTLCache(object):
+    '''
+    LRU cache whose entries each expire after their own TTL.
+
+    Holds at most max_entries entries and, if given, roughly
+    max_bytes bytes of keys and values; the least recently
+    used entries are evicted to stay within both.  Safe to use
+    from the reactor and thread pool at once.
+    '''
+    def __init__(self, max_entries, max_bytes=None, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+
+        # key -> (expires, size, value), least recently used first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self, match=None):
+        '''
+        Remove every entry, or only those whose key match
+        returns True for.  Returns how many were removed.
+        '''
+        with self.lock:
+            keys = [k for k in self.entries if match is None or match(k)]
+            for key in keys:
+                self._remove(key)
+
+        return len(keys)
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def get(self, key, default=MISSING):
+        '''
+        Return the value cached for key, or default if it isn't
+        cached or has expired.
+        '''
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None and entry[0] < time.time():
+                self.size -= entry[1]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            # Move it to the most recently used end
+            self.entries[key] = entry
+            self.hits += 1
+            return entry[-1]
+
+    def keys(self):
+        '''
+        Return a list of the cached keys, least recently used first.
+        '''
+        with self.lock:
+            return self.entries.keys()
+
+    def load(self):
+        '''
+        Load unexpired entries saved to the cache's path.
+        '''
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'rb') as pf:
+                saved = pickle.loads(zlib.decompress(pf.read()))
+        except:
+            log.err('[Error]: Cannot load cache {}'.format(self.path))
+            return
+
+        now = time.time()
+        for key, (expires, value) in saved:
+            if expires > now:
+                self.set(key, value, expires - now)
+
+    def save(self):
+        '''
+        Return a Deferred firing once unexpired entries have
+        been saved to the cache's path, in the background.  The
+        file is replaced atomically, so a crash never leaves
+        half of it.
+        '''
+        if self.path is None:
+            return defer.succeed(None)
+
+        now = time.time()
+        with self.lock:
+            saved = [(k, (e[0], e[-1])) for k, e in self.entries.iteritems() \
+                     if e[0] > now]
+
+        return usnapshot.snapshotter().save(self.path, saved)
+
+    def set(self, key, value, ttl):
+        '''
+        Cache value for key for ttl seconds.
+        '''
+        size = sizeof(key) + sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            self.entries[key] = (time.time() + ttl, size, value)
+            self.size += size
+
+            while len(self.entries) > self.max_entries or \
+                    (self.max_bytes is not None and self.size > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def stats(self):
+        '''
+        Return a dict of counters describing the cache.
+        '''
+        lookups = self.hits + self.misses
+        return { 'entries': len(self.entries)
+               , 'bytes': self.size
+               , 'hits': self.hits
+               , 'misses': self.misses
+               , 'hit_rate': float(self.hits) / lookups if lookups else 0.0
+               , 'evictions': self.evictions
+               , 'expirations': self.expirations
+               }
+
+    def _remove(self, key):
+        self.size -= self.entries.pop(key)[1]
+
+def sizeof(obj):
+    '''
+    Rough size in bytes of a cache key or value.
+    '''
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(sizeof(o) for o in obj)
+
+    return sys.getsizeof(obj)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+'''
+Case folding of nicks and channels as IRC servers compare
+them.
+'''
+
+import string
+
+# RFC 1459 takes {}|^ to be the lowercase of []\~
+_RFC1459_LOWER = dict((ord(u), ord(l)) for u, l in
+                      zip(string.ascii_uppercase + u'[]\\~',
+                          string.ascii_lowercase + u'{}|^'))
+
+def lower(name):
+    '''
+    Return a unicode nick or channel as IRC servers compare
+    it, i.e., lowercase under RFC 1459 casemapping.
+    '''
+    return name.translate(_RFC1459_LOWER)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+'''
+Parser for commands, including nested ones, e.g.,
+
+    echo [rot13 "some text"] and more
+
+parses to
+
+    (u'echo', (u'rot13', u'some text'), u'and', u'more')
+
+Words are split on whitespace and may be quoted as in
+a POSIX shell.  A command with an unterminated quote is
+parsed as if its quotes and backslashes were ordinary
+characters.
+'''
+
+from collections import OrderedDict
+import re
+
+class ParseError(SyntaxError):
+    def __init__(self, message, pos):
+        super(ParseError, self).__init__(
+                u'{} at character {}'.format(message, pos + 1))
+
+        # Index in the command where the error was found
+        self.pos = pos
+
+class Parser(object):
+    '''
+    Turns a command into a tuple whose first item is the
+    command's name and whose remaining items are its
+    arguments.  Each argument is a unicode object or, for
+    a nested command, another such tuple.
+
+    Parsing is done in a single pass over the command, and
+    the most recently parsed commands are remembered.
+    '''
+    def __init__(self, left=u'[', right=u']', max_nesting=5,
+                 cache_size=256, max_nested=None,
+                 max_nesting_error=u'Maximum of {} nested command(s)',
+                 max_nested_error=u'Maximum of {} nested commands per line',
+                 unbalanced_error=u'Command has unbalanced {} and {}\'s',
+                 unexpected_error=u'Unexpected {}'):
+        '''
+        Parameters
+        ----------
+            left, right: unicode
+                Single characters around nested commands
+
+            max_nesting: int
+                Most commands which may be nested in each other
+
+            cache_size: int
+                Number of parsed commands remembered
+
+            max_nested: int
+                Most nested commands in a whole command, or None
+        '''
+        self.left = left
+        self.right = right
+        self.max_nesting = max_nesting
+        self.cache_size = cache_size
+        self.max_nested = max_nested
+
+        self.max_nesting_error = max_nesting_error.format(max_nesting)
+        self.max_nested_error = max_nested_error.format(max_nested)
+        self.unbalanced_error = unbalanced_error.format(left, right)
+        self.unexpected_error = unexpected_error.format(right)
+
+        self.cache = OrderedDict()
+
+        # One alternative per kind of token; the last only
+        # matches an unterminated quote or trailing backslash
+        brackets = re.escape(left + right)
+        self.quoted_re = re.compile(u'|'.join(
+                    [ ur'(?P<space>\s+)'
+                    , u'(?P<left>{})'.format(re.escape(left))
+                    , u'(?P<right>{})'.format(re.escape(right))
+                    , ur'(?P<word>[^\s{}"\'\\]+)'.format(brackets)
+                    , ur"'(?P<single>[^']*)'"
+                    , ur'"(?P<double>(?:[^"\\]|\\.)*)"'
+                    , ur'\\(?P<escape>.)'
+                    , ur'(?P<bad>.)'
+                    ]), re.UNICODE | re.DOTALL)
+        self.literal_re = re.compile(u'|'.join(
+                    [ ur'(?P<space>\s+)'
+                    , u'(?P<left>{})'.format(re.escape(left))
+                    , u'(?P<right>{})'.format(re.escape(right))
+                    , ur'(?P<word>[^\s{}]+)'.format(brackets)
+                    ]), re.UNICODE | re.DOTALL)
+
+    def parse(self, msg):
+        '''
+        Return the tuple for a command, raising ParseError if
+        its nesting is unbalanced or too deep, or it has too
+        many nested commands.
+        '''
+        if msg in self.cache:
+            expr = self.cache.pop(msg)
+        else:
+            try:
+                expr = self.read(msg, self.quoted_re)
+            except _Unterminated:
+                expr = self.read(msg, self.literal_re)
+
+            if len(self.cache) >= self.cache_size:
+                self.cache.popitem(last=False)
+
+        self.cache[msg] = expr
+        return expr
+
+    def read(self, msg, token_re):
+        '''
+        Parse msg in one pass over the tokens token_re finds.
+        '''
+        # Expressions being read, innermost last, and where
+        # each nested one started
+        stack = [[]]
+        starts = []
+        nested = 0
+
+        # Pieces of the word being read, since quoted and
+        # unquoted pieces with no space between form one word
+        word = None
+
+        for m in token_re.finditer(msg):
+            kind = m.lastgroup
+            if kind in ('word', 'single', 'double', 'escape'):
+                piece = m.group(kind)
+                if kind == 'double':
+                    piece = _DOUBLE_ESCAPE_RE.sub(ur'\1', piece)
+
+                if word is None:
+                    word = [piece]
+                else:
+                    word.append(piece)
+                continue
+
+            if word is not None:
+                stack[-1].append(u''.join(word))
+                word = None
+
+            if kind == 'left':
+                if len(stack) > self.max_nesting:
+                    raise ParseError(self.max_nesting_error, m.start())
+                nested += 1
+                if self.max_nested is not None and nested > self.max_nested:
+                    raise ParseError(self.max_nested_error, m.start())
+                stack.append([])
+                starts.append(m.start())
+
+            elif kind == 'right':
+                if len(stack) == 1:
+                    raise ParseError(self.unexpected_error, m.start())
+                expr = tuple(stack.pop())
+                starts.pop()
+                stack[-1].append(expr)
+
+            elif kind == 'bad':
+                raise _Unterminated()
+
+        if word is not None:
+            stack[-1].append(u''.join(word))
+
+        if starts:
+            raise ParseError(self.unbalanced_error, starts[-1])
+
+        return tuple(stack[0])
+
+#-------------------------------------
+#
+#    Helper Classes and Functions
+#
+#-------------------------------------
+# Backslashes only escape these inside double quotes
+_DOUBLE_ESCAPE_RE = re.compile(r'\\([\\"])')
+
+class _Unterminated(Exception):
+    '''
+    Raised on an unterminated quote or trailing backslash.
+    '''
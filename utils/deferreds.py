@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+from twisted.internet import defer, reactor
+from twisted.python import failure
+
+class DeadlineExceeded(Exception):
+    def __init__(self, seconds):
+        super(DeadlineExceeded, self).__init__(
+                'Deadline of {} seconds exceeded'.format(seconds))
+
+        # How long was waited before giving up
+        self.seconds = seconds
+
+def deadline(d, seconds):
+    '''
+    Return a Deferred which fires with the result of d, or
+    fails with DeadlineExceeded if d hasn't fired after the
+    given number of seconds.
+
+    d is cancelled once the deadline passes.  Work which can't
+    be cancelled, e.g., a call running on a thread pool, is
+    left to finish and its result is thrown away.
+
+    Parameters
+    ----------
+        d: Deferred
+            Deferred to wait on
+
+        seconds: float or None
+            Seconds to wait; None waits forever
+    '''
+    if seconds is None:
+        return d
+
+    result = defer.Deferred(lambda _: d.cancel())
+
+    def expire():
+        if not result.called:
+            result.errback(DeadlineExceeded(seconds))
+        d.cancel()
+
+    timer = reactor.callLater(seconds, expire)
+
+    def done(outcome):
+        if timer.active():
+            timer.cancel()
+
+        # Anything arriving after the deadline is dropped
+        if not result.called:
+            result.callback(outcome)
+
+    d.addBoth(done)
+    return result
+
+def gather(ds):
+    '''
+    Return a Deferred firing with a list of the results of
+    the Deferreds in ds, in the same order.
+
+    If any of them fails, the rest are cancelled and the
+    returned Deferred fails with that failure itself, rather
+    than the FirstError gatherResults would wrap it in.
+    '''
+    def failed(reason):
+        reason.trap(defer.FirstError)
+        for d in ds:
+            if not d.called:
+                d.cancel()
+
+        return reason.value.subFailure
+
+    return defer.gatherResults(ds, consumeErrors=True).addErrback(failed)
+
+def race(calls, hedge=None, timeout=None, accept=None, observe=None):
+    '''
+    Return a Deferred firing with the first acceptable result
+    of a list of calls, each of which may return a Deferred.
+
+    The first call is made straight away.  The next is made once
+    every call made so far has failed, or, if hedge is given,
+    after hedge seconds without an acceptable result, whichever
+    comes first.  Calls still running once a result is accepted
+    are cancelled.  Fires with None if no call produces an
+    acceptable result before the timeout.
+
+    Parameters
+    ----------
+        calls: list
+            Callables taking no arguments
+
+        hedge: float or None
+            Seconds to wait before hedging to the next call; 0
+            makes every call at once and None only moves on
+            after a failure
+
+        timeout: float or None
+            Seconds to wait for an acceptable result
+
+        accept: callable
+            Returns True if a result is acceptable; defaults to
+            accepting anything but None
+
+        observe: callable
+            Called as observe(i, seconds, ok) with how long
+            calls[i] took and whether it succeeded.  Calls which
+            lost to a faster one started after them are reported
+            as failed after the time they had been running
+    '''
+    if accept is None:
+        accept = lambda r: r is not None
+
+    running = {}
+    state = {'next': 0, 'hedger': None, 'expirer': None, 'settled': False}
+
+    def launch():
+        i = state['next']
+        if i >= len(calls) or state['settled']:
+            return
+
+        state['next'] += 1
+        started = reactor.seconds()
+        d = defer.maybeDeferred(calls[i])
+        running[i] = (d, started)
+        d.addBoth(finished, i, started)
+
+        # Schedule the hedge, unless the call already settled things
+        if hedge and not state['settled'] and i + 1 < len(calls):
+            if state['hedger'] is not None and state['hedger'].active():
+                state['hedger'].cancel()
+            state['hedger'] = reactor.callLater(hedge, launch)
+
+    def finished(outcome, i, started):
+        if state['settled']:
+            return
+
+        del running[i]
+        ok = not isinstance(outcome, failure.Failure) and accept(outcome)
+        if observe is not None:
+            observe(i, reactor.seconds() - started, ok)
+
+        if ok:
+            settle(outcome, started)
+        elif not running and state['next'] >= len(calls):
+            settle(None)
+        elif state['next'] < len(calls) and \
+                (hedge is None or not running):
+            launch()
+
+    def settle(value, won_started=None):
+        state['settled'] = True
+        for timer in (state['hedger'], state['expirer']):
+            if timer is not None and timer.active():
+                timer.cancel()
+
+        now = reactor.seconds()
+        for i, (d, started) in running.items():
+            if observe is not None and \
+                    (won_started is None or started < won_started):
+                observe(i, now - started, False)
+            d.cancel()
+
+        running.clear()
+        if not result.called:
+            result.callback(value)
+
+    result = defer.Deferred(lambda _: settle(None))
+    if timeout is not None:
+        state['expirer'] = reactor.callLater(timeout, settle, None)
+
+    if hedge == 0:
+        for _ in calls:
+            launch()
+    else:
+        launch()
+
+    if not calls:
+        settle(None)
+
+    return result
+
+def shield(d):
+    '''
+    Return a Deferred firing with the result of d, which can
+    be cancelled without cancelling d, e.g., to stop waiting on
+    a call running on a thread pool while still being told
+    when it returns.  d's result is passed on unchanged.
+    '''
+    result = defer.Deferred()
+
+    def done(outcome):
+        # Cancelling result suppresses this once it's called
+        if isinstance(outcome, failure.Failure):
+            result.errback(outcome)
+        else:
+            result.callback(outcome)
+
+        return outcome
+
+    d.addBoth(done)
+    return result
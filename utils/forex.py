@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+'''
+Foreign exchange rates from openexchangerates.org, refreshed
+in the background.
+
+Rates are fetched on the reactor before they go stale, and
+each fetch builds a new Rates: the currencies, an index of
+them, and the matrix of every cross rate, which is never
+changed once built.  Commands read whichever Rates is
+current, so never wait on the network, and look up any
+number of pairs with a single gather from the matrix.
+'''
+
+import datetime
+
+import numpy as np
+from twisted.internet import defer, task
+from twisted.python import log
+
+import utils.httpclient as uhttp
+
+LATEST_URL = 'http://openexchangerates.org/api/latest.json?app_id={}'
+CURRENCIES_URL = 'http://openexchangerates.org/api/currencies.json?app_id={}'
+
+# Fraction of refresh_rate between refreshes, so new rates
+# arrive before the current ones go stale
+REFRESH_AHEAD = 0.8
+
+# Services by API key, see named()
+_services = {}
+
+def named(api_key, **kwargs):
+    '''
+    Return the RateService for an API key, starting it the
+    first time it's asked for, so it outlives plugin reloads.
+    Keyword arguments are passed to RateService.
+    '''
+    if api_key not in _services:
+        _services[api_key] = RateService(api_key, **kwargs)
+
+    return _services[api_key]
+
+class Rates(object):
+    '''
+    Every cross rate between a set of currencies at one time.
+    '''
+    def __init__(self, base_rates, names, fetched=None):
+        '''
+        Parameters
+        ----------
+            base_rates: dict
+                Currency code -> units of it one unit of the
+                base currency buys
+
+            names: dict
+                Currency code -> long name
+
+            fetched: datetime
+                UTC time the rates were fetched; defaults to now
+        '''
+        self.codes = tuple(sorted(base_rates))
+        self.index = dict((c, i) for i, c in enumerate(self.codes))
+        self.names = names
+        self.fetched = fetched or datetime.datetime.utcnow()
+
+        # matrix[i, j] is how much of codes[j] one codes[i] buys
+        base = np.array([base_rates[c] for c in self.codes], dtype=np.float64)
+        self.matrix = np.outer(1.0 / base, base)
+        self.matrix.setflags(write=False)
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def age(self):
+        '''
+        Seconds since the rates were fetched.
+        '''
+        return (datetime.datetime.utcnow() - self.fetched).total_seconds()
+
+    def long_name(self, code):
+        '''
+        Return the long name of a currency code, or the code
+        if it has none.
+        '''
+        return self.names.get(code, code)
+
+    def rates(self, pairs):
+        '''
+        Return a list of the rates of a list of (from, to)
+        currency codes, all of which must be known.
+        '''
+        if not pairs:
+            return []
+
+        rows = [self.index[cfrom] for cfrom, _ in pairs]
+        cols = [self.index[cto] for _, cto in pairs]
+        return self.matrix[rows, cols].tolist()
+
+class RateService(object):
+    def __init__(self, api_key, refresh_rate=3600):
+        '''
+        Parameters
+        ----------
+            api_key: string
+                openexchangerates.org app ID
+
+            refresh_rate: float
+                Seconds before rates go stale
+        '''
+        self.latest_url = LATEST_URL.format(api_key)
+        self.currencies_url = CURRENCIES_URL.format(api_key)
+        self.refresh_rate = refresh_rate
+
+        # The current Rates, or None until first fetched, and
+        # the Deferred of the fetch under way, if any
+        self.rates = None
+        self.fetching = None
+
+        self.refresher = task.LoopingCall(self.refresh)
+        self.refresher.start(refresh_rate * REFRESH_AHEAD)
+
+    def built(self, results):
+        '''
+        Callback replacing the current Rates with new ones.
+        '''
+        latest, names = results
+        if 'rates' not in latest:
+            raise ValueError(latest.get('description', 'No rates returned'))
+
+        self.rates = Rates(latest['rates'], names)
+
+    def fetchJSON(self, url):
+        d = uhttp.request('GET', url)
+        d.addCallback(lambda r: r.json())
+        return d
+
+    def refresh(self):
+        '''
+        Return a Deferred firing once new rates have been
+        fetched, or have failed to be.  Only one fetch is made
+        at a time.
+        '''
+        if self.fetching is not None:
+            return self.fetching
+
+        # Currency names hardly change, so are fetched once
+        if self.rates is None:
+            names = self.fetchJSON(self.currencies_url)
+        else:
+            names = defer.succeed(self.rates.names)
+
+        d = self.fetching = defer.gatherResults(
+                [self.fetchJSON(self.latest_url), names], consumeErrors=True)
+        d.addCallback(self.built)
+        d.addErrback(log.err, '[Error]: Cannot refresh forex rates')
+
+        def done(_):
+            self.fetching = None
+
+        return d.addBoth(done)
+
+    def stale(self):
+        '''
+        Whether there are no rates, or they're older than
+        refresh_rate, e.g., because refreshing has failed.
+        '''
+        return self.rates is None or self.rates.age() > self.refresh_rate
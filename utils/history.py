@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+'''
+Searchable history of the lines said in channels.
+
+The last lines_per_nick lines of each nick in each channel
+are kept in SQLite, with a full text index of the lines and
+a table of where each nick was last seen.  Lines are written
+in batches, and every query runs, on a thread of the
+history's own, so the reactor never waits on the disk.
+'''
+
+import re
+import sqlite3
+import time
+
+from twisted.internet import reactor, task, threads
+from twisted.python import log
+from twisted.python.threadpool import ThreadPool
+
+import utils.casemap as ucasemap
+from utils.utf8 import decode
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS lines
+    ( id INTEGER PRIMARY KEY
+    , channel TEXT NOT NULL
+    , nick TEXT NOT NULL
+    , lnick TEXT NOT NULL
+    , ts INTEGER NOT NULL
+    );
+CREATE INDEX IF NOT EXISTS lines_lnick ON lines (lnick, channel, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines_text USING fts4 (msg);
+CREATE TABLE IF NOT EXISTS nicks
+    ( lnick TEXT PRIMARY KEY
+    , nick TEXT NOT NULL
+    , channel TEXT NOT NULL
+    , ts INTEGER NOT NULL
+    , line INTEGER NOT NULL
+    );
+'''
+
+# RFC 1459 folding of globs, which leaves [ and ] to stand for
+# character classes
+_GLOB_LOWER = dict((ord(u), ord(l)) for u, l in zip(u'\\~', u'|^'))
+
+def fold(name):
+    '''
+    Return a nick or channel as IRC servers compare it, see
+    utils.casemap.lower.
+    '''
+    return ucasemap.lower(text(name))
+
+def text(name):
+    '''
+    Return a nick or channel as unicode, as IRC gives them as
+    bytes, which SQLite won't take.
+    '''
+    return name if isinstance(name, unicode) else decode(name)
+
+# Histories by path, see named()
+_histories = {}
+
+def named(path, **kwargs):
+    '''
+    Return the History saved at path, opening it the first
+    time it's asked for, so it outlives plugin reloads.
+    Keyword arguments are passed to History.
+    '''
+    if path not in _histories:
+        _histories[path] = History(path, **kwargs)
+
+    return _histories[path]
+
+class History(object):
+    def __init__(self, path, lines_per_nick=20, flush_interval=5,
+                 flush_threshold=500):
+        '''
+        Parameters
+        ----------
+            path: string
+                Path of the SQLite database
+
+            lines_per_nick: int
+                Lines kept for each nick in each channel
+
+            flush_interval: float
+                Most seconds a line waits to be written
+
+            flush_threshold: int
+                Waiting lines which trigger a write
+        '''
+        self.path = path
+        self.lines_per_nick = lines_per_nick
+        self.flush_threshold = flush_threshold
+
+        # Lines waiting to be written
+        self.pending = []
+
+        # SQLite connections belong to the thread which made
+        # them, so everything is done on a single thread
+        self.db = None
+        self.pool = ThreadPool(1, 1, 'history')
+        self.pool.start()
+        reactor.addSystemEventTrigger('before', 'shutdown', self.flush)
+        reactor.addSystemEventTrigger('during', 'shutdown', self.pool.stop)
+
+        self.flusher = task.LoopingCall(self.flush)
+        self.flusher.start(flush_interval, now=False)
+
+    def add(self, channel, nick, msg):
+        '''
+        Record a line said in a channel.  Channels are kept
+        folded to lowercase, so one spelled differently is the
+        same channel.
+        '''
+        self.pending.append((fold(channel), text(nick), int(time.time()), msg))
+        if len(self.pending) >= self.flush_threshold:
+            self.flush()
+
+    def flush(self):
+        '''
+        Return a Deferred firing once the waiting lines
+        have been written.
+        '''
+        pending, self.pending = self.pending, []
+        d = self.run(self._write, pending)
+        d.addErrback(log.err, '[Error]: Cannot write history')
+        return d
+
+    def lastSeen(self, nick):
+        '''
+        Return a Deferred firing with (nick, channel, ts, msg)
+        for the last line nick said in any channel, or None.
+        '''
+        return self.run(self._one, '''
+            SELECT n.nick, n.channel, n.ts, t.msg FROM nicks n
+            JOIN lines_text t ON t.docid = n.line
+            WHERE n.lnick = ?''', (fold(nick),))
+
+    def matching(self, glob, limit=5):
+        '''
+        Return a Deferred firing with a list of (nick, channel,
+        ts) of the nicks matching a glob, e.g., bane*, most
+        recently seen first.
+        '''
+        # [ and ] are left for character classes
+        glob = glob.lower().translate(_GLOB_LOWER)
+        sql = 'SELECT nick, channel, ts FROM nicks WHERE lnick GLOB ?'
+        params = (glob,)
+
+        # SQLite won't use the index for a GLOB with parameters,
+        # so the nicks starting with its literal prefix are given
+        prefix = re.split(r'[*?\[]', glob, 1)[0]
+        if prefix:
+            sql += ' AND lnick >= ? AND lnick < ?'
+            params += (prefix, prefix[:-1] + unichr(ord(prefix[-1]) + 1))
+
+        return self.run(self._all, sql + ' ORDER BY line DESC LIMIT ?',
+                        params + (limit,))
+
+    def run(self, f, *args):
+        return threads.deferToThreadPool(reactor, self.pool, f, *args)
+
+    def search(self, words, channel=None):
+        '''
+        Return a Deferred firing with (nick, channel, ts, msg)
+        of the last line containing all of words, or None.
+        '''
+        # Quote each word, so none is taken as a query operator
+        query = u' '.join(u'"{}"'.format(w.replace(u'"', u''))
+                          for w in words)
+        sql = '''
+            SELECT l.nick, l.channel, l.ts, t.msg FROM lines_text t
+            JOIN lines l ON l.id = t.docid
+            WHERE t.msg MATCH ?'''
+        params = (query,)
+        if channel is not None:
+            sql += ' AND l.channel = ?'
+            params += (fold(channel),)
+
+        # The full text index can give the newest lines first
+        return self.run(self._one, sql + ' ORDER BY t.docid DESC LIMIT 1',
+                        params)
+
+    #-------------------------------------------------
+    #
+    #       Run on the history's thread
+    #
+    #-------------------------------------------------
+    def _all(self, sql, params):
+        return self._connect().execute(sql, params).fetchall()
+
+    def _connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path)
+            self.db.executescript(SCHEMA)
+
+        return self.db
+
+    def _one(self, sql, params):
+        return self._connect().execute(sql, params).fetchone()
+
+    def _write(self, pending):
+        if not pending:
+            return
+
+        db = self._connect()
+        with db:
+            for channel, nick, ts, msg in pending:
+                line = db.execute('''
+                    INSERT INTO lines (channel, nick, lnick, ts)
+                    VALUES (?, ?, ?, ?)''',
+                    (channel, nick, fold(nick), ts)).lastrowid
+                db.execute('INSERT INTO lines_text (docid, msg) VALUES (?, ?)',
+                           (line, msg))
+                db.execute('''
+                    INSERT OR REPLACE INTO nicks (lnick, nick, channel, ts, line)
+                    VALUES (?, ?, ?, ?, ?)''',
+                    (fold(nick), nick, channel, ts, line))
+
+            # Only keep the newest lines of each nick written to
+            for channel, lnick in set((p[0], fold(p[1])) for p in pending):
+                old = [r[0] for r in db.execute('''
+                    SELECT id FROM lines WHERE lnick = ? AND channel = ?
+                    ORDER BY id DESC LIMIT -1 OFFSET ?''',
+                    (lnick, channel, self.lines_per_nick))]
+                if old:
+                    marks = ','.join('?' * len(old))
+                    db.execute('DELETE FROM lines WHERE id IN ({})'.format(marks), old)
+                    db.execute('DELETE FROM lines_text WHERE docid IN ({})'.format(marks), old)
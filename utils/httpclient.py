@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+
+'''
+Shared HTTP client for plugins.
+
+Two interfaces are offered, both of which keep connections
+alive between requests to the same host, apply connect and
+read timeouts and cap how much of a response body is read:
+
+    get/head/post:
+        Blocking, requests-compatible calls made through a
+        single pooled requests.Session.  For code running on
+        the command thread pool.
+
+    request:
+        Returns a Deferred firing with an HTTPResponse.  Built
+        on a twisted.web Agent with a persistent connection
+        pool, gzip decoding and redirect following.  For code
+        running on the reactor, e.g., nonblocking commands.
+'''
+
+import cgi
+from cStringIO import StringIO
+import json
+from urllib import urlencode
+
+from OpenSSL import SSL
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import requote_uri
+from twisted.internet import defer, protocol, reactor, ssl
+from twisted.internet.interfaces import IOpenSSLClientConnectionCreator
+from twisted.web.client import Agent, BrowserLikeRedirectAgent, \
+                               ContentDecoderAgent, FileBodyProducer, \
+                               GzipDecoder, HTTPConnectionPool, \
+                               PartialDownloadError, ResponseDone
+from twisted.web.http import PotentialDataLoss
+from twisted.web.http_headers import Headers
+from twisted.web.iweb import IPolicyForHTTPS
+from zope.interface import implementer
+
+from utils.deferreds import deadline
+from utils.utf8 import decode
+
+# Constants
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 15
+MAX_BYTES = 2 ** 20
+MAX_PER_HOST = 4
+IDLE_TIMEOUT = 120
+USER_AGENT = 'Mozilla/5.0 (compatible; BaneBot; ' + \
+             '+https://github.com/genericpersona/banebot)'
+
+#-------------------------------------------------
+#
+#               Blocking Interface
+#
+#-------------------------------------------------
+_session = None
+
+def session():
+    '''
+    Return the requests.Session shared by all blocking calls.
+    '''
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers['User-Agent'] = USER_AGENT
+
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=MAX_PER_HOST)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+
+    return _session
+
+def get(url, **kwargs):
+    '''
+    Blocking GET of url, returning a requests.Response.
+
+    Accepts the keyword arguments of requests.get, plus
+    max_bytes to change how much of the body is read.
+    '''
+    return _request('GET', url, **kwargs)
+
+def head(url, **kwargs):
+    '''
+    Blocking HEAD of url, returning a requests.Response.
+    '''
+    kwargs.setdefault('allow_redirects', False)
+    return _request('HEAD', url, **kwargs)
+
+def post(url, data=None, **kwargs):
+    '''
+    Blocking POST of data to url, returning a requests.Response.
+    '''
+    return _request('POST', url, data=data, **kwargs)
+
+def _request(method, url, max_bytes=MAX_BYTES, **kwargs):
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+    kwargs['stream'] = True
+
+    r = session().request(method, url, **kwargs)
+    try:
+        chunks, size = [], 0
+        for chunk in r.iter_content(8192):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                break
+
+        r._content = ''.join(chunks)[:max_bytes]
+    finally:
+        # Fully read bodies hand the connection back to the pool
+        r.close()
+
+    return r
+
+#-------------------------------------------------
+#
+#               Deferred Interface
+#
+#-------------------------------------------------
+_agents = {}
+_pools = {}
+
+def pool(verify=True):
+    '''
+    Return the persistent connection pool for verified, or
+    unverified, connections.  They are kept apart so a request
+    needing verification never reuses an unverified connection.
+    '''
+    if verify not in _pools:
+        _pools[verify] = HTTPConnectionPool(reactor, persistent=True)
+        _pools[verify].maxPersistentPerHost = MAX_PER_HOST
+        _pools[verify].cachedConnectionTimeout = IDLE_TIMEOUT
+
+    return _pools[verify]
+
+def agent(verify=True):
+    '''
+    Return the Agent shared by all Deferred requests.
+
+    Parameters
+    ----------
+        verify: bool
+            Whether TLS certificates are verified
+    '''
+    if verify not in _agents:
+        if verify:
+            base = Agent(reactor, connectTimeout=CONNECT_TIMEOUT,
+                         pool=pool(verify))
+        else:
+            base = Agent(reactor, contextFactory=InsecurePolicy(),
+                         connectTimeout=CONNECT_TIMEOUT, pool=pool(verify))
+
+        _agents[verify] = BrowserLikeRedirectAgent(
+                            ContentDecoderAgent(base, [('gzip', GzipDecoder)]))
+
+    return _agents[verify]
+
+def request(method, url, data=None, headers=None, timeout=READ_TIMEOUT,
+            max_bytes=MAX_BYTES, verify=True, accept=None, until=None):
+    '''
+    Request url and return a Deferred firing with an HTTPResponse.
+
+    Parameters
+    ----------
+        method: string
+            HTTP method, e.g., 'GET'
+
+        url: string
+            URL to request
+
+        data: string or dict
+            Request body; a dict is form encoded
+
+        headers: dict
+            Extra request headers
+
+        timeout: float
+            Seconds allowed for the whole request, body included
+
+        max_bytes: int
+            Most bytes of the body to read
+
+        verify: bool
+            Whether TLS certificates are verified
+
+        accept: callable
+            Called with the HTTPResponse before its body is read;
+            if it returns False the body is skipped
+
+        until: callable
+            Called with each chunk of the body as it arrives; if
+            it returns True the rest of the body is skipped
+    '''
+    url = requote_uri(url.encode('utf-8') if isinstance(url, unicode) else url)
+
+    hdrs = Headers({'User-Agent': [USER_AGENT]})
+    for k, v in (headers or {}).iteritems():
+        hdrs.setRawHeaders(k, [v])
+
+    producer = None
+    if data is not None:
+        if isinstance(data, dict):
+            data = urlencode(data)
+            hdrs.setRawHeaders('Content-Type',
+                               ['application/x-www-form-urlencoded'])
+        producer = FileBodyProducer(StringIO(data))
+
+    d = agent(verify).request(method, url, hdrs, producer)
+    d.addCallback(_readResponse, url, max_bytes, accept, until)
+    return deadline(d, timeout)
+
+def _readResponse(response, url, max_bytes, accept, until):
+    result = HTTPResponse(url, response.code, response.headers)
+    if accept is not None and not accept(result):
+        max_bytes = 0
+
+    reader = _BodyReader(defer.Deferred(lambda _: \
+                            reader.transport.stopProducing()),
+                         max_bytes, until)
+    response.deliverBody(reader)
+
+    def build(body):
+        result.content, result.truncated = body
+        return result
+
+    return reader.finished.addCallback(build)
+
+class _BodyReader(protocol.Protocol):
+    '''
+    Collects a response body, stopping once max_bytes
+    have arrived or until says to.
+    '''
+    def __init__(self, finished, max_bytes, until=None):
+        self.finished = finished
+        self.max_bytes = max_bytes
+        self.until = until
+
+        self.chunks = []
+        self.size = 0
+
+    def connectionLost(self, reason):
+        if self.finished.called:
+            return
+
+        if reason.check(ResponseDone, PotentialDataLoss, PartialDownloadError):
+            self.finished.callback((''.join(self.chunks), False))
+        else:
+            self.finished.errback(reason)
+
+    def connectionMade(self):
+        if self.max_bytes <= 0:
+            self.stop()
+
+    def dataReceived(self, data):
+        if self.finished.called:
+            return
+
+        self.chunks.append(data)
+        self.size += len(data)
+
+        if self.size >= self.max_bytes or \
+                (self.until is not None and self.until(data)):
+            self.stop()
+
+    def stop(self):
+        '''
+        Fire with what has arrived so far and drop the rest.
+        '''
+        body = ''.join(self.chunks)[:self.max_bytes]
+        self.finished.callback((body, True))
+        self.transport.stopProducing()
+
+class HTTPResponse(object):
+    '''
+    Response to a Deferred request, with the parts of the
+    requests.Response interface the plugins use.
+    '''
+    def __init__(self, url, code, headers, content='', truncated=False):
+        self.url = url
+        self.status_code = code
+        self.content = content
+        self.truncated = truncated
+
+        # Header names are lower cased, last value wins
+        self.headers = {k.lower(): v[-1] \
+                        for k, v in headers.getAllRawHeaders()}
+
+    @property
+    def encoding(self):
+        _, params = cgi.parse_header(self.headers.get('content-type', ''))
+        return params.get('charset')
+
+    def json(self):
+        return json.loads(self.text)
+
+    @property
+    def text(self):
+        if self.encoding:
+            try:
+                return self.content.decode(self.encoding, 'replace')
+            except LookupError:
+                pass
+
+        return decode(self.content)
+
+@implementer(IPolicyForHTTPS)
+class InsecurePolicy(object):
+    '''
+    TLS policy which still sends SNI, but accepts
+    any certificate.
+    '''
+    def creatorForNetloc(self, hostname, port):
+        return _InsecureCreator(hostname)
+
+@implementer(IOpenSSLClientConnectionCreator)
+class _InsecureCreator(object):
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.ctx = ssl.CertificateOptions(verify=False).getContext()
+
+    def clientConnectionForTLS(self, tlsProtocol):
+        connection = SSL.Connection(self.ctx, None)
+        connection.set_app_data(tlsProtocol)
+        connection.set_tlsext_host_name(self.hostname)
+        return connection
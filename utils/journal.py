@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+'''
+Write-behind persistence for a dict.
+
+Changes are remembered in memory and flushed in batches to
+an append-only journal, once flush_threshold keys have
+changed or whenever flush() is called, e.g., by
+utils.store's writer.  When the journal grows past
+compact_bytes the whole dict is written to a snapshot and
+the journal is emptied.
+
+Loading reads the snapshot and replays the journal on top
+of it.  A batch only partly written when the bot died is
+detected by its checksum and dropped.
+'''
+
+from collections import OrderedDict
+import cPickle as pickle
+import os
+import struct
+import time
+import zlib
+
+from twisted.python import log
+
+import utils.snapshot as usnapshot
+
+# Length and CRC32 of each batch in the journal
+HEADER = struct.Struct('>Ii')
+
+# Stands in for the value of a deleted key
+DELETED = '__deleted__'
+
+class Journal(object):
+    '''
+    A dict, data, whose changes are made through set and
+    delete so they can be saved to path.
+    '''
+    def __init__(self, path, data=None, flush_threshold=1000,
+                 compact_bytes=2 ** 22):
+        '''
+        Parameters
+        ----------
+            path: string
+                The journal's path; the snapshot is saved next
+                to it with a .snapshot extension
+
+            data: dict-like
+                Where the data is kept; defaults to a dict.  Its
+                items are saved, and loaded, in iteration order
+
+            flush_threshold: int
+                Changed keys which trigger a flush
+
+            compact_bytes: int
+                Journal size which triggers a snapshot
+        '''
+        self.path = path
+        self.snapshot_path = '{}.snapshot'.format(path)
+        self.data = {} if data is None else data
+
+        self.flush_threshold = flush_threshold
+        self.compact_bytes = compact_bytes
+
+        # Keys changed since the last flush -> new value, in
+        # the order they changed, so replaying keeps data's order
+        self.dirty = OrderedDict()
+        self.size = 0
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def changed(self, key, value):
+        '''
+        Remember key's new value until the next flush.
+        '''
+        self.dirty.pop(key, None)
+        self.dirty[key] = value
+        if len(self.dirty) >= self.flush_threshold:
+            self.flush()
+
+    def compact(self):
+        '''
+        Write all the data to a new snapshot and empty the
+        journal.  The snapshot replaces the old one atomically,
+        and replaying the journal over it changes nothing, so
+        dying part way through loses nothing.
+        '''
+        self.flush(compact=False)
+
+        started = time.time()
+        size = usnapshot.write(self.snapshot_path,
+                               usnapshot.dumps(list(self.data.iteritems())))
+        usnapshot.record(self.snapshot_path, time.time() - started, size)
+
+        open(self.path, 'wb').close()
+        self.size = 0
+
+    def delete(self, key):
+        '''
+        Delete key, if present.
+        '''
+        if key in self.data:
+            del self.data[key]
+            self.changed(key, DELETED)
+
+    def flush(self, compact=True):
+        '''
+        Append the changes made since the last flush to the
+        journal, compacting it if it's grown too big.
+        '''
+        if self.dirty:
+            batch = pickle.dumps(self.dirty.items(), -1)
+            self.dirty = OrderedDict()
+
+            with open(self.path, 'ab') as jf:
+                jf.write(HEADER.pack(len(batch), zlib.crc32(batch)))
+                jf.write(batch)
+            self.size += HEADER.size + len(batch)
+
+        if compact and self.size >= self.compact_bytes:
+            self.compact()
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def load(self):
+        '''
+        Load the snapshot and replay the journal over it,
+        cutting off any batch which wasn't fully written.
+        '''
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'rb') as sf:
+                    for key, value in pickle.loads(zlib.decompress(sf.read())):
+                        self.data[key] = value
+            except:
+                log.err('[Error]: Cannot load snapshot {}'.format(
+                            self.snapshot_path))
+
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'rb') as jf:
+            journal = jf.read()
+
+        pos = 0
+        while pos + HEADER.size <= len(journal):
+            length, crc = HEADER.unpack_from(journal, pos)
+            batch = journal[pos + HEADER.size:pos + HEADER.size + length]
+            if len(batch) < length or zlib.crc32(batch) != crc:
+                break
+
+            for key, value in pickle.loads(batch):
+                if value == DELETED:
+                    self.data.pop(key, None)
+                else:
+                    self.data[key] = value
+
+            pos += HEADER.size + length
+
+        if pos < len(journal):
+            log.msg('Dropping {} bytes of torn journal {}'.format(
+                        len(journal) - pos, self.path))
+            with open(self.path, 'r+b') as jf:
+                jf.truncate(pos)
+
+        self.size = pos
+
+    def set(self, key, value):
+        self.data[key] = value
+        self.changed(key, value)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+'''
+Packing of replies into as few IRC lines as they fit in.
+
+IRC limits a line to 512 bytes, including the prefix the
+server adds when relaying it, so lines are measured in
+encoded bytes.  The logical parts of a reply, e.g., one per
+currency pair, are joined by a separator and packed into
+each line until it's full, and only split where that's safe:
+never inside a multibyte character or an mIRC formatting
+code, preferring the separator between parts, then
+whitespace.
+'''
+
+from itertools import groupby
+import re
+
+from twisted.words.protocols import irc
+
+# Whitespace a line may break at
+WHITESPACE = '\t\n\x0b\x0c\r '
+
+# mIRC colour codes, which take arguments, unlike the other
+# formatting codes, \x02, \x0f, \x16, \x1d, and \x1f
+FORMAT_RE = re.compile(r'\x03(?:\d{1,2}(?:,\d{1,2})?)?'
+                       r'|\x04(?:[0-9a-fA-F]{6}(?:,[0-9a-fA-F]{6})?)?')
+MAX_FORMAT = 14
+
+# Guesses at the parts of the bot's hostmask until the
+# server reveals them, as long as servers allow
+USER_LEN = 10
+HOST_LEN = 63
+
+def budget(target, nick, userhost=None):
+    '''
+    Return the most bytes of text in a PRIVMSG to target which
+    fit in a line once the server has prefixed it with the
+    sender's hostmask.
+
+    Parameters
+    ----------
+        target: str
+            Nick or channel the message is sent to
+
+        nick: str
+            Nick of the sender
+
+        userhost: str
+            user@host of the sender, or None to assume the
+            longest
+    '''
+    if userhost is None:
+        userhost = '{}@{}'.format('u' * USER_LEN, 'h' * HOST_LEN)
+
+    return irc.MAX_COMMAND_LENGTH - \
+           len(':{}!{} PRIVMSG {} :\r\n'.format(nick, userhost, target))
+
+def cut(data, pos, width, separator=None):
+    '''
+    Return (end, start), where data[pos:end] is the longest
+    line starting at pos of at most width bytes which ends at
+    a safe boundary, and start is where the next line starts.
+
+    Lines end between parts, if the part after the separator
+    fits in a line of its own, else at whitespace, else
+    wherever's safe.
+
+    Parameters
+    ----------
+        data: str
+            UTF-8 encoded text
+
+        pos: int
+            Where the line starts
+
+        width: int
+            Most bytes in the line
+
+        separator: str
+            Put between parts, or None if there's only one
+    '''
+    end = pos + width
+    if end >= len(data):
+        return len(data), len(data)
+
+    # The separator after the part may be all that doesn't fit
+    if separator:
+        for i in xrange(end, max(pos, end - len(separator) + 1) - 1, -1):
+            if data.startswith(separator, i):
+                return i, i + len(separator)
+
+    # Back out of the middle of a character, whose later
+    # bytes are all 10xxxxxx...
+    while end > pos and 0x80 <= ord(data[end]) < 0xc0:
+        end -= 1
+
+    # ...and of a colour code
+    for m in FORMAT_RE.finditer(data, max(pos, end - MAX_FORMAT),
+                                end + MAX_FORMAT):
+        if m.start() < end < m.end():
+            end = m.start()
+
+    # Whatever's left must still make progress
+    if end == pos:
+        end = min(pos + width, len(data))
+
+    line = data[pos:end]
+    if separator:
+        i = line.rfind(separator)
+        if i > 0:
+            start = pos + i + len(separator)
+            after = data.find(separator, start, start + width + len(separator))
+            if after != -1 or len(data) - start <= width:
+                return pos + i, start
+
+    # The whitespace may also be just past the line
+    i = max(data.rfind(c, pos + 1, end + 1) for c in WHITESPACE)
+    if i != -1:
+        return i, i + 1
+
+    return end, end
+
+def split(data, width, separator=None):
+    '''
+    Return a list of the lines of at most width bytes which
+    data, a UTF-8 encoded str, is split into, see cut().
+    '''
+    lines = []
+    pos = 0
+    while pos < len(data):
+        end, start = cut(data, pos, width, separator)
+        lines.append(data[pos:end])
+        pos = start
+
+    return lines
+
+def pack(parts, width, separator=None):
+    '''
+    Return a list of the lines of at most width bytes which
+    parts, a list of UTF-8 encoded strs, are packed into,
+    joined by separator.  Empty parts are dropped, and CTCP
+    messages, e.g., actions, are sent whole by themselves.
+
+    If separator is None, each part is split into lines of
+    its own.
+    '''
+    lines = []
+    parts = (p for p in parts if p)
+    for ctcp, group in groupby(parts, lambda p: p.startswith('\x01')):
+        if ctcp:
+            lines.extend(group)
+        elif separator is None:
+            for part in group:
+                lines.extend(split(part, width))
+        else:
+            lines.extend(split(separator.join(group), width, separator))
+
+    return lines
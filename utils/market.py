@@ -0,0 +1,509 @@
+# -*- coding: utf-8 -*-
+
+'''
+Market data of crypto coins, polled from several sources.
+
+Each source is polled on a schedule of its own, and the
+ticks it returns are normalized to a coin, currency, price,
+and volume, and appended to a ring buffer for each (coin,
+currency, feed), where a feed is a source or one of the
+exchanges it reports on.  Buffers are kept as NumPy arrays,
+so the VWAP, low, high, and change over a window of ticks
+are computed with vectorized ops.  Ticks older than
+STALE_POLLS of their source's intervals are stale, so the
+latest prices aren't answered with once a source fails.
+
+Commands read the latest ticks, or windows of them, so
+never wait on the network once what they ask for is being
+polled.  The market is shared by the whole bot, see
+market(), so its history outlives plugin reloads.
+'''
+
+import re
+import time
+
+import numpy as np
+from twisted.internet import defer, task
+from twisted.python import log
+
+import utils.bitcoin as btc
+import utils.httpclient as uhttp
+
+# Ticks kept for each feed, e.g., two days of ticks polled a
+# minute apart
+TICKS = 2880
+
+# Windows of time, e.g., 90s, 15m, 1h, 7d, or 2w
+WINDOW_RE = re.compile(r'^(\d+(?:\.\d+)?)([smhdw]?)$', re.I)
+UNITS = { '': 1
+        , 's': 1
+        , 'm': 60
+        , 'h': 3600
+        , 'd': 86400
+        , 'w': 604800
+        }
+
+# Ticks older than this many polls of their source are
+# stale, and not answered with
+STALE_POLLS = 2
+
+# Levels of a chart, lowest first
+SPARKS = u'▁▂▃▄▅▆▇█'
+
+def parse_window(window):
+    '''
+    Return the seconds in a window of time such as 15m or
+    1h, or None if it isn't one.
+    '''
+    m = WINDOW_RE.match(window)
+    if m is None:
+        return None
+
+    return float(m.group(1)) * UNITS[m.group(2).lower()]
+
+def parted(ts, price, volume, since, seconds, n):
+    '''
+    Return an array of the VWAP of the ticks in each of n
+    equal parts of the seconds after since, oldest first,
+    with NaN for parts with no ticks.
+    '''
+    b = np.clip(((ts - since) * n / seconds).astype(int), 0, n - 1)
+    pv = np.bincount(b, weights=price * volume, minlength=n)
+    v = np.bincount(b, weights=volume, minlength=n)
+    p = np.bincount(b, weights=price, minlength=n)
+    count = np.bincount(b, minlength=n)
+
+    # Parts whose ticks have no volume take the plain mean
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(v > 0, pv / v,
+                        np.where(count > 0, p / count, np.nan))
+
+def spark(prices):
+    '''
+    Return a unicode chart of an array of prices, with NaN
+    where there are none, which are charted as spaces.
+    '''
+    known = prices[~np.isnan(prices)]
+    if not len(known):
+        return u''
+
+    low, high = known.min(), known.max()
+    if high > low:
+        levels = (prices - low) / (high - low) * (len(SPARKS) - 1)
+    else:
+        levels = np.full(len(prices), len(SPARKS) // 2, dtype=np.float64)
+
+    return u''.join(u' ' if np.isnan(l) else SPARKS[int(round(l))]
+                    for l in levels)
+
+# The market, see market()
+_market = None
+
+def market():
+    '''
+    Return the Market shared by the whole bot, making it the
+    first time it's asked for.
+    '''
+    global _market
+    if _market is None:
+        _market = Market()
+
+    return _market
+
+class TickBuffer(object):
+    '''
+    The last capacity ticks of a feed, oldest overwritten
+    first, and the fields of the latest as its source gave
+    them.
+    '''
+    def __init__(self, capacity=TICKS):
+        self.ts = np.zeros(capacity)
+        self.price = np.zeros(capacity)
+        self.volume = np.zeros(capacity)
+
+        # Ticks ever appended, and the fields of the latest
+        self.appended = 0
+        self.fields = {}
+
+    def __len__(self):
+        return min(self.appended, len(self.ts))
+
+    def append(self, ts, price, volume, fields):
+        i = self.appended % len(self.ts)
+        self.ts[i] = ts
+        self.price[i] = price
+        self.volume[i] = volume
+        self.appended += 1
+        self.fields = fields
+
+    def last(self):
+        '''
+        Return (ts, price, volume) of the latest tick, or None
+        if there are none.
+        '''
+        if not self.appended:
+            return None
+
+        i = (self.appended - 1) % len(self.ts)
+        return self.ts[i], self.price[i], self.volume[i]
+
+    def window(self, since):
+        '''
+        Return arrays of the ts, price, and volume of the ticks
+        at or after since, oldest first.
+        '''
+        order = np.arange(self.appended - len(self), self.appended) % len(self.ts)
+        order = order[np.searchsorted(self.ts[order], since):]
+        return self.ts[order], self.price[order], self.volume[order]
+
+class Market(object):
+    def __init__(self):
+        # (coin, currency, feed) -> TickBuffer
+        self.buffers = {}
+
+        # Source name -> (source, LoopingCall polling it)
+        self.sources = {}
+
+    def add(self, source, interval):
+        '''
+        Poll source every interval seconds, replacing any
+        source of the same name, e.g., when a plugin reloads.
+        '''
+        if source.name in self.sources:
+            poller = self.sources[source.name][1]
+            if poller.running:
+                poller.stop()
+
+        poller = task.LoopingCall(self.poll, source)
+        self.sources[source.name] = (source, poller)
+        poller.start(interval)
+
+    def buckets(self, coin, currency, seconds, n, feeds=None):
+        '''
+        Return an array of the VWAP of the ticks in each of n
+        equal parts of the last seconds, oldest first, with NaN
+        for parts with no ticks.
+        '''
+        since = time.time() - seconds
+        ts, price, volume = self.series(coin, currency, since, feeds)
+        return parted(ts, price, volume, since, seconds, n)
+
+    def feeds(self, source):
+        '''
+        Return a set of the (coin, currency) with recent ticks
+        from source or its exchanges.
+        '''
+        return set((coin, currency)
+                   for (coin, currency, feed), buf in self.buffers.iteritems()
+                   if (feed == source or feed.startswith(source + ':')) and \
+                      self.fresh(feed, buf))
+
+    def fresh(self, feed, buf):
+        '''
+        Return whether the latest tick of a feed is at most
+        STALE_POLLS of its source's intervals old.
+        '''
+        last = buf.last()
+        if last is None:
+            return False
+
+        source = self.sources.get(feed.split(u':', 1)[0])
+        if source is None:
+            return True
+
+        return time.time() - last[0] <= STALE_POLLS * source[1].interval
+
+    def latest(self, coin, currency, feed):
+        '''
+        Return the fields of the latest tick of a feed, or
+        None if there are none, or it's stale.
+        '''
+        buf = self.buffers.get((coin.upper(), currency.upper(), feed))
+        if buf is None or not self.fresh(feed, buf):
+            return None
+
+        return buf.fields
+
+    def poll(self, source):
+        '''
+        Return a Deferred firing once source has been polled,
+        and its ticks recorded.
+        '''
+        d = source.fetch()
+        d.addCallback(self.record)
+        d.addErrback(log.err, '[Error]: Cannot poll {}'.format(source.name))
+        return d
+
+    def ready(self, name):
+        '''
+        Return a Deferred firing once the source called name
+        has ticks, at once if it already has, else once it's
+        been polled.
+        '''
+        if self.feeds(name):
+            return defer.succeed(None)
+
+        return self.poll(self.sources[name][0])
+
+    def record(self, ticks):
+        '''
+        Callback appending a list of (coin, currency, feed,
+        price, volume, fields) ticks to their buffers.
+        '''
+        now = time.time()
+        for coin, currency, feed, price, volume, fields in ticks:
+            key = (coin.upper(), currency.upper(), feed)
+            if key not in self.buffers:
+                self.buffers[key] = TickBuffer()
+            self.buffers[key].append(now, price, volume, fields)
+
+    def series(self, coin, currency, since, feeds=None):
+        '''
+        Return arrays of the ts, price, and volume of the
+        ticks of coin in currency at or after since, from the
+        given feeds or all of them, oldest first.
+        '''
+        coin, currency = coin.upper(), currency.upper()
+        parts = [buf.window(since)
+                 for (c, cur, feed), buf in self.buffers.iteritems()
+                 if c == coin and cur == currency and \
+                    (feeds is None or feed in feeds)]
+        if not parts:
+            return np.zeros(0), np.zeros(0), np.zeros(0)
+
+        ts, price, volume = (np.concatenate(a) for a in zip(*parts))
+        order = np.argsort(ts, kind='mergesort')
+        return ts[order], price[order], volume[order]
+
+    def stats(self, coin, currency, seconds, n=12, feeds=None):
+        '''
+        Return a dict of the open, close, low, high, VWAP, and
+        change, as a fraction, of coin in currency over the
+        last seconds, or None if there are no ticks.  The open
+        and close are the VWAPs of the first and last of n
+        parts of the window with ticks.
+        '''
+        since = time.time() - seconds
+        ts, price, volume = self.series(coin, currency, since, feeds)
+        if not len(ts):
+            return None
+
+        # From the same ticks, so some part has them
+        parts = parted(ts, price, volume, since, seconds, n)
+        parts = parts[~np.isnan(parts)]
+        total = volume.sum()
+
+        return { 'open': parts[0]
+               , 'close': parts[-1]
+               , 'low': price.min()
+               , 'high': price.max()
+               , 'vwap': np.dot(price, volume) / total if total \
+                         else price.mean()
+               , 'change': parts[-1] / parts[0] - 1 if parts[0] else 0.0
+               , 'ticks': len(ts)
+               }
+
+    def vwap(self, coin, currency, feeds):
+        '''
+        Return the average of the latest price of each feed,
+        weighted by the volume it reported, or None if none of
+        them have recent ticks.
+        '''
+        bufs = [(feed, self.buffers.get((coin.upper(), currency.upper(), feed)))
+                for feed in feeds]
+        last = [buf.last() for feed, buf in bufs
+                if buf is not None and self.fresh(feed, buf)]
+        if not last:
+            return None
+
+        _, price, volume = np.array(last).T
+        total = volume.sum()
+        return np.dot(price, volume) / total if total else price.mean()
+
+#-------------------------------------
+#
+#    Sources
+#
+#-------------------------------------
+class Source(object):
+    '''
+    Base of the sources polled by a Market, whose fetch()
+    returns a Deferred firing with a list of (coin, currency,
+    feed, price, volume, fields) ticks.
+    '''
+    name = None
+
+    def fetchJSON(self, url, data=None):
+        '''
+        Return a Deferred firing with the JSON at url, POSTing
+        data if given.
+        '''
+        d = uhttp.request('POST' if data is not None else 'GET', url, data)
+
+        def parse(r):
+            if r.status_code != 200:
+                raise IOError('Status code {} for {}'.format(r.status_code,
+                                                             url))
+            return r.json()
+
+        return d.addCallback(parse)
+
+class BitcoinAverage(Source):
+    '''
+    Global averages of BTC in every currency.
+    '''
+    name = 'bitcoinaverage'
+
+    def fetch(self):
+        def parse(data):
+            return [(u'BTC', currency, self.name, float(t['last']),
+                     float(t.get('volume_btc') or 0), t)
+                    for currency, t in data.iteritems()
+                    if isinstance(t, dict) and t.get('last') is not None]
+
+        return self.fetchJSON(btc.BitcoinAverageAPI.ALL).addCallback(parse)
+
+class BTCE(Source):
+    '''
+    Tickers of every pair traded on BTC-E.
+    '''
+    name = 'btce'
+
+    def __init__(self, info_api, ticker_api):
+        self.info_api = info_api
+        self.ticker_api = ticker_api
+
+        # Pairs traded, e.g., btc_usd, and the currencies in them
+        self.pairs = []
+        self.currencies = set()
+
+    def fetch(self):
+        # Pairs are seldom listed, so are only fetched once
+        if self.pairs:
+            d = defer.succeed(None)
+        else:
+            d = self.fetchJSON(self.info_api)
+        d.addCallback(self.listed)
+        return d
+
+    def listed(self, info):
+        '''
+        Callback remembering the pairs traded, if listed, then
+        fetching their tickers.
+        '''
+        if info is not None:
+            self.pairs = sorted(info['pairs'])
+            self.currencies = set(c for pair in self.pairs
+                                  for c in pair.split(u'_'))
+
+        def parse(data):
+            ticks = []
+            for pair, t in data.iteritems():
+                coin, currency = pair.split(u'_')
+                ticks.append((coin, currency, self.name, float(t['last']),
+                              float(t.get('vol_cur') or 0), t))
+            return ticks
+
+        d = self.fetchJSON(self.ticker_api.format(u'-'.join(self.pairs)))
+        return d.addCallback(parse)
+
+class CryptoCoinCharts(Source):
+    '''
+    Prices of the pairs asked for most recently, as there
+    are too many to poll them all.
+    '''
+    name = 'cryptocoincharts'
+
+    def __init__(self, api_pairs, max_pairs=50):
+        self.api_pairs = api_pairs
+        self.max_pairs = max_pairs
+
+        # Pairs polled, e.g., (ltc, btc), least recently asked
+        # for first, and those with no price
+        self.pairs = []
+        self.missing = set()
+
+    def fetch(self):
+        if not self.pairs:
+            return defer.succeed([])
+
+        pairs = list(self.pairs)
+
+        def parse(data):
+            ticks = []
+            for (coin, currency), t in zip(pairs, data):
+                if t.get('id') is None:
+                    self.missing.add((coin, currency))
+                    continue
+
+                self.missing.discard((coin, currency))
+                ticks.append((coin, currency, self.name, float(t['price']),
+                              float(t.get('volume_first') or 0), t))
+            return ticks
+
+        payload = ','.join('{}_{}'.format(*pair) for pair in pairs)
+        return self.fetchJSON(self.api_pairs, payload).addCallback(parse)
+
+    def watch(self, pairs):
+        '''
+        Poll a list of (coin, currency) from now on, dropping
+        the pairs least recently asked for if there are too
+        many.  Returns whether any are new.
+        '''
+        new = False
+        for pair in pairs:
+            if pair in self.pairs:
+                self.pairs.remove(pair)
+            else:
+                new = True
+            self.pairs.append(pair)
+
+        del self.pairs[:-self.max_pairs]
+        return new
+
+class Preev(Source):
+    '''
+    Last prices and volumes of coins on the exchanges
+    preev.com follows, and of metals in USD.
+    '''
+    name = 'preev'
+    URL = u'http://preev.com/pulse/units:{}+{}/sources:{}'
+
+    def __init__(self, units, exchanges):
+        '''
+        Parameters
+        ----------
+            units: list
+                (coin, currency) to poll, e.g., (btc, usd), or
+                (btc, xau) for a metal
+
+            exchanges: list
+                Exchanges to poll them on
+        '''
+        self.units = units
+        self.exchanges = exchanges
+
+    def fetch(self):
+        d = defer.gatherResults([self.fetchJSON(self.URL.format(
+                                     coin, currency, u'+'.join(self.exchanges)))
+                                 for coin, currency in self.units],
+                                consumeErrors=True)
+        d.addCallback(lambda pulses: [t for p in pulses for t in self.parse(p)])
+        return d
+
+    def parse(self, pulse):
+        '''
+        Return a list of the ticks in a pulse.
+        '''
+        ticks = []
+        for coin, currencies in pulse.iteritems():
+            for currency, exchanges in currencies.iteritems():
+                for exchange, t in exchanges.iteritems():
+                    if t.get('last') is None:
+                        continue
+                    ticks.append((coin, currency,
+                                  u'{}:{}'.format(self.name, exchange),
+                                  float(t['last']),
+                                  float(t.get('volume') or 0), t))
+
+        return ticks
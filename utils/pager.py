@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+'''
+Lazily wrapped pages of long responses, for the more command.
+
+A response is only wrapped as its pages are asked for, so
+however long it is, only the pages read are paid for.  Pages
+are measured in UTF-8 bytes, as IRC's line limit is, and
+broken where utils.linepack says it's safe.
+'''
+
+import re
+import sys
+
+import utils.linepack as ulinepack
+
+# Whitespace is turned into spaces, as textwrap does
+_WHITESPACE_RE = re.compile('[{}]'.format(re.escape(ulinepack.WHITESPACE)))
+
+class Pages(object):
+    '''
+    The pages of a unicode response not yet sent, each a
+    str of at most width UTF-8 bytes, and at most max_pages
+    of them.  Each line of the response is a part packed
+    into pages with separator, or if it's None, run into the
+    next like any other whitespace.
+    '''
+    def __init__(self, text, width, max_pages=None, separator=None):
+        # Pages take at most width characters, besides the
+        # whitespace between them, so the rest is never sent
+        if max_pages is not None:
+            text = text[:2 * width * max_pages]
+
+        if separator is not None:
+            text = separator.join(line.strip() for line in text.split(u'\n')
+                                  if line.strip())
+
+        self.text = text.encode('utf-8')
+        self.width = width
+        self.max_pages = max_pages
+        self.separator = separator and separator.encode('utf-8')
+
+        # Where the next page starts, and pages wrapped ahead
+        # to count them but not yet sent
+        self.pos = 0
+        self.ahead = []
+        self.wrapped = 0
+
+    def __sizeof__(self):
+        '''
+        Rough bytes of the response left to send.
+        '''
+        return sys.getsizeof(self.text) * (len(self.text) - self.pos) // \
+               max(len(self.text), 1) + \
+               sum(sys.getsizeof(p) for p in self.ahead)
+
+    def count(self, most):
+        '''
+        Return (n, exact), where n is the number of pages left,
+        or most if there are at least that many, in which case
+        exact is False.
+        '''
+        while len(self.ahead) < most:
+            page = self.wrap()
+            if page is None:
+                return len(self.ahead), True
+            self.ahead.append(page)
+
+        return most, self.wrap(peek=True) is None
+
+    def next(self):
+        '''
+        Return the next page, or None if none are left.
+        '''
+        if self.ahead:
+            return self.ahead.pop(0)
+
+        return self.wrap()
+
+    def wrap(self, peek=False):
+        '''
+        Return the page starting at pos, moving pos past it
+        unless peek is True, or None if none are left.
+        '''
+        text, pos = self.text, self.pos
+
+        # Never start a page with whitespace
+        while pos < len(text) and text[pos] in ulinepack.WHITESPACE:
+            pos += 1
+
+        if pos == len(text) or self.wrapped == self.max_pages:
+            return None
+
+        end, start = ulinepack.cut(text, pos, self.width, self.separator)
+        if not peek:
+            self.pos = start
+            self.wrapped += 1
+
+        return _WHITESPACE_RE.sub(' ', text[pos:end].rstrip(ulinepack.WHITESPACE))
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+'''
+An asynchronous DNS resolver with a cache of answers.
+
+Queries are made on the reactor by twisted.names, so looking
+up a name costs one UDP round trip rather than forking dig,
+and the types of records asked for together are queried in
+parallel.  Answers are cached for as long as their TTL, and
+names or types with no records for as long as their zone's
+SOA says, so most lookups never leave the process.  Queries
+for a name and type already under way share its answer.
+'''
+
+from collections import OrderedDict
+import socket
+
+import ipaddress as ip
+from twisted.internet import defer, reactor
+from twisted.names import client, dns, error
+from twisted.python.failure import Failure
+
+# Types of records which can be looked up, by name
+TYPES = { 'A': dns.A
+        , 'AAAA': dns.AAAA
+        , 'MX': dns.MX
+        , 'NS': dns.NS
+        , 'PTR': dns.PTR
+        , 'TXT': dns.TXT
+        }
+
+# Seconds to wait for each try at a query
+TIMEOUT = (1, 3, 5)
+
+# Bounds on how long answers are cached, and how long missing
+# ones are if their zone doesn't say
+MIN_TTL = 5
+MAX_TTL = 86400
+NEGATIVE_TTL = 300
+
+# Most names and types cached
+MAX_ENTRIES = 1024
+
+# The resolver, see resolver()
+_resolver = None
+
+def format_record(record):
+    '''
+    Return the data of a resource record as a string.
+    '''
+    payload = record.payload
+    if record.type == dns.A:
+        return payload.dottedQuad()
+    elif record.type == dns.AAAA:
+        return socket.inet_ntop(socket.AF_INET6, payload.address)
+    elif record.type == dns.MX:
+        return '{} {}'.format(payload.preference, payload.name)
+    elif record.type == dns.TXT:
+        return ' '.join('"{}"'.format(s) for s in payload.data)
+
+    return str(payload.name)
+
+def resolver(**kwargs):
+    '''
+    Return the Resolver shared by the whole bot, creating it
+    the first time it's asked for.  Keyword arguments are
+    passed to Resolver.
+    '''
+    global _resolver
+    if _resolver is None:
+        _resolver = Resolver(**kwargs)
+
+    return _resolver
+
+def reverse_name(address):
+    '''
+    Return the name to query for the PTR record of an IP
+    address, or None if it's not one.
+    '''
+    try:
+        return ip.ip_address(unicode(address)).reverse_pointer
+    except ValueError:
+        return None
+
+class Resolver(object):
+    def __init__(self, servers=None, resolv='/etc/resolv.conf',
+                 timeout=TIMEOUT, max_entries=MAX_ENTRIES, clock=reactor):
+        '''
+        Parameters
+        ----------
+            servers: list
+                (host, port) of the name servers to ask; defaults
+                to those in resolv
+
+            resolv: string
+                Path of a resolv.conf, or None
+
+            timeout: tuple
+                Seconds to wait for each try at a query
+
+            max_entries: int
+                Most names and types cached
+
+            clock: IReactorTime
+                Provides the time, and runs the queries
+        '''
+        self.resolver = client.Resolver(resolv=resolv, servers=servers,
+                                        reactor=clock)
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.clock = clock
+
+        # (name, type) -> (expiry, list of record strings),
+        # least recently used first
+        self.cache = OrderedDict()
+
+        # (name, type) -> Deferreds waiting on the query under way
+        self.pending = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def answered(self, result, key):
+        '''
+        Callback caching the records answering a query, or
+        that there are none.
+        '''
+        answers, authority, _ = result
+        records = [format_record(r) for r in answers if r.type == key[1]]
+
+        # CNAMEs lead to the records, so expire with them
+        if records:
+            ttl = min(r.ttl for r in answers)
+        else:
+            ttl = self.negativeTTL(authority)
+
+        self.store(key, records, ttl)
+        return records
+
+    def failed(self, failure, key):
+        '''
+        Errback caching that a name doesn't exist.  Other
+        failures, e.g., timeouts, aren't cached.
+        '''
+        failure.trap(error.DomainError)
+        authority = getattr(failure.value.message, 'authority', [])
+        self.store(key, [], self.negativeTTL(authority))
+        return []
+
+    def finished(self, result, key):
+        for d in self.pending.pop(key):
+            if isinstance(result, Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+
+    def lookup(self, name, types):
+        '''
+        Return a Deferred firing with a list of (type name,
+        list of record strings), for each type of record of
+        name, all queried at once.
+
+        Parameters
+        ----------
+            name: string
+                Hostname, or an IP address for PTR records
+
+            types: list
+                Names of record types, see TYPES
+        '''
+        def paired(results):
+            return zip(types, results)
+
+        d = defer.gatherResults([self.query(name, t) for t in types],
+                                consumeErrors=True)
+        d.addErrback(lambda f: f.value.subFailure)
+        return d.addCallback(paired)
+
+    def negativeTTL(self, authority):
+        '''
+        Return how long to cache a missing answer: the minimum
+        TTL of the zone's SOA, if the server sent it.
+        '''
+        for record in authority:
+            if record.type == dns.SOA:
+                return min(record.ttl, record.payload.minimum)
+
+        return NEGATIVE_TTL
+
+    def query(self, name, type_name):
+        '''
+        Return a Deferred firing with a list of the strings of
+        name's records of a type, which is empty if it has
+        none.  A PTR query for an IP address is made for its
+        reverse name.
+        '''
+        type_ = TYPES[type_name.upper()]
+        if type_ == dns.PTR:
+            name = reverse_name(name) or name
+
+        # Names on the wire are ASCII
+        try:
+            name = name.encode('idna') if isinstance(name, unicode) else name
+        except UnicodeError:
+            return defer.succeed([])
+        key = (name.lower().rstrip('.'), type_)
+
+        now = self.clock.seconds()
+        if key in self.cache:
+            expiry, records = self.cache.pop(key)
+            if expiry > now:
+                self.cache[key] = (expiry, records)
+                self.hits += 1
+                return defer.succeed(records)
+
+        d = defer.Deferred()
+        if key in self.pending:
+            self.pending[key].append(d)
+            return d
+
+        self.misses += 1
+        self.pending[key] = [d]
+        q = self.resolver.query(dns.Query(key[0], type_, dns.IN),
+                                timeout=self.timeout)
+        q.addCallbacks(self.answered, self.failed,
+                       callbackArgs=(key,), errbackArgs=(key,))
+        q.addBoth(self.finished, key)
+        return d
+
+    def stats(self):
+        '''
+        Return a dict of counters describing the cache.
+        '''
+        return { 'entries': len(self.cache)
+               , 'hits': self.hits
+               , 'misses': self.misses
+               }
+
+    def store(self, key, records, ttl):
+        ttl = max(MIN_TTL, min(MAX_TTL, ttl))
+        self.cache.pop(key, None)
+        self.cache[key] = (self.clock.seconds() + ttl, records)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
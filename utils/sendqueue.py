@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+'''
+Flood-aware scheduling of the lines the bot sends.
+
+Lines wait in a queue until both a bucket of tokens shared by
+every target and one of the target's own have a token, so
+bursts are paced before the server's flood protection kicks
+in.  Replies to commands go before the chatter of line
+plugins, small lines queued for the same target are merged
+into one as long as it fits in a line, and lines which have
+waited too long are dropped.
+'''
+
+from collections import deque
+
+from twisted.internet import reactor
+
+# Priorities, most urgent first
+REPLY, CHATTER = range(2)
+PRIORITIES = { 'reply': REPLY
+             , 'chatter': CHATTER
+             }
+
+# Most idle buckets kept for targets
+MAX_BUCKETS = 256
+
+class TokenBucket(object):
+    '''
+    Holds up to burst tokens, refilled at rate per second.
+    '''
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def full(self, now):
+        self.refill(now)
+        return self.tokens >= self.burst
+
+    def refill(self, now):
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self):
+        self.tokens -= 1
+
+    def wait(self, now):
+        '''
+        Return the seconds until a token is available.
+        '''
+        self.refill(now)
+        return max(0, (1 - self.tokens) / float(self.rate))
+
+class SendQueue(object):
+    def __init__(self, send, rate=2, burst=5, target_rate=1, target_burst=3,
+                 max_ages=None, budget=None, separator=' | ',
+                 clock=reactor):
+        '''
+        Parameters
+        ----------
+            send: callable
+                Called with a target and str line to send it
+
+            rate, burst: float
+                Lines per second, and most lines at once, sent
+                to every target together
+
+            target_rate, target_burst: float
+                Lines per second, and most lines at once, sent
+                to any one target
+
+            max_ages: dict
+                Priority name -> most seconds a line may wait
+                before it's dropped; defaults to 60 for replies
+                and 10 for chatter
+
+            budget: callable
+                Called with a target to get the most bytes in a
+                line to it, for merging queued lines; if None,
+                lines aren't merged
+
+            separator: str
+                Put between merged lines, or None not to merge
+
+            clock: IReactorTime
+                Provides the time and delayed calls
+        '''
+        self.send = send
+        self.target_rate = target_rate
+        self.target_burst = target_burst
+        self.budget = budget
+        self.separator = separator
+        self.clock = clock
+
+        self.max_ages = [60, 10]
+        for name, age in (max_ages or {}).iteritems():
+            self.max_ages[PRIORITIES[name]] = age
+
+        self.bucket = TokenBucket(rate, burst, clock.seconds())
+        self.buckets = {}
+
+        # [target, line, time queued, mergeable] per priority,
+        # oldest first
+        self.queues = [deque() for _ in PRIORITIES]
+        self.call = None
+
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+
+    def put(self, target, line, priority=REPLY, merge=True):
+        '''
+        Queue a str line to be sent to target.  Lines put with
+        merge False, e.g., ones ending in how many more there
+        are, are never merged with others.
+        '''
+        # CTCP messages, e.g., actions, must stay whole
+        merge = merge and not line.startswith('\x01')
+
+        queue = self.queues[priority]
+        if self.budget is not None and self.separator is not None and \
+                merge and queue and queue[-1][0] == target and \
+                queue[-1][3] and \
+                len(queue[-1][1]) + len(self.separator) + len(line) \
+                    <= self.budget(target):
+            queue[-1][1] += self.separator + line
+            self.merged += 1
+        else:
+            queue.append([target, line, self.clock.seconds(), merge])
+
+        # Other targets' buckets may let it go at once
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.run()
+
+    def run(self):
+        '''
+        Send every line the buckets allow, then wait until
+        the next can be.
+        '''
+        self.call = None
+        now = self.clock.seconds()
+
+        # Drop lines which have waited too long
+        for priority, queue in enumerate(self.queues):
+            while queue and now - queue[0][2] > self.max_ages[priority]:
+                queue.popleft()
+                self.dropped += 1
+
+        wait = None
+        for queue in self.queues:
+            i = 0
+            while i < len(queue):
+                target, line, queued, _ = queue[i]
+                bucket = self.targetBucket(target, now)
+                ready = max(self.bucket.wait(now), bucket.wait(now))
+                if ready > 0:
+                    wait = ready if wait is None else min(wait, ready)
+                    i += 1
+                    continue
+
+                del queue[i]
+                self.bucket.take()
+                bucket.take()
+                self.send(target, line)
+
+                self.sent += 1
+                self.total_wait += now - queued
+                self.max_wait = max(self.max_wait, now - queued)
+
+        if len(self.buckets) > MAX_BUCKETS:
+            for target in [t for t, b in self.buckets.iteritems() if b.full(now)]:
+                del self.buckets[target]
+
+        if wait is not None:
+            self.call = self.clock.callLater(wait, self.run)
+
+    def stats(self):
+        '''
+        Return a dict of counters describing the queue.
+        '''
+        return { 'replies': len(self.queues[REPLY])
+               , 'chatter': len(self.queues[CHATTER])
+               , 'sent': self.sent
+               , 'merged': self.merged
+               , 'dropped': self.dropped
+               , 'avg_wait': self.total_wait / self.sent if self.sent else 0.0
+               , 'max_wait': self.max_wait
+               }
+
+    def stop(self):
+        '''
+        Stop sending, dropping every queued line.
+        '''
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+
+        for queue in self.queues:
+            self.dropped += len(queue)
+            queue.clear()
+
+    def targetBucket(self, target, now):
+        if target not in self.buckets:
+            self.buckets[target] = TokenBucket(self.target_rate,
+                                               self.target_burst, now)
+
+        return self.buckets[target]
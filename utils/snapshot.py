@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+'''
+Snapshots of state saved without blocking the reactor.
+
+The state is frozen on the reactor with a cheap copy, e.g.,
+a shallow copy of a dict, then pickled, compressed, and
+written on a thread of the snapshotter's own.  Each snapshot
+is written to a temporary file, synced, and renamed over the
+old one, so dying part way through never loses the last good
+snapshot.
+
+How long each snapshot took and how big it was are recorded
+by path, see stats().
+'''
+
+import cPickle as pickle
+import os
+import time
+import zlib
+
+from twisted.internet import defer, reactor, threads
+from twisted.python import log
+from twisted.python.threadpool import ThreadPool
+
+# Path -> dict of counters, see record()
+_stats = {}
+
+def dumps(state):
+    '''
+    Default serializer, pickling and compressing state.
+    '''
+    return zlib.compress(pickle.dumps(state, -1))
+
+def record(path, seconds, size=None, failed=False):
+    '''
+    Record a snapshot of path which took seconds to write
+    and, unless it failed, is size bytes.
+    '''
+    stats = _stats.setdefault(path, { 'snapshots': 0
+                                    , 'failures': 0
+                                    , 'seconds': 0.0
+                                    , 'bytes': 0
+                                    , 'last': None
+                                    })
+    if failed:
+        stats['failures'] += 1
+        return
+
+    stats['snapshots'] += 1
+    stats['seconds'] = seconds
+    stats['bytes'] = size
+    stats['last'] = time.time()
+
+def stats():
+    '''
+    Return a dict of path -> dict of the snapshots taken of
+    it and failures, and the seconds, bytes, and time in epoch
+    seconds of the last.
+    '''
+    return dict((path, dict(s)) for path, s in _stats.iteritems())
+
+def write(path, data):
+    '''
+    Atomically replace the file at path with a str of data.
+    Returns the bytes written.
+    '''
+    tmp = '{}.tmp'.format(path)
+    with open(tmp, 'wb') as sf:
+        sf.write(data)
+        sf.flush()
+        os.fsync(sf.fileno())
+    os.rename(tmp, path)
+
+    return len(data)
+
+# The snapshotter, see snapshotter()
+_snapshotter = None
+
+def snapshotter():
+    '''
+    Return the Snapshotter shared by the whole bot, starting
+    it the first time it's asked for.
+    '''
+    global _snapshotter
+    if _snapshotter is None:
+        _snapshotter = Snapshotter()
+
+    return _snapshotter
+
+class Snapshotter(object):
+    '''
+    Saves frozen state on a thread, one snapshot at a time.
+    '''
+    def __init__(self):
+        # Paths being saved to, and path -> (state, dump,
+        # Deferred) of the newest snapshot waiting for them
+        self.saving = set()
+        self.waiting = {}
+
+        self.pool = ThreadPool(1, 1, 'snapshots')
+        self.pool.start()
+        reactor.addSystemEventTrigger('during', 'shutdown', self.pool.stop)
+
+    def save(self, path, state, dump=dumps):
+        '''
+        Return a Deferred firing with the bytes saved once
+        dump(state) has been saved to path.  state mustn't be
+        changed until then, so should be a copy.
+
+        While a snapshot of path is being saved, state waits
+        for it to finish, replacing any older state waiting,
+        whose Deferred then fires once state is saved.
+        '''
+        if path in self.saving:
+            if path in self.waiting:
+                d = self.waiting[path][-1]
+            else:
+                d = defer.Deferred()
+            self.waiting[path] = (state, dump, d)
+            return d
+
+        self.saving.add(path)
+        d = threads.deferToThreadPool(reactor, self.pool,
+                                      self._save, path, state, dump)
+        d.addErrback(log.err, '[Error]: Cannot save snapshot {}'.format(path))
+        d.addBoth(self.saved, path)
+        return d
+
+    def saved(self, result, path):
+        '''
+        Callback starting the snapshot waiting for path, if any.
+        '''
+        self.saving.discard(path)
+        if path in self.waiting:
+            state, dump, d = self.waiting.pop(path)
+            self.save(path, state, dump).chainDeferred(d)
+
+        return result
+
+    def _save(self, path, state, dump):
+        started = time.time()
+        try:
+            size = write(path, dump(state))
+        except:
+            record(path, time.time() - started, failed=True)
+            raise
+
+        record(path, time.time() - started, size)
+        return size
+
+def freeze(data):
+    '''
+    Return a copy of a dict-like which is cheap to make: its
+    own copy() if it has one, else a shallow dict copy.
+    '''
+    if hasattr(data, 'copy'):
+        return data.copy()
+
+    return dict(data)
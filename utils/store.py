@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+
+'''
+Persistent key-value tables for plugins.
+
+A Store holds any number of tables, each named by a
+namespace and kept in memory as a dict.  Changes are
+written behind: remembered, then written in batches every
+flush_interval seconds or once flush_threshold keys have
+changed, with the changes to every table committed
+together.  Writing happens on a thread of the store's own,
+so the reactor never waits on the disk.
+
+Stores have one of two backends:
+
+    sqlite
+        A table of (namespace, key, value) rows, each batch
+        written in one transaction, and copied to a snapshot
+        with VACUUM INTO, which needs SQLite 3.27 or later,
+        once compact_bytes of changes have been written
+
+    journal
+        The append-only journal of utils.journal, rewritten
+        as a snapshot once it grows past compact_bytes
+
+Keys must be built of strings, numbers, and tuples.  Values
+are pickled, so must be picklable, and mustn't be changed in
+place once set.
+'''
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import cPickle as pickle
+import marshal
+import os
+import sqlite3
+import time
+
+from twisted.internet import reactor, task, threads
+from twisted.python import log
+from twisted.python.threadpool import ThreadPool
+
+import utils.journal as ujournal
+import utils.snapshot as usnapshot
+
+# Stores by name, see named()
+_stores = {}
+
+def named(name, path=None, **kwargs):
+    '''
+    Return the Store with the given name, opening it at path
+    the first time it's asked for, so it outlives plugin
+    reloads.  Keyword arguments are passed to Store.  Raises
+    KeyError if it isn't open and no path is given.
+    '''
+    if name not in _stores:
+        if path is None:
+            raise KeyError('Store {} has not been opened'.format(name))
+        _stores[name] = Store(path, **kwargs)
+
+    return _stores[name]
+
+class Store(object):
+    def __init__(self, path, backend='sqlite', flush_interval=5,
+                 flush_threshold=500, compact_bytes=2 ** 22):
+        '''
+        Parameters
+        ----------
+            path: string
+                Path of the SQLite database or journal
+
+            backend: string
+                Either sqlite or journal
+
+            flush_interval: float
+                Most seconds a change waits to be written
+
+            flush_threshold: int
+                Changed keys which trigger a write
+
+            compact_bytes: int
+                Bytes written which trigger a snapshot
+        '''
+        self.path = path
+        self.backend = BACKENDS[backend](path)
+        self.flush_threshold = flush_threshold
+        self.compact_bytes = compact_bytes
+
+        # Namespace -> Table
+        self.tables = {}
+
+        # (namespace, key) -> new value, in the order they changed
+        self.dirty = OrderedDict()
+
+        # Depth of batch() blocks being run
+        self.batching = 0
+
+        # Everything written is written by a single thread,
+        # so batches are committed in order
+        self.pool = ThreadPool(1, 1, 'store')
+        self.pool.start()
+        reactor.addSystemEventTrigger('before', 'shutdown', self.flush)
+        reactor.addSystemEventTrigger('during', 'shutdown', self.pool.stop)
+
+        self.flusher = task.LoopingCall(self.flush)
+        self.flusher.start(flush_interval, now=False)
+
+    @contextmanager
+    def batch(self):
+        '''
+        Context manager for making several changes which are
+        committed together.
+        '''
+        self.batching += 1
+        try:
+            yield
+        finally:
+            self.batching -= 1
+            if not self.batching and len(self.dirty) >= self.flush_threshold:
+                self.flush()
+
+    def changed(self, namespace, key, value):
+        '''
+        Remember a key's new value until the next flush.
+        '''
+        self.dirty.pop((namespace, key), None)
+        self.dirty[(namespace, key)] = value
+        if not self.batching and len(self.dirty) >= self.flush_threshold:
+            self.flush()
+
+    def compacted(self, size):
+        '''
+        Callback snapshotting the tables once size bytes, which
+        is None if the backend can't snapshot, have been
+        written since the last snapshot.
+        '''
+        if size is not None and size >= self.compact_bytes:
+            return self.snapshot()
+
+    def flush(self):
+        '''
+        Return a Deferred firing once the changes made so far
+        have been committed.
+        '''
+        if not self.dirty:
+            # Still waits for the batches already being written
+            return self.run(lambda: None)
+
+        dirty, self.dirty = self.dirty, OrderedDict()
+        d = self.run(self.backend.write, dirty.items())
+        d.addCallback(self.compacted)
+        d.addErrback(log.err, '[Error]: Cannot write {}'.format(self.path))
+        return d
+
+    def run(self, f, *args):
+        return threads.deferToThreadPool(reactor, self.pool, f, *args)
+
+    def snapshot(self):
+        '''
+        Return a Deferred firing once every table has been
+        written to a new snapshot, which replaces the old one
+        atomically.  Only copying the tables is done on the
+        calling thread.
+        '''
+        self.flush()
+        tables = []
+        if self.backend.SNAPSHOT_TABLES:
+            tables = [(namespace, usnapshot.freeze(table.data))
+                      for namespace, table in self.tables.iteritems()]
+        d = self.run(self.backend.snapshot, tables)
+        d.addErrback(log.err, '[Error]: Cannot snapshot {}'.format(self.path))
+        return d
+
+    def table(self, namespace, data=None):
+        '''
+        Return the Table for a namespace, reading it the first
+        time it's asked for.  Only this first read is done on
+        the calling thread.
+
+        Parameters
+        ----------
+            namespace: string
+                Name of the table
+
+            data: dict-like
+                Where the table is kept in memory; defaults to
+                a dict.  Keys are added in the order they were
+                last set
+        '''
+        if namespace not in self.tables:
+            table = Table(self, namespace, data)
+            for key, value in self.backend.load(namespace):
+                table.data[key] = value
+            self.tables[namespace] = table
+
+        return self.tables[namespace]
+
+class Table(object):
+    '''
+    A dict, data, whose changes are made through set and
+    delete so they're saved by its Store.
+    '''
+    def __init__(self, store, namespace, data=None):
+        self.store = store
+        self.namespace = namespace
+        self.data = {} if data is None else data
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def delete(self, key):
+        '''
+        Delete key, if present.
+        '''
+        if key in self.data:
+            del self.data[key]
+            self.store.changed(self.namespace, key, ujournal.DELETED)
+
+    def flush(self):
+        '''
+        Return a Deferred firing once the changes made so far
+        have been committed.
+        '''
+        return self.store.flush()
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def iteritems(self):
+        return self.data.iteritems()
+
+    def set(self, key, value):
+        self.data[key] = value
+        self.store.changed(self.namespace, key, value)
+
+#-------------------------------------
+#
+#    Backends
+#
+#-------------------------------------
+class JournalBackend(object):
+    '''
+    Saves tables to a journal of batches of changes, keyed
+    by (namespace, key), and a snapshot.
+    '''
+    # Snapshots are written from the tables
+    SNAPSHOT_TABLES = True
+
+    def __init__(self, path):
+        # Only used to write, so it holds none of the data
+        self.journal = ujournal.Journal(path)
+        if os.path.exists(path):
+            self.journal.size = os.path.getsize(path)
+
+    def load(self, namespace):
+        '''
+        Return a list of the (key, value) of a namespace.
+        '''
+        journal = ujournal.Journal(self.journal.path, data=OrderedDict())
+        journal.load()
+        return [(key, value) for (ns, key), value in journal.data.iteritems()
+                if ns == namespace]
+
+    def snapshot(self, tables):
+        '''
+        Write a snapshot of tables, a list of (namespace,
+        frozen data), keeping any other namespaces saved.
+        '''
+        journal = ujournal.Journal(self.journal.path, data=OrderedDict())
+        journal.load()
+
+        namespaces = set(namespace for namespace, _ in tables)
+        for ns, key in journal.data.keys():
+            if ns in namespaces:
+                del journal.data[(ns, key)]
+        for namespace, data in tables:
+            for key, value in data.iteritems():
+                journal.data[(namespace, canonical(key))] = value
+
+        journal.compact()
+        self.journal.size = 0
+
+    def write(self, changes):
+        '''
+        Append a list of ((namespace, key), value) to the
+        journal and return its size.
+        '''
+        self.journal.dirty = OrderedDict(((namespace, canonical(key)), value)
+                                         for (namespace, key), value in changes)
+        self.journal.flush(compact=False)
+        return self.journal.size
+
+class SQLiteBackend(object):
+    '''
+    Saves tables as rows of marshalled keys, which unlike
+    pickles are the same for equal keys, and pickled values.
+    A row is replaced, so moved to the end, whenever it's set.
+    '''
+    # Snapshots are copied from the database itself
+    SNAPSHOT_TABLES = False
+
+    # VACUUM INTO arrived in SQLite 3.27
+    CAN_SNAPSHOT = sqlite3.sqlite_version_info >= (3, 27)
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS kv
+        ( namespace TEXT NOT NULL
+        , key BLOB NOT NULL
+        , value BLOB NOT NULL
+        , PRIMARY KEY (namespace, key)
+        );
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+        # Connection of the store's thread
+        self.db = None
+
+        # Bytes of changes written since the last snapshot
+        self.written = 0
+
+    def connect(self):
+        db = sqlite3.connect(self.path)
+        db.executescript(self.SCHEMA)
+        return db
+
+    def load(self, namespace):
+        '''
+        Return a list of the (key, value) of a namespace, in
+        the order they were last set.
+        '''
+        db = self.connect()
+        try:
+            return [(marshal.loads(str(k)), pickle.loads(str(v)))
+                    for k, v in db.execute('''
+                        SELECT key, value FROM kv WHERE namespace = ?
+                        ORDER BY rowid''', (namespace,))]
+        finally:
+            db.close()
+
+    def snapshot(self, tables):
+        '''
+        Copy the database to a snapshot next to it.  The tables
+        are already saved, so aren't needed.
+        '''
+        if not self.CAN_SNAPSHOT:
+            return
+
+        if self.db is None:
+            self.db = self.connect()
+
+        started = time.time()
+        snapshot_path = '{}.snapshot'.format(self.path)
+        tmp = '{}.tmp'.format(snapshot_path)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        self.db.execute('VACUUM INTO ?', (tmp,))
+        os.rename(tmp, snapshot_path)
+        self.written = 0
+        usnapshot.record(snapshot_path, time.time() - started,
+                         os.path.getsize(snapshot_path))
+
+    def write(self, changes):
+        '''
+        Commit a list of ((namespace, key), value) in one
+        transaction and return the bytes written since the last
+        snapshot, or None if snapshots can't be taken.
+        '''
+        if self.db is None:
+            self.db = self.connect()
+
+        with self.db:
+            for (namespace, key), value in changes:
+                key = sqlite3.Binary(marshal.dumps(canonical(key), 0))
+                if value is ujournal.DELETED:
+                    self.db.execute(
+                            'DELETE FROM kv WHERE namespace = ? AND key = ?',
+                            (namespace, key))
+                else:
+                    value = sqlite3.Binary(pickle.dumps(value, -1))
+                    self.db.execute(
+                            'INSERT OR REPLACE INTO kv VALUES (?, ?, ?)',
+                            (namespace, key, value))
+                    self.written += len(value)
+                self.written += len(key)
+
+        return self.written if self.CAN_SNAPSHOT else None
+
+BACKENDS = { 'journal': JournalBackend
+           , 'sqlite': SQLiteBackend
+           }
+
+def canonical(key):
+    '''
+    Return a key with its strs decoded, so equal keys are
+    saved alike whether they were given as str or unicode.
+    '''
+    if isinstance(key, str):
+        return key.decode('utf-8', 'replace')
+
+    if isinstance(key, tuple):
+        return tuple(canonical(k) for k in key)
+
+    return key
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+'''
+Queue of messages left for nicks with the tell command.
+
+Messages are kept in SQLite, indexed by the nick they're
+for, so queueing or delivering one touches only its own
+rows.  The nicks with messages waiting are also kept in
+memory, so a JOIN by anyone else costs a set lookup.  Every
+query runs on a thread of the queue's own, so the reactor
+never waits on the disk.
+'''
+
+import sqlite3
+import time
+
+from twisted.internet import defer, reactor, task, threads
+from twisted.python import log
+from twisted.python.threadpool import ThreadPool
+
+from utils.casemap import lower
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tells
+    ( id INTEGER PRIMARY KEY
+    , lnick TEXT NOT NULL
+    , src TEXT NOT NULL
+    , lsrc TEXT NOT NULL
+    , msg TEXT NOT NULL
+    , ts INTEGER NOT NULL
+    );
+CREATE INDEX IF NOT EXISTS tells_lnick ON tells (lnick, id);
+CREATE INDEX IF NOT EXISTS tells_lsrc ON tells (lsrc);
+CREATE INDEX IF NOT EXISTS tells_ts ON tells (ts);
+'''
+
+# Queues by path, see named()
+_queues = {}
+
+def named(path, **kwargs):
+    '''
+    Return the TellQueue saved at path, opening it the first
+    time it's asked for, so it outlives plugin reloads.
+    Keyword arguments are passed to TellQueue.
+    '''
+    if path not in _queues:
+        _queues[path] = TellQueue(path, **kwargs)
+
+    return _queues[path]
+
+class QuotaExceeded(Exception):
+    '''
+    Raised when a sender, or recipient, has too many
+    messages waiting.
+    '''
+
+class TellQueue(object):
+    def __init__(self, path, max_age=30 * 86400, max_per_sender=10,
+                 max_per_nick=20, expire_interval=3600):
+        '''
+        Parameters
+        ----------
+            path: string
+                Path of the SQLite database
+
+            max_age: float
+                Seconds a message waits before it's dropped
+
+            max_per_sender: int
+                Most messages waiting from any one sender
+
+            max_per_nick: int
+                Most messages waiting for any one nick
+
+            expire_interval: float
+                Seconds between dropping old messages
+        '''
+        self.path = path
+        self.max_age = max_age
+        self.max_per_sender = max_per_sender
+        self.max_per_nick = max_per_nick
+
+        # Lowercase nicks with messages waiting, or None until
+        # they've been read, in which case every nick is checked
+        self.waiting = None
+
+        # SQLite connections belong to the thread which made
+        # them, so everything is done on a single thread
+        self.db = None
+        self.pool = ThreadPool(1, 1, 'tells')
+        self.pool.start()
+        reactor.addSystemEventTrigger('during', 'shutdown', self.pool.stop)
+
+        d = self.run(self._waiting)
+        d.addCallback(self.setWaiting)
+        d.addErrback(log.err, '[Error]: Cannot read tells')
+
+        self.expirer = task.LoopingCall(self.expire)
+        self.expirer.start(expire_interval, now=False)
+
+    def add(self, src, nick, msg):
+        '''
+        Return a Deferred firing with the id of a message
+        queued for nick, or failing with QuotaExceeded.
+        '''
+        d = self.run(self._add, src, nick, msg, int(time.time()))
+
+        def added(tell_id):
+            if self.waiting is not None:
+                self.waiting.add(lower(nick))
+            return tell_id
+
+        return d.addCallback(added)
+
+    def expire(self):
+        '''
+        Return a Deferred firing once messages older than
+        max_age have been dropped.
+        '''
+        d = self.run(self._expire, int(time.time() - self.max_age))
+        d.addErrback(log.err, '[Error]: Cannot expire tells')
+        return d
+
+    def hasWaiting(self, nick):
+        '''
+        Whether nick may have messages waiting.
+        '''
+        return self.waiting is None or lower(nick) in self.waiting
+
+    def remove(self, tell_id):
+        '''
+        Return a Deferred firing once a queued message has
+        been dropped.
+        '''
+        return self.run(self._remove, tell_id)
+
+    def run(self, f, *args):
+        return threads.deferToThreadPool(reactor, self.pool, f, *args)
+
+    def setWaiting(self, nicks):
+        '''
+        Callback remembering the nicks with messages waiting.
+        '''
+        self.waiting = set(nicks)
+
+    def take(self, nick):
+        '''
+        Return a Deferred firing with a list of (src, msg, ts)
+        of the messages waiting for nick, oldest first, which
+        are dropped from the queue.
+        '''
+        if not self.hasWaiting(nick):
+            return defer.succeed([])
+
+        if self.waiting is not None:
+            self.waiting.discard(lower(nick))
+
+        return self.run(self._take, lower(nick),
+                        int(time.time() - self.max_age))
+
+    #-------------------------------------------------
+    #
+    #       Run on the queue's thread
+    #
+    #-------------------------------------------------
+    def _add(self, src, nick, msg, ts):
+        db = self._connect()
+        with db:
+            count = db.execute('SELECT COUNT(*) FROM tells WHERE lsrc = ?',
+                               (lower(src),)).fetchone()[0]
+            if count >= self.max_per_sender:
+                raise QuotaExceeded(
+                        u'You already have {} messages waiting'.format(count))
+
+            count = db.execute('SELECT COUNT(*) FROM tells WHERE lnick = ?',
+                               (lower(nick),)).fetchone()[0]
+            if count >= self.max_per_nick:
+                raise QuotaExceeded(
+                        u'{} already has {} messages waiting'.format(nick, count))
+
+            return db.execute('''
+                INSERT INTO tells (lnick, src, lsrc, msg, ts)
+                VALUES (?, ?, ?, ?, ?)''',
+                (lower(nick), src, lower(src), msg, ts)).lastrowid
+
+    def _connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path)
+            self.db.executescript(SCHEMA)
+
+        return self.db
+
+    def _expire(self, oldest):
+        db = self._connect()
+        with db:
+            db.execute('DELETE FROM tells WHERE ts < ?', (oldest,))
+
+    def _remove(self, tell_id):
+        db = self._connect()
+        with db:
+            db.execute('DELETE FROM tells WHERE id = ?', (tell_id,))
+
+    def _take(self, lnick, oldest):
+        db = self._connect()
+        with db:
+            tells = db.execute('''
+                SELECT src, msg, ts FROM tells
+                WHERE lnick = ? AND ts >= ? ORDER BY id''',
+                (lnick, oldest)).fetchall()
+            db.execute('DELETE FROM tells WHERE lnick = ?', (lnick,))
+
+        return tells
+
+    def _waiting(self):
+        return [r[0] for r in
+                self._connect().execute('SELECT DISTINCT lnick FROM tells')]
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+'''
+Decides which line plugins a line could be meant for.
+
+Each plugin declares triggers, which are checked for all
+plugins at once:
+
+    literals:
+        Indexed by their first few characters, so finding
+        them costs about the same however many there are.
+
+    regexes:
+        Merged into one regex per set of regex flags, so a
+        line is scanned once rather than once per plugin.
+        Those which would mean something else once merged,
+        e.g., with named groups or back-references, are
+        checked on their own.
+'''
+
+import re
+
+# Trigger for plugins which want every line
+ALWAYS = 'always'
+
+# Characters of each literal which are indexed
+PREFIX_LEN = 3
+
+# Most plugin subsets whose merged regexes are kept
+MAX_COMPILED = 64
+
+# Most groups the re module allows in one regex
+MAX_GROUPS = 99
+
+# Parts of a pattern which refer to its own groups by number or
+# name, or set flags for the whole regex
+UNMERGEABLE_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(|\(\?[iLmsux]+\)')
+
+def mergeable(regex):
+    '''
+    Return whether a regex matches the same lines as one of the
+    alternatives of a merged regex.
+    '''
+    return not regex.groupindex and \
+           UNMERGEABLE_RE.search(regex.pattern) is None
+
+class TriggerIndex(object):
+    '''
+    Maps a line to the names of the plugins it triggers.
+
+    Triggers are literal substrings, which are case sensitive,
+    compiled regexes, or ALWAYS.
+    '''
+    def __init__(self):
+        self.always = set()
+
+        # Prefix length -> {prefix: [(literal, name)]}
+        self.literals = {}
+
+        # flags -> {name: regex}, the alternation of a plugin's
+        # regex triggers with those flags
+        self.regexes = {}
+
+        # name -> regexes which can't be merged
+        self.separate = {}
+
+        # (flags, frozenset of names) -> merged regexes
+        self.compiled = {}
+
+    def add(self, name, triggers):
+        '''
+        Index a plugin's triggers, replacing any it had.
+        '''
+        self.remove(name)
+
+        by_flags = {}
+        for trigger in triggers:
+            if trigger == ALWAYS:
+                self.always.add(name)
+            elif isinstance(trigger, basestring):
+                prefix = trigger[:PREFIX_LEN]
+                self.literals.setdefault(len(prefix), {}) \
+                             .setdefault(prefix, []).append((trigger, name))
+            elif mergeable(trigger):
+                by_flags.setdefault(trigger.flags, []).append(trigger.pattern)
+            else:
+                self.separate.setdefault(name, []).append(trigger)
+
+        for flags, patterns in by_flags.iteritems():
+            self.regexes.setdefault(flags, {})[name] = re.compile(
+                    u'|'.join(u'(?:{})'.format(p) for p in patterns), flags)
+
+    def fired(self, line):
+        '''
+        Return the set of names of the plugins triggered by line.
+        '''
+        fired = set(self.always)
+
+        for k, prefixes in self.literals.iteritems():
+            if k == 1:
+                grams = set(line)
+            else:
+                grams = {line[i:i + k] for i in xrange(len(line) - k + 1)}
+
+            for prefix in grams.intersection(prefixes):
+                for literal, name in prefixes[prefix]:
+                    if name not in fired and literal in line:
+                        fired.add(name)
+
+        for flags, regexes in self.regexes.iteritems():
+            names = frozenset(regexes) - fired
+            pos = 0
+
+            # Find the leftmost match of any plugin left, then
+            # which plugins match there; most lines match none
+            while names:
+                starts = [m.start() for m in \
+                          (r.search(line, pos) for r in self.merged(flags, names)) \
+                          if m is not None]
+                if not starts:
+                    break
+
+                pos = min(starts)
+                fired.update(n for n in names if regexes[n].match(line, pos))
+                names = names - fired
+
+        for name, regexes in self.separate.iteritems():
+            if name not in fired and any(r.search(line) for r in regexes):
+                fired.add(name)
+
+        return fired
+
+    def merged(self, flags, names):
+        '''
+        Return regexes which together match any of the given
+        plugins' regex triggers.  There's only more than one if
+        their groups wouldn't fit in a single regex.
+        '''
+        key = (flags, names)
+        if key not in self.compiled:
+            if len(self.compiled) >= MAX_COMPILED:
+                self.compiled.clear()
+
+            chunks = [[]]
+            size = 0
+            for name in sorted(names):
+                regex = self.regexes[flags][name]
+                if chunks[-1] and size + regex.groups > MAX_GROUPS:
+                    chunks.append([])
+                    size = 0
+                chunks[-1].append(regex.pattern)
+                size += regex.groups
+
+            # Should merging still fail, each plugin's regex is
+            # searched by itself
+            try:
+                self.compiled[key] = [re.compile(u'|'.join(c), flags) \
+                                      for c in chunks]
+            except re.error:
+                self.compiled[key] = [self.regexes[flags][name] \
+                                      for name in sorted(names)]
+
+        return self.compiled[key]
+
+    def remove(self, name):
+        '''
+        Stop indexing a plugin's triggers.
+        '''
+        self.always.discard(name)
+
+        for prefixes in self.literals.values():
+            for prefix in prefixes.keys():
+                prefixes[prefix] = [(l, n) for l, n in prefixes[prefix] \
+                                    if n != name]
+                if not prefixes[prefix]:
+                    del prefixes[prefix]
+
+        for regexes in self.regexes.values():
+            regexes.pop(name, None)
+        self.separate.pop(name, None)
+
+        self.literals = {k: v for k, v in self.literals.iteritems() if v}
+        self.regexes = {k: v for k, v in self.regexes.iteritems() if v}
+        self.compiled.clear()
@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 
-import requests
+import utils.httpclient as uhttp
 
 def safe_get(urls, args_kwargs):
     '''
-    safe_get uses the requests module's get
+    safe_get uses the shared HTTP client's get
     method to attempt retrieving an HTTP(S)
     resource.  If one url fails, either because
     of a non-200 status code or other exception,
@@ -16,14 +16,14 @@ def safe_get(urls, args_kwargs):
     Params:
         @urls: list of urls as strings
         @args_kwargs: list of 2-tuples (args, kwargs) to 
-                      pass to requests get method
+                      pass to the HTTP client's get method
     '''
     if not args_kwargs:
       args_kwargs = [((), {})] * len(urls)
     for i, url in enumerate(urls):
         try:
             args, kwargs = args_kwargs[i] 
-            r = requests.get(url, *args, **kwargs)
+            r = uhttp.get(url, *args, **kwargs)
             if r.status_code == 200:
                 return r.text
         except: